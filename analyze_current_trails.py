@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 """Analyze the current_trails.geojson file"""
 
-import json
+from json_io import load_file
+from data_manager import summarize_feature
 
 # Load the file
-with open('data/current_trails/current_trails.geojson', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+data = load_file('data/current_trails/current_trails.geojson')
 
 features = data.get('features', [])
 
@@ -17,14 +17,12 @@ print(f"\nTotal trails: {len(features)}")
 print("\nTrail Summary:")
 
 for i, feature in enumerate(features, 1):
-    props = feature['properties']
-    geom = feature['geometry']
+    props = summarize_feature(feature)['properties']
     
     name = props.get('name', 'Unknown')
     length = props.get('length', 0)
-    coords_count = len(geom.get('coordinates', []))
-    blog_post = props.get('blog_post', '')
-    has_blog = "YES" if blog_post else "NO"
+    coords_count = props['point_count']
+    has_blog = "YES" if props['has_blog_post'] else "NO"
     date_hiked = props.get('date_hiked', 'N/A')
     
     print(f"{i}. {name}")
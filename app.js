@@ -1321,7 +1321,7 @@ class TrailBlogger {
         if (trail.images && trail.images.length > 0) {
             imagePreview.innerHTML = trail.images.map((img, index) => `
                 <div class="image-preview-item" data-existing-image="${img}">
-                    <img src="${img}" alt="Trail image" />
+                    <img src="${this.thumbnailUrl(img)}" alt="Trail image" />
                     <button type="button" class="remove-image-btn" onclick="trailBlogger.removeImage(${index}, true)" title="Remove image">
                         <i class="fas fa-times"></i>
                     </button>
@@ -2159,7 +2159,7 @@ class TrailBlogger {
                     const result = await response.json();
                     if (result.images && result.images.length > 0) {
                         imageGallery.innerHTML = result.images.map(img => 
-                            `<img src="${img.url}" alt="Trail photo" onclick="trailBlogger.openImageModal('${img.url}')" />`
+                            `<img src="${this.thumbnailUrl(img.url)}" loading="lazy" alt="Trail photo" onclick="trailBlogger.openImageModal('${img.url}')" />`
                         ).join('');
                     } else {
                         imageGallery.innerHTML = '<p>No photos available for this trail.</p>';
@@ -2279,6 +2279,12 @@ class TrailBlogger {
         this.selectedTrail = null;
     }
     
+    thumbnailUrl(imageUrl, width = 400) {
+        // Images served by the Flask API can be requested at a smaller width
+        // (and as WebP/AVIF); other sources are used as they are
+        return imageUrl.startsWith('/api/trails/') ? `${imageUrl}?w=${width}` : imageUrl;
+    }
+    
     openImageModal(imageSrc) {
         // Create a simple image modal
         const modal = document.createElement('div');
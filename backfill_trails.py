@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Recompute derived properties for every stored trail
+
+Metrics (bbox, GPS length, elevation gain/loss and extremes) and states and
+parks are computed when a trail is saved; run this once for data saved
+before that, or after updating data/states.geojson or
+data/parks_simplified.json.
+
+Usage:
+    python backfill_trails.py
+    python backfill_trails.py --layout sqlite
+"""
+
+import argparse
+import sys
+import time
+from data_manager import TrailDataManager
+from trail_storage import STORAGE_LAYOUTS
+
+
+def backfill(data_dir='data', layout='single'):
+    """Recompute derived properties and report what changed"""
+    print("=" * 70)
+    print("BACKFILLING TRAIL PROPERTIES")
+    print("=" * 70)
+
+    manager = TrailDataManager(data_dir, layout=layout)
+    start = time.perf_counter()
+    results = manager.refresh_derived_properties()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if not results:
+        print(f"\n[OK] All trails were already up to date ({elapsed:.0f} ms)")
+        return True
+
+    for result in results:
+        trail = manager.get_trail_by_name(result['name'])
+        props = trail['properties'] if trail else {}
+        states = ', '.join(props.get('states') or []) or '-'
+        parks = ', '.join(props.get('parks') or []) or '-'
+        climb = f"+{props['elevation_gain']} ft" if 'elevation_gain' in props else "no elevation"
+        print(f"   [+] {result['name']}: {props.get('gps_length', '-')} mi GPS, {climb}; "
+              f"states {states}; parks {parks}")
+    print(f"\n[OK] Updated {len(results)} trails ({elapsed:.0f} ms)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute derived properties for every stored trail")
+    parser.add_argument('--data-dir', default='data', help="trail data directory")
+    parser.add_argument('--layout', choices=STORAGE_LAYOUTS, default='single',
+                        help="storage backend holding the trails (default: single)")
+    args = parser.parse_args()
+    return backfill(args.data_dir, args.layout)
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(0 if main() else 1)
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
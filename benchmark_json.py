@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Time JSON load/dump of data/trails.geojson with the stdlib and orjson
+
+Usage:
+    python benchmark_json.py [path] [--repeat N]
+"""
+
+import argparse
+import json
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def best_of(func, repeat):
+    """Return the fastest of repeat runs in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON load/dump on trail data")
+    parser.add_argument('path', nargs='?', default='data/trails.geojson', help="GeoJSON file to use")
+    parser.add_argument('--repeat', type=int, default=20, help="runs per measurement")
+    args = parser.parse_args()
+
+    with open(args.path, 'rb') as f:
+        raw = f.read()
+    data = json.loads(raw)
+
+    cases = [
+        ('json', 'load', lambda: json.loads(raw)),
+        ('json', 'dump pretty', lambda: json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')),
+        ('json', 'dump compact', lambda: json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')),
+    ]
+    if orjson is not None:
+        cases += [
+            ('orjson', 'load', lambda: orjson.loads(raw)),
+            ('orjson', 'dump pretty', lambda: orjson.dumps(data, option=orjson.OPT_INDENT_2)),
+            ('orjson', 'dump compact', lambda: orjson.dumps(data)),
+        ]
+
+    print("=" * 70)
+    print(f"JSON BENCHMARK: {args.path} ({len(raw) / 1024:.0f} KB, "
+          f"{len(data.get('features', []))} trails, best of {args.repeat})")
+    print("=" * 70)
+    print(f"{'backend':<8} {'operation':<14} {'time':>10} {'output':>10}")
+    for backend, operation, func in cases:
+        elapsed = best_of(func, args.repeat)
+        result = func()
+        size = f"{len(result) / 1024:.0f} KB" if isinstance(result, bytes) else ''
+        print(f"{backend:<8} {operation:<14} {elapsed:>8.2f}ms {size:>10}")
+
+    if orjson is None:
+        print("\norjson is not installed; pip install orjson to compare")
+
+
+if __name__ == '__main__':
+    main()
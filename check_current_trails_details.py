@@ -1,11 +1,10 @@
 #!/usr/bin/env python3
 """Check detailed properties of current_trails.geojson"""
 
-import json
+from json_io import load_file
 
 # Load the file
-with open('data/current_trails/current_trails.geojson', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+data = load_file('data/current_trails/current_trails.geojson')
 
 features = data.get('features', [])
 
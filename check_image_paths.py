@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 """Check image paths in trails.geojson"""
 
-import json
+import os
+from image_catalog import ImageCatalog
+from json_io import load_file
 
-with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+data = load_file('data/trails.geojson')
+catalog = ImageCatalog('data/trail_images')
 
 print("=" * 70)
 print("IMAGE PATH CHECKER")
@@ -29,4 +31,9 @@ for i, feature in enumerate(data['features'][:5], 1):  # First 5 trails
             print(f"   [OK] Path is relative with './' prefix")
         else:
             print(f"   [?] Path format unclear")
+        
+        # Check the files are there
+        filenames = [os.path.basename(img) for img in images]
+        missing = catalog.missing(props.get('trail_id'), filenames)
+        print(f"   Files present: {len(images) - len(missing)}/{len(images)}")
 
@@ -4,11 +4,13 @@ Complete backup system for Trail Blogger
 Creates a comprehensive backup of both data and images
 """
 
-import json
 import os
 import shutil
 import zipfile
 from datetime import datetime
+from json_io import dump_file
+from data_manager import TrailDataManager
+from image_store import MANIFEST_FILE, ImageStore
 
 def create_complete_backup():
     """Create a complete backup of trails and images"""
@@ -27,28 +29,22 @@ def create_complete_backup():
         print("   [ERROR] trails.geojson not found!")
         return False
     
-    with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-        geojson_data = json.load(f)
+    manager = TrailDataManager()
+    geojson_data = manager.load_all_trails()
     
-    trails = geojson_data.get('features', [])
-    total_images = sum(len(t['properties'].get('images', [])) for t in trails)
+    # Counts come from the maintained statistics instead of another pass
+    metadata = manager.backup_metadata()
+    total_images = metadata['totalImages']
     
     backup_data = {
         'timestamp': datetime.now().isoformat(),
         'version': '2.0',
-        'metadata': {
-            'totalTrails': len(trails),
-            'hikedTrails': sum(1 for t in trails if t['properties'].get('status') == 'hiked'),
-            'totalMiles': sum(t['properties'].get('length', 0) for t in trails),
-            'totalImages': total_images,
-            'backupCreated': datetime.now().isoformat()
-        },
+        'metadata': metadata,
         'geojson': geojson_data
     }
     
     backup_file = os.path.join(backup_dir, 'trails_backup.geojson')
-    with open(backup_file, 'w', encoding='utf-8') as f:
-        json.dump(backup_data, f, indent=2)
+    dump_file(backup_file, backup_data)
     
     print(f"   [OK] Saved trail data: {backup_file}")
     print(f"   - Trails: {backup_data['metadata']['totalTrails']}")
@@ -59,20 +55,31 @@ def create_complete_backup():
     if os.path.exists('data/trail_images'):
         images_zip = os.path.join(backup_dir, 'trail_images.zip')
         
+        # Trail images linked to a stored blob are left out: the blob and
+        # the store manifest are enough to recreate them on restore
+        image_store = ImageStore('data/trail_images')
         with zipfile.ZipFile(images_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
             image_count = 0
+            file_count = 0
             for root, dirs, files in os.walk('data/trail_images'):
+                dirs[:] = [d for d in dirs if d != 'incoming']
                 for file in files:
-                    if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-                        file_path = os.path.join(root, file)
-                        # Store with relative path from data/
-                        arcname = os.path.relpath(file_path, 'data')
+                    file_path = os.path.join(root, file)
+                    # Store with relative path from data/
+                    arcname = os.path.relpath(file_path, 'data')
+                    if file == MANIFEST_FILE:
                         zipf.write(file_path, arcname)
-                        image_count += 1
+                    elif file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
+                        in_blobs = os.path.basename(os.path.dirname(root)) == '.blobs'
+                        if not in_blobs:
+                            image_count += 1
+                        if in_blobs or not image_store.is_ref(file_path):
+                            zipf.write(file_path, arcname)
+                            file_count += 1
         
         zip_size_mb = os.path.getsize(images_zip) / (1024 * 1024)
         print(f"   [OK] Created images ZIP: {images_zip}")
-        print(f"   - Images: {image_count}")
+        print(f"   - Images: {image_count} ({file_count} distinct files)")
         print(f"   - Size: {zip_size_mb:.2f} MB")
     else:
         print("   [WARNING] No trail_images directory found")
@@ -4,11 +4,13 @@ Complete restore system for Trail Blogger
 Restores both data and images from a backup
 """
 
-import json
 import os
 import shutil
 import zipfile
 from datetime import datetime
+from json_io import dump_file, load_file
+from image_catalog import ImageCatalog
+from image_store import ImageStore
 
 def list_available_backups():
     """List all available backups"""
@@ -24,8 +26,7 @@ def list_available_backups():
             if os.path.exists(geojson_file):
                 # Get backup metadata
                 try:
-                    with open(geojson_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
+                    data = load_file(geojson_file)
                     backups.append({
                         'path': backup_path,
                         'name': item,
@@ -58,8 +59,7 @@ def restore_from_backup(backup_path):
     
     # Load backup data
     print("\n[1/4] Loading backup data...")
-    with open(geojson_file, 'r', encoding='utf-8') as f:
-        backup_data = json.load(f)
+    backup_data = load_file(geojson_file)
     
     print(f"   Backup created: {backup_data.get('timestamp')}")
     print(f"   Total trails: {backup_data.get('metadata', {}).get('totalTrails', 0)}")
@@ -79,8 +79,7 @@ def restore_from_backup(backup_path):
     # Ensure data directory exists
     os.makedirs('data', exist_ok=True)
     
-    with open('data/trails.geojson', 'w', encoding='utf-8') as f:
-        json.dump(geojson_data, f, indent=2)
+    dump_file('data/trails.geojson', geojson_data, pretty=True)
     
     print(f"   [OK] Restored trails.geojson")
     print(f"   - Trails: {len(geojson_data.get('features', []))}")
@@ -103,14 +102,13 @@ def restore_from_backup(backup_path):
         with zipfile.ZipFile(images_zip, 'r') as zipf:
             zipf.extractall('data')
         
-        # Count restored images
-        image_count = 0
-        for root, dirs, files in os.walk('data/trail_images'):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-                    image_count += 1
+        # Link each trail's images to the blobs they share
+        ImageStore('data/trail_images').restore_links()
         
-        print(f"   [OK] Restored images: {image_count}")
+        # Index the restored images
+        catalog = ImageCatalog('data/trail_images')
+        catalog.refresh()
+        print(f"   [OK] Restored images: {catalog.stats()['images']}")
     else:
         print("   [WARNING] No images ZIP found in backup")
     
@@ -121,8 +119,7 @@ def restore_from_backup(backup_path):
     
     # Verify restoration
     print("\nVerifying restoration...")
-    with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-        restored = json.load(f)
+    restored = load_file('data/trails.geojson')
     
     trails = restored.get('features', [])
     print(f"  - Total trails: {len(trails)}")
@@ -130,17 +127,14 @@ def restore_from_backup(backup_path):
     print(f"  - Total miles: {sum(t['properties'].get('length', 0) for t in trails):.2f}")
     
     # Check for images
+    catalog = ImageCatalog('data/trail_images')
     for trail in trails[:5]:  # Check first 5
         props = trail['properties']
         trail_id = props.get('trail_id')
         images = props.get('images', [])
         
         if images:
-            trail_dir = f"data/trail_images/trail-{trail_id}"
-            missing = []
-            for img in images:
-                if not os.path.exists(os.path.join(trail_dir, img)):
-                    missing.append(img)
+            missing = catalog.missing(trail_id, images)
             
             if missing:
                 print(f"  [WARNING] Trail '{props.get('name')}' missing {len(missing)} images")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Coordinate Encoding
+Compact polyline-style encoding of trail coordinates for storage and transfer
+"""
+
+from typing import Dict, List, Optional, Any
+
+try:
+    import numpy as np
+except ImportError:  # numpy only speeds up decoding
+    np = None
+
+ENCODING_NAME = 'polyline'
+
+# Decimal places kept for longitude, latitude and elevation. Six places is
+# ~0.1 m on the ground; GPS elevation is rarely better than a decimetre.
+DEFAULT_PRECISION = (6, 6, 1)
+
+
+def _encode_value(value: int, out: List[str]):
+    """Append one zigzag/varint-encoded integer as polyline characters"""
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode_coordinates(coordinates: List[List[float]], precision=DEFAULT_PRECISION) -> Optional[Dict[str, Any]]:
+    """
+    Encode LineString coordinates as quantized deltas
+
+    Works like the Google polyline algorithm (zigzag varints in printable
+    ASCII) but keeps GeoJSON [lon, lat, ele] order and a precision per
+    dimension.
+
+    Args:
+        coordinates: List of [lon, lat] or [lon, lat, ele] positions
+        precision: Decimal places per dimension
+
+    Returns:
+        Encoded geometry fields ({'encoding', 'precision', 'coordinates'}),
+        or None if the coordinates cannot be encoded losslessly at this
+        precision (mixed dimensions, non-numbers or extra decimal places)
+    """
+    if not coordinates or not isinstance(coordinates[0], list):
+        return None
+    dims = len(coordinates[0])
+    if dims not in (2, 3):
+        return None
+    precision = tuple(precision[:dims])
+    scales = [10 ** p for p in precision]
+
+    out = []
+    previous = [0] * dims
+    for position in coordinates:
+        if not isinstance(position, list) or len(position) != dims:
+            return None
+        for axis in range(dims):
+            value = position[axis]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return None
+            quantized = round(value * scales[axis])
+            # Lossless guarantee: the decoded value must be exactly the input
+            if quantized / scales[axis] != value:
+                return None
+            _encode_value(quantized - previous[axis], out)
+            previous[axis] = quantized
+    return {
+        'encoding': ENCODING_NAME,
+        'precision': list(precision),
+        'coordinates': ''.join(out)
+    }
+
+
+def decode_coordinates(encoded: str, precision: List[int]) -> List[List[float]]:
+    """
+    Decode coordinates produced by encode_coordinates
+
+    Args:
+        encoded: Encoded coordinate string
+        precision: Decimal places per dimension (its length is the dimension count)
+
+    Returns:
+        List of positions
+    """
+    dims = len(precision)
+    scales = [10 ** p for p in precision]
+    if np is not None and encoded:
+        return _decode_coordinates_numpy(encoded, dims, scales)
+
+    current = [0] * dims
+    coordinates = []
+    position = []
+    index = 0
+    length = len(encoded)
+    while index < length:
+        result = 0
+        shift = 0
+        while True:
+            byte = ord(encoded[index]) - 63
+            index += 1
+            result |= (byte & 0x1f) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        axis = len(position)
+        current[axis] += ~(result >> 1) if result & 1 else result >> 1
+        position.append(current[axis] / scales[axis])
+        if len(position) == dims:
+            coordinates.append(position)
+            position = []
+    return coordinates
+
+
+def _decode_coordinates_numpy(encoded: str, dims: int, scales: List[int]) -> List[List[float]]:
+    """Vectorized decode_coordinates: split varints, undo zigzag and deltas"""
+    chunks = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    last = chunks < 0x20
+    # Index of each chunk within its varint, used as the 5-bit shift
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    group = np.cumsum(np.concatenate(([0], last[:-1].astype(np.int64))))
+    shifts = 5 * (np.arange(len(chunks)) - starts[group])
+    values = np.add.reduceat((chunks & 0x1f) << shifts, starts)
+    values = np.where(values & 1, ~(values >> 1), values >> 1)
+    quantized = np.cumsum(values.reshape(-1, dims), axis=0)
+    return (quantized / np.asarray(scales, dtype=np.float64)).tolist()
+
+
+def is_encoded(geometry: Optional[Dict[str, Any]]) -> bool:
+    """Return True if a geometry holds encoded coordinates"""
+    return bool(geometry) and geometry.get('encoding') == ENCODING_NAME
+
+
+def encode_geometry(geometry: Optional[Dict[str, Any]], precision=DEFAULT_PRECISION) -> Optional[Dict[str, Any]]:
+    """Return an encoded copy of a LineString geometry, or the geometry unchanged"""
+    if not geometry or geometry.get('type') != 'LineString' or is_encoded(geometry):
+        return geometry
+    encoded = encode_coordinates(geometry.get('coordinates'), precision)
+    if encoded is None:
+        return geometry
+    return dict(geometry, **encoded)
+
+
+def decode_geometry(geometry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Return a plain copy of an encoded geometry, or the geometry unchanged"""
+    if not is_encoded(geometry):
+        return geometry
+    decoded = {k: v for k, v in geometry.items() if k not in ('encoding', 'precision')}
+    decoded['coordinates'] = decode_coordinates(geometry['coordinates'], geometry['precision'])
+    return decoded
+
+
+def encode_collection(data: Dict[str, Any], precision=DEFAULT_PRECISION) -> Dict[str, Any]:
+    """
+    Copy a FeatureCollection with LineString coordinates encoded
+
+    Features whose coordinates cannot be encoded losslessly keep plain
+    coordinates, so decode_collection always restores the input exactly.
+    """
+    return dict(data, features=[
+        dict(feature, geometry=encode_geometry(feature.get('geometry'), precision))
+        for feature in data.get('features', [])
+    ])
+
+
+def decode_collection(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode every encoded geometry in a FeatureCollection in place"""
+    for feature in data.get('features', []):
+        if is_encoded(feature.get('geometry')):
+            feature['geometry'] = decode_geometry(feature['geometry'])
+    return data
@@ -4,27 +4,170 @@ Trail Blogger Data Manager
 Handles saving and loading trail data as GeoJSON with custom properties
 """
 
-import json
 import os
 import base64
-from datetime import datetime
+import hashlib
+from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
 import logging
+import threading
+from json_io import dump_file, load_file
+from trail_changes import ChangeLog, DEFAULT_RETENTION_DAYS
+from trail_index import TrailIndex, feature_hash
+from trail_metrics import METRIC_PROPERTIES, trail_metrics
+from trail_profile import DEFAULT_POINTS, ProfileCache
+from trail_regions import RegionAssigner
+from trail_simplify import SimplifiedGeometryCache
+from trail_spatial import SpatialIndex, feature_bbox, geometry_bbox, intersects, union
+from trail_stats import TrailStatistics
+from trail_storage import create_storage, strip_geometry
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Names taken by fixed routes under /api/trails/, which would hide a trail
+# with that name from /api/trails/<trail_name>
+RESERVED_TRAIL_NAMES = ('batch', 'changes')
+
+def validate_trail_data(trail_data: Any) -> Optional[str]:
+    """
+    Check trail data in the API format accepted by save_trail
+    
+    Args:
+        trail_data: Dictionary containing trail information
+        
+    Returns:
+        Error message, or None if the trail can be saved
+    """
+    if not isinstance(trail_data, dict):
+        return "Trail must be an object"
+    name = trail_data.get('name')
+    if not isinstance(name, str) or not name.strip():
+        return "Trail name is required"
+    if name in RESERVED_TRAIL_NAMES:
+        return f"'{name}' is reserved and cannot be used as a trail name"
+    length = trail_data.get('length', 0)
+    if isinstance(length, bool) or not isinstance(length, (int, float)) or length < 0:
+        return "Length must be a non-negative number"
+    coordinates = trail_data.get('coordinates', [])
+    if not isinstance(coordinates, list) or any(
+        not isinstance(position, list) or len(position) not in (2, 3)
+        or any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in position)
+        for position in coordinates
+    ):
+        return "Coordinates must be a list of [lon, lat] or [lon, lat, elevation] positions"
+    if not isinstance(trail_data.get('images', []), list):
+        return "Images must be a list"
+    return None
+
+# Properties kept in summary views, plus counts computed by summarize_feature
+SUMMARY_PROPERTIES = ('name', 'trail_id', 'status', 'difficulty', 'length',
+                      'elevation_gain', 'date_hiked', 'park', 'state')
+
+def summarize_feature(feature: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a trail to what list views need
+    
+    Args:
+        feature: GeoJSON Feature
+        
+    Returns:
+        Feature with SUMMARY_PROPERTIES, image_count, point_count and
+        has_blog_post, and no geometry
+    """
+    props = feature.get('properties') or {}
+    geometry = feature.get('geometry') or {}
+    summary = {key: props[key] for key in SUMMARY_PROPERTIES if key in props}
+    summary['image_count'] = len(props.get('images') or [])
+    summary['point_count'] = len(geometry.get('coordinates') or [])
+    summary['has_blog_post'] = bool(props.get('blog_post'))
+    return {"type": "Feature", "properties": summary, "geometry": None}
+
+def project_feature(feature: Dict[str, Any], include: Optional[List[str]] = None,
+                    exclude: List[str] = ()) -> Dict[str, Any]:
+    """
+    Copy a feature with only some of its fields
+    
+    Field names are property names, plus 'geometry' for the geometry.
+    
+    Args:
+        feature: GeoJSON Feature
+        include: Fields to keep (None keeps everything not excluded)
+        exclude: Fields to drop
+        
+    Returns:
+        Projected Feature (geometry None when not selected)
+    """
+    props = feature.get('properties') or {}
+    if include is not None:
+        props = {key: props[key] for key in include if key in props}
+        keep_geometry = 'geometry' in include
+    else:
+        props = {key: value for key, value in props.items() if key not in exclude}
+        keep_geometry = 'geometry' not in exclude
+    return {
+        "type": "Feature",
+        "properties": props,
+        "geometry": feature.get('geometry') if keep_geometry else None
+    }
+
 class TrailDataManager:
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", cached: bool = False,
+                 layout: str = "single", coordinate_encoding: Optional[str] = None,
+                 change_retention_days: float = DEFAULT_RETENTION_DAYS):
         """
         Initialize the Trail Data Manager
         
         Args:
             data_dir: Directory to store trail data files
+            cached: If True, keep the parsed trails in memory and only re-read
+                the file when it changes on disk
+            layout: Storage layout - 'single' keeps every trail in
+                trails.geojson, 'sharded' keeps one file per trail under
+                trail_shards/, 'journal' appends changes to trails.journal and
+                compacts them into trails.geojson, 'sqlite' keeps trails in
+                an indexed trails.sqlite3 database, 'columnar' keeps all
+                coordinates in one memory-mapped array under trail_columns/
+                (see trail_storage.py and geometry_store.py)
+            coordinate_encoding: 'polyline' to store trails.geojson with
+                compact encoded coordinates (see coord_codec.py); only for
+                the single and journal layouts
+            change_retention_days: How long change records for delta sync
+                are kept (see get_changes)
         """
         self.data_dir = data_dir
         self.trails_file = os.path.join(data_dir, "trails.geojson")
+        self.stats_file = os.path.join(data_dir, "trail_stats.json")
+        self.changes_file = os.path.join(data_dir, "trail_changes.json")
+        self.change_retention_days = change_retention_days
+        self.storage = create_storage(layout, data_dir, coordinate_encoding)
+        self.cached = cached
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # (file signature, parsed FeatureCollection) - replaced as one tuple so
+        # concurrent readers never see a signature paired with stale data
+        self._cache_entry = None
+        # (collection, TrailIndex built from it) - dropped on every write
+        self._index_entry = None
+        # (data version, TrailStatistics) - persisted to stats_file
+        self._stats_entry = None
+        self._stats_lock = threading.Lock()
+        # (data version, ChangeLog) - persisted to changes_file
+        self._changes_entry = None
+        self._changes_lock = threading.Lock()
+        # Levels of detail for simplified trail geometry (see simplify_trails)
+        self.geometry_cache = SimplifiedGeometryCache()
+        # Downsampled elevation profiles per trail version (see get_profile)
+        self.profile_cache = ProfileCache()
+        # (data version, SpatialIndex) - updated in place by writes
+        self._spatial_entry = None
+        self._spatial_lock = threading.Lock()
+        # Held for a whole write (load, merge, save, statistics, change log,
+        # spatial index) so concurrent writes never start from the same snapshot
+        self._write_lock = threading.Lock()
+        # States and parks from data_dir datasets, assigned on save
+        self.regions = RegionAssigner(data_dir)
         self.ensure_data_directory()
     
     def ensure_data_directory(self):
@@ -33,6 +176,81 @@ class TrailDataManager:
             os.makedirs(self.data_dir)
             logger.info(f"Created data directory: {self.data_dir}")
     
+    def build_feature(self, trail_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert trail data in the API format into a GeoJSON feature
+        
+        Args:
+            trail_data: Dictionary containing trail information
+            
+        Returns:
+            GeoJSON Feature
+        """
+        return {
+            "type": "Feature",
+            "properties": {
+                "name": trail_data.get('name', ''),
+                "length": trail_data.get('length', 0),
+                "difficulty": trail_data.get('difficulty', 'moderate'),
+                "status": trail_data.get('status', 'unhiked'),
+                "date_hiked": trail_data.get('dateHiked'),
+                "blog_post": trail_data.get('blogPost', ''),
+                "images": trail_data.get('images', []),
+                "created_at": datetime.now().isoformat(),
+                "updated_at": datetime.now().isoformat(),
+                "trail_id": trail_data.get('id', str(datetime.now().timestamp()))
+            },
+            "geometry": {
+                "type": "LineString",
+                "coordinates": trail_data.get('coordinates', [])
+            }
+        }
+    
+    def _derive_properties(self, feature: Dict[str, Any]):
+        """
+        Set the properties computed from a trail's geometry
+        
+        Metrics (bbox, gps_length, elevation - see trail_metrics.py) replace
+        any earlier values, length is filled in from gps_length when it was
+        not given, and states/parks are assigned.
+        """
+        props = feature['properties']
+        metrics = trail_metrics(feature.get('geometry'))
+        if metrics is None:
+            metrics = {}
+            bbox = geometry_bbox(feature.get('geometry'))
+            if bbox is not None:
+                metrics['bbox'] = bbox
+        for key in METRIC_PROPERTIES:
+            props.pop(key, None)
+        props.update(metrics)
+        # A length given with the trail is kept; it may be the official one
+        if 'gps_length' in metrics and not props.get('length'):
+            props['length'] = metrics['gps_length']
+        self.regions.assign(feature)
+    
+    def refresh_derived_properties(self) -> List[Dict[str, Any]]:
+        """
+        Recompute metrics, states and parks for every stored trail
+        
+        For data saved before these were computed, or after the states or
+        parks dataset changed. Only trails whose properties differ are
+        written, in one batch.
+        
+        Returns:
+            save_features results for the trails that changed
+        """
+        changed = []
+        for feature in self.load_all_trails().get('features', []):
+            # Copy the properties; the loaded collection may be shared
+            updated = dict(feature, properties=dict(feature['properties']))
+            self._derive_properties(updated)
+            if updated['properties'] != feature['properties']:
+                changed.append(updated)
+        if not changed:
+            return []
+        return self.save_features(changed)
+    
     def save_trail(self, trail_data: Dict[str, Any]) -> bool:
         """
         Save a single trail to the GeoJSON file
@@ -44,73 +262,411 @@ class TrailDataManager:
             bool: True if successful, False otherwise
         """
         try:
-            # Load existing trails
-            trails = self.load_all_trails()
-            
-            # Check if trail already exists (by name)
-            existing_trail = None
-            for trail in trails.get('features', []):
-                if trail['properties'].get('name') == trail_data.get('name'):
-                    existing_trail = trail
-                    break
+            self.save_features([self.build_feature(trail_data)])
+            return True
+        except Exception as e:
+            logger.error(f"Error saving trail: {e}")
+            return False
+    
+    def save_trails(self, trails: List[Dict[str, Any]],
+                    delete_names: List[str] = ()) -> List[Dict[str, Any]]:
+        """
+        Validate and save many trails, and delete others, in one write
+        
+        Invalid trails are reported and skipped; the rest are saved together.
+        
+        Args:
+            trails: Trail dictionaries in the format accepted by save_trail
+            delete_names: Names of trails to delete
             
-            # Create GeoJSON feature
-            feature = {
-                "type": "Feature",
-                "properties": {
-                    "name": trail_data.get('name', ''),
-                    "length": trail_data.get('length', 0),
-                    "difficulty": trail_data.get('difficulty', 'moderate'),
-                    "status": trail_data.get('status', 'unhiked'),
-                    "date_hiked": trail_data.get('dateHiked'),
-                    "blog_post": trail_data.get('blogPost', ''),
-                    "images": trail_data.get('images', []),
-                    "created_at": datetime.now().isoformat(),
-                    "updated_at": datetime.now().isoformat(),
-                    "trail_id": trail_data.get('id', str(datetime.now().timestamp()))
-                },
-                "geometry": {
-                    "type": "LineString",
-                    "coordinates": trail_data.get('coordinates', [])
-                }
-            }
+        Returns:
+            One result per trail, then one per deleted name (see save_features)
+        """
+        results = []
+        features = []
+        valid = []
+        for index, trail_data in enumerate(trails):
+            error = validate_trail_data(trail_data)
+            if error:
+                name = trail_data.get('name') if isinstance(trail_data, dict) else None
+                results.append({'op': 'upsert', 'index': index, 'name': name,
+                                'status': 'invalid', 'error': error})
+            else:
+                features.append(self.build_feature(trail_data))
+                valid.append(index)
+                results.append(None)
+        
+        applied = self.save_features(features, delete_names)
+        for index, result in zip(valid, applied):
+            results[index] = dict(result, index=index)
+        return results + applied[len(features):]
+    
+    def save_features(self, features: List[Dict[str, Any]],
+                      delete_names: List[str] = ()) -> List[Dict[str, Any]]:
+        """
+        Upsert and delete many trails with a single load and write
+        
+        Trails are matched by name. Deletes are applied first (removing every
+        trail with that name), then each feature replaces the first trail with
+        the same name or is appended.
+        
+        Args:
+            features: GeoJSON features to add or replace
+            delete_names: Names of trails to delete
             
-            # Update existing trail or add new one
-            if existing_trail:
-                # Update existing trail
-                for i, trail in enumerate(trails.get('features', [])):
-                    if trail['properties'].get('name') == trail_data.get('name'):
-                        trails['features'][i] = feature
-                        trails['features'][i]['properties']['updated_at'] = datetime.now().isoformat()
-                        break
-                logger.info(f"Updated trail: {trail_data.get('name')}")
+        Returns:
+            One result per feature ({'op': 'upsert', 'index', 'name', 'status':
+            'created' or 'updated'}), then one per deleted name ({'op':
+            'delete', 'index', 'name', 'status': 'deleted' or 'not_found'})
+        """
+        delete_names = list(dict.fromkeys(delete_names))
+        for feature in features:
+            self._derive_properties(feature)
+        with self._write_lock:
+            return self._apply_features(features, delete_names)
+    
+    def _apply_features(self, features: List[Dict[str, Any]],
+                        delete_names: List[str]) -> List[Dict[str, Any]]:
+        """Merge features into the stored trails and save them (hold _write_lock)"""
+        # Properties are enough when the backend applies the changes itself
+        trails = self.load_all_trails(include_geometry=not self.storage.supports_queries)
+        # Properties of every trail by name; an upsert replaces the first one
+        existing = {}
+        for trail in trails.get('features', []):
+            existing.setdefault(trail['properties'].get('name'), []).append(trail['properties'])
+        # Properties leaving and entering the collection, for the statistics
+        removed_props = []
+        added_props = []
+        
+        delete_results = []
+        for index, name in enumerate(delete_names):
+            found = existing.pop(name, [])
+            removed_props.extend(found)
+            delete_results.append({'op': 'delete', 'index': index, 'name': name,
+                                   'status': 'deleted' if found else 'not_found'})
+        deleted = {r['name'] for r in delete_results if r['status'] == 'deleted'}
+        
+        upsert_results = []
+        for index, feature in enumerate(features):
+            name = feature['properties'].get('name')
+            same_name = existing.setdefault(name, [])
+            if same_name:
+                removed_props.append(same_name[0])
+                same_name[0] = feature['properties']
+                status = 'updated'
             else:
-                # Add new trail
-                if 'features' not in trails:
-                    trails['features'] = []
-                trails['features'].append(feature)
-                logger.info(f"Added new trail: {trail_data.get('name')}")
+                same_name.append(feature['properties'])
+                status = 'created'
+            added_props.append(feature['properties'])
+            upsert_results.append({'op': 'upsert', 'index': index, 'name': name, 'status': status})
+        
+        if not features and not deleted:
+            return upsert_results + delete_results
+        
+        stats = self._statistics(trails)
+        changes = self._changes()
+        spatial = self.get_spatial_index()
+        
+        if self.storage.supports_queries:
+            # The backend applies deletes and upserts by name itself
+            self.storage.commit(None, upserted=features,
+                                deleted=[{'properties': {'name': name}} for name in deleted])
+            self.invalidate_cache()
+        else:
+            removed = [
+                trail for trail in trails.get('features', [])
+                if trail['properties'].get('name') in deleted
+            ]
+            kept = [
+                trail for trail in trails.get('features', [])
+                if trail['properties'].get('name') not in deleted
+            ]
+            positions = {}
+            for i, trail in enumerate(kept):
+                positions.setdefault(trail['properties'].get('name'), i)
+            for feature in features:
+                name = feature['properties'].get('name')
+                if name in positions:
+                    kept[positions[name]] = feature
+                else:
+                    positions[name] = len(kept)
+                    kept.append(feature)
+            trails['features'] = kept
             
-            # Save to file
-            self.save_geojson(trails)
-            return True
+            # Save to storage (only the changed trails where the layout allows)
+            self.commit_changes(trails, upserted=features, deleted=removed)
+        
+        self._update_statistics(stats, removed_props, added_props)
+        with self._changes_lock:
+            changes.record({
+                feature['properties']['name']: feature_hash(feature) for feature in features
+                if isinstance(feature['properties'].get('name'), str)
+            }, deleted)
+            self._store_changes(changes)
+        with self._spatial_lock:
+            for name in deleted:
+                spatial.remove(name)
+            for feature in features:
+                name = feature['properties'].get('name')
+                bbox = None
+                for props in existing.get(name, []):
+                    # Trails saved before bboxes were stored keep their old extent
+                    bbox = union(bbox, props.get('bbox') or spatial.bboxes.get(name))
+                spatial.set(name, bbox)
+            self._spatial_entry = (self.data_version(), spatial)
+        
+        for result in upsert_results + delete_results:
+            action = {'created': "Added new trail", 'updated': "Updated trail",
+                      'deleted': "Deleted trail"}.get(result['status'])
+            if action:
+                logger.info(f"{action}: {result['name']}")
+        return upsert_results + delete_results
+    
+    def invalidate_cache(self):
+        """Drop the in-memory copy so the next load re-reads the file"""
+        self._cache_entry = None
+        self._index_entry = None
+    
+    def data_version(self) -> str:
+        """
+        Get a token that changes whenever the stored trails change
+        
+        Derived from the storage signature (file stats), so it costs no reads.
+        
+        Returns:
+            Hex string
+        """
+        token = repr((self.storage.layout, self.storage.signature()))
+        return hashlib.sha1(token.encode('utf-8')).hexdigest()[:20]
+    
+    def last_modified(self) -> Optional[datetime]:
+        """
+        Get when the stored trails last changed
+        
+        Returns:
+            UTC datetime, or None if nothing is stored
+        """
+        timestamp = self.storage.last_modified()
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    
+    def trail_version(self, name: str) -> Optional[str]:
+        """
+        Get a content hash of one trail, which only changes when it does
+        
+        Args:
+            name: Trail name
             
-        except Exception as e:
-            logger.error(f"Error saving trail: {e}")
-            return False
+        Returns:
+            Hex string, or None if there is no such trail
+        """
+        return self.get_index().content_hash(name)
+    
+    def feature_version(self, trail: Dict[str, Any]) -> str:
+        """
+        Get a content hash of a loaded trail
+        
+        Like trail_version, but for this trail itself rather than the first
+        with its name, so trails sharing a name get their own versions.
+        
+        Args:
+            trail: Trail feature from load_all_trails or a lookup
+            
+        Returns:
+            Hex string
+        """
+        return self.get_index().feature_hash(trail)
+    
+    def get_index(self) -> TrailIndex:
+        """
+        Get secondary indexes over the current trails
+        
+        Built on first use and reused while the loaded collection is
+        unchanged, which in cached mode lasts until the next write.
+        
+        Returns:
+            TrailIndex for the collection load_all_trails returns
+        """
+        data = self.load_all_trails()
+        entry = self._index_entry
+        if entry is None or entry[0] is not data:
+            entry = (data, TrailIndex(data))
+            self._index_entry = entry
+        return entry[1]
+    
+    def _build_spatial_index(self, data: Dict[str, Any]) -> SpatialIndex:
+        """Index every trail's bbox in one pass"""
+        bboxes = {}
+        for feature in data.get('features', []):
+            name = (feature.get('properties') or {}).get('name')
+            if isinstance(name, str):
+                bboxes[name] = union(bboxes.get(name), feature_bbox(feature))
+        spatial = SpatialIndex()
+        for name, bbox in bboxes.items():
+            spatial.set(name, bbox)
+        return spatial
+    
+    def get_spatial_index(self) -> SpatialIndex:
+        """
+        Get the grid index over trail bounding boxes
+        
+        Built in one pass the first time it is needed (from stored bbox
+        properties, reading coordinates only for trails saved without one)
+        and then updated in place by each save and delete. Rebuilt if the
+        trails were changed by something else.
+        
+        Returns:
+            SpatialIndex for the current data version
+        """
+        version = self.data_version()
+        entry = self._spatial_entry
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        
+        with self._spatial_lock:
+            trails = self.load_all_trails(include_geometry=False)
+            if any(feature_bbox(f) is None for f in trails.get('features', [])):
+                trails = self.load_all_trails()
+            spatial = self._build_spatial_index(trails)
+            self._spatial_entry = (version, spatial)
+            logger.info(f"Built spatial index of {len(spatial)} trails")
+            return spatial
+    
+    def query_trails(self, bbox: Optional[List[float]] = None, **filters) -> Dict[str, Any]:
+        """
+        Get the trails matching filters, answered from the indexes
+        
+        Args:
+            bbox: [min_lon, min_lat, max_lon, max_lat]; keeps trails whose
+                bounding box intersects it (from the spatial index)
+            **filters: Keyword filters accepted by TrailIndex.query (status,
+                difficulty, park, state, trail_id, name, date_from, date_to,
+                min_length, max_length)
+            
+        Returns:
+            Dict containing GeoJSON FeatureCollection of matching trails
+        """
+        if bbox is None:
+            features = self.get_index().query(**filters)
+        else:
+            names = self.get_spatial_index().query(bbox)
+            features = []
+            for feature in self.get_index().query(exact_names=names, **filters):
+                # The index works per name; check each trail's own extent
+                extent = feature_bbox(feature)
+                if extent is not None and intersects(extent, bbox):
+                    features.append(feature)
+        return {
+            "type": "FeatureCollection",
+            "features": features
+        }
+    
+    def simplify_trails(self, trails: Dict[str, Any], level: int) -> Dict[str, Any]:
+        """
+        Copy a FeatureCollection with every geometry at a level of detail
+        
+        Levels are computed once per trail geometry and cached, so only
+        trails whose coordinates changed since the last call are simplified.
+        Within a data version cached trails are found by name without
+        hashing their coordinates.
+        
+        Args:
+            trails: GeoJSON FeatureCollection
+            level: Index into trail_simplify.LOD_ZOOMS (see level_for_zoom
+                and level_for_tolerance)
+            
+        Returns:
+            New FeatureCollection sharing everything but the geometries
+        """
+        version = self.data_version()
+        return dict(trails, features=[
+            dict(feature, geometry=self.geometry_cache.simplify(
+                feature.get('geometry'), level, key=(version, (feature.get('properties') or {}).get('name'))))
+            for feature in trails.get('features', [])
+        ])
+    
+    def get_profile(self, trail: Dict[str, Any], points: int = DEFAULT_POINTS) -> Optional[Dict[str, Any]]:
+        """
+        Get a trail's distance-vs-elevation series, downsampled for charts
+        
+        Cached per trail version, so a profile is computed once after each
+        save of the trail.
+        
+        Args:
+            trail: Stored trail feature
+            points: Most chart points to return
+            
+        Returns:
+            Profile dict (see trail_profile.elevation_profile), or None if the
+            trail has no elevations
+        """
+        version = self.feature_version(trail)
+        return self.profile_cache.profile(version, trail.get('geometry'), points)
+    
+    def get_trails_by_id(self, trail_id: str) -> List[Dict[str, Any]]:
+        """
+        Get every trail with a trail_id
+        
+        Args:
+            trail_id: Trail ID to search for
+            
+        Returns:
+            Matching trails in collection order (trails imported together
+            can share an ID)
+        """
+        return self.get_index().by_id(trail_id)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+        
+        Returns:
+            Dict with cache mode, hits and misses
+        """
+        return {
+            'enabled': self.cached,
+            'hits': self.cache_hits,
+            'misses': self.cache_misses
+        }
     
-    def load_all_trails(self) -> Dict[str, Any]:
+    def load_all_trails(self, include_geometry: bool = True) -> Dict[str, Any]:
         """
-        Load all trails from the GeoJSON file
+        Load all trails from storage
+        
+        In cached mode the parsed FeatureCollection is shared between callers
+        and must be treated as read-only unless it is passed back to save_geojson
+        or commit_changes.
+        
+        Args:
+            include_geometry: If False, return properties only (null geometry);
+                backends with lazy geometry then skip reading coordinates
         
         Returns:
             Dict containing GeoJSON FeatureCollection
         """
+        if not include_geometry:
+            if self.storage.lazy_geometry:
+                data = self.storage.load_metadata()
+            else:
+                data = strip_geometry(self.load_all_trails())
+            return data or {"type": "FeatureCollection", "features": []}
+        
         try:
-            if os.path.exists(self.trails_file):
-                with open(self.trails_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+            signature = None
+            if self.cached:
+                signature = self.storage.signature()
+                entry = self._cache_entry
+                if entry is not None and signature is not None and entry[0] == signature:
+                    self.cache_hits += 1
+                    return entry[1]
+                self.cache_misses += 1
+            
+            data = self.storage.load()
+            if data is not None:
                 logger.info(f"Loaded {len(data.get('features', []))} trails")
+                if self.cached:
+                    self._cache_entry = (signature, data)
                 return data
             else:
                 # Return empty FeatureCollection
@@ -135,11 +691,22 @@ class TrailDataManager:
         Returns:
             Trail data dictionary or None if not found
         """
-        trails = self.load_all_trails()
-        for trail in trails.get('features', []):
-            if trail['properties'].get('name') == name:
-                return trail
-        return None
+        if self.storage.supports_queries and not self.cached:
+            return self.storage.get_trail_by_name(name)
+        return self.get_index().by_exact_name(name)
+    
+    def get_trails_by_name(self, name: str) -> List[Dict[str, Any]]:
+        """
+        Get every trail with exactly this name
+        
+        Args:
+            name: Trail name to search for
+            
+        Returns:
+            Matching trails in collection order (deleting by name removes
+            all of them)
+        """
+        return self.get_index().by_all_exact_name(name)
     
     def delete_trail(self, name: str) -> bool:
         """
@@ -152,42 +719,299 @@ class TrailDataManager:
             bool: True if successful, False otherwise
         """
         try:
-            trails = self.load_all_trails()
-            original_count = len(trails.get('features', []))
-            
-            # Remove trail
-            trails['features'] = [
-                trail for trail in trails.get('features', [])
-                if trail['properties'].get('name') != name
-            ]
-            
-            if len(trails['features']) < original_count:
-                self.save_geojson(trails)
-                logger.info(f"Deleted trail: {name}")
+            result = self.save_features([], delete_names=[name])[0]
+            if result['status'] == 'deleted':
                 return True
-            else:
-                logger.warning(f"Trail not found: {name}")
-                return False
-                
+            logger.warning(f"Trail not found: {name}")
+            return False
         except Exception as e:
             logger.error(f"Error deleting trail: {e}")
             return False
     
     def save_geojson(self, data: Dict[str, Any]):
         """
-        Save GeoJSON data to file
+        Save GeoJSON data, replacing everything in storage
         
         Args:
             data: GeoJSON data to save
         """
+        with self._write_lock:
+            self._replace_all(data)
+    
+    def _replace_all(self, data: Dict[str, Any]):
+        """Save data in place of everything stored (hold _write_lock)"""
+        try:
+            changes = self._changes()
+            for feature in data.get('features', []):
+                self._derive_properties(feature)
+            self.storage.save(data)
+            self._adopt(data)
+            with self._stats_lock:
+                self._store_statistics(TrailStatistics.from_properties(
+                    feature.get('properties') or {} for feature in data.get('features', [])
+                ))
+            with self._changes_lock:
+                changes.reconcile(self._trail_hashes(data))
+                self._store_changes(changes)
+            with self._spatial_lock:
+                self._spatial_entry = (self.data_version(), self._build_spatial_index(data))
+        except Exception as e:
+            self.invalidate_cache()
+            logger.error(f"Error saving GeoJSON: {e}")
+            raise
+    
+    def commit_changes(self, data: Dict[str, Any], upserted: List[Dict[str, Any]] = (),
+                       deleted: List[Dict[str, Any]] = ()):
+        """
+        Save GeoJSON data after a few features changed
+        
+        Storage layouts that keep trails separately only write the changed
+        features; the single-file layout rewrites the whole file.
+        
+        Args:
+            data: GeoJSON data, already containing the changes
+            upserted: Features that were added or replaced
+            deleted: Features that were removed
+        """
         try:
-            with open(self.trails_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            logger.info(f"Saved GeoJSON to: {self.trails_file}")
+            self.storage.commit(data, upserted=upserted, deleted=deleted)
+            self._adopt(data)
         except Exception as e:
+            self.invalidate_cache()
             logger.error(f"Error saving GeoJSON: {e}")
             raise
     
+    def compact_storage(self):
+        """Fold any journaled changes into trails.geojson and wait for it"""
+        self.storage.compact(background=False)
+    
+    def _adopt(self, data: Dict[str, Any]):
+        """Cache data we just wrote instead of re-reading it"""
+        self._index_entry = None
+        if self.cached:
+            self._cache_entry = (self.storage.signature(), data)
+    
+    def _statistics(self, trails: Optional[Dict[str, Any]] = None) -> TrailStatistics:
+        """
+        Get the statistics aggregates for the current data version
+        
+        Uses the in-memory copy or stats_file when their version matches, and
+        otherwise recomputes them (from trails if given) and saves them.
+        """
+        version = self.data_version()
+        entry = self._stats_entry
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        
+        try:
+            saved = load_file(self.stats_file)
+            if saved.get('version') == version:
+                stats = TrailStatistics.from_dict(saved['statistics'])
+                self._stats_entry = (version, stats)
+                return stats
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        
+        if trails is None:
+            trails = self.load_all_trails(include_geometry=False)
+        stats = TrailStatistics.from_properties(
+            feature.get('properties') or {} for feature in trails.get('features', [])
+        )
+        with self._stats_lock:
+            self._store_statistics(stats)
+        logger.info("Recomputed trail statistics")
+        return stats
+    
+    def _store_statistics(self, stats: TrailStatistics):
+        """Save aggregates for the current data version (hold _stats_lock)"""
+        version = self.data_version()
+        self._stats_entry = (version, stats)
+        try:
+            dump_file(self.stats_file, {'version': version, 'statistics': stats.to_dict()})
+        except OSError as e:
+            # The aggregates are only a cache of the trail data
+            logger.warning(f"Could not save statistics: {e}")
+    
+    def _update_statistics(self, before: TrailStatistics, removed: List[Dict[str, Any]],
+                           added: List[Dict[str, Any]]):
+        """Apply the properties a write removed and added to the aggregates from before it"""
+        stats = TrailStatistics.from_dict(before.to_dict())
+        for props in removed:
+            stats.remove(props)
+        for props in added:
+            stats.add(props)
+        with self._stats_lock:
+            self._store_statistics(stats)
+    
+    def check_statistics(self, repair: bool = True) -> Dict[str, Any]:
+        """
+        Compare the maintained aggregates with a full recompute
+        
+        Args:
+            repair: Replace the aggregates with the recomputed ones if they differ
+            
+        Returns:
+            Dict with consistent (bool), stored and recomputed aggregates
+        """
+        stored = self._statistics()
+        trails = self.load_all_trails(include_geometry=False)
+        recomputed = TrailStatistics.from_properties(
+            feature.get('properties') or {} for feature in trails.get('features', [])
+        )
+        consistent = stored.matches(recomputed)
+        if not consistent:
+            logger.warning("Trail statistics were out of date")
+            if repair:
+                with self._stats_lock:
+                    self._store_statistics(recomputed)
+        return {
+            'consistent': consistent,
+            'stored': stored.to_dict(),
+            'recomputed': recomputed.to_dict()
+        }
+    
+    def _trail_hashes(self, data: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """Content hash of the first trail with each name (current trails if data is None)"""
+        if data is None:
+            index = self.get_index()
+            features, content_hash = index.features, index.content_hash
+        else:
+            features, content_hash = data.get('features', []), None
+        hashes = {}
+        for feature in features:
+            name = (feature.get('properties') or {}).get('name')
+            if isinstance(name, str) and name not in hashes:
+                hashes[name] = content_hash(name) if content_hash else feature_hash(feature)
+        return hashes
+    
+    def _changes(self) -> ChangeLog:
+        """
+        Get the change log for the current data version
+        
+        Uses the in-memory copy or changes_file when their version matches.
+        Otherwise the trails were changed by something else (or the journal
+        was compacted), so the log is brought up to date by comparing content
+        hashes; without a saved log a new one starts at version 1.
+        """
+        version = self.data_version()
+        entry = self._changes_entry
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        
+        with self._changes_lock:
+            try:
+                saved = load_file(self.changes_file)
+                changes = ChangeLog.from_dict(saved['log'])
+            except (OSError, ValueError, KeyError, TypeError):
+                changes = None
+            else:
+                if saved.get('data_version') == version:
+                    self._changes_entry = (version, changes)
+                    return changes
+            
+            hashes = self._trail_hashes()
+            if changes is None:
+                changes = ChangeLog()
+                changes.hashes = hashes
+                logger.info("Started trail change log")
+            elif changes.reconcile(hashes) != saved['log']['version']:
+                logger.info("Recorded trail changes made outside the data manager")
+            self._store_changes(changes)
+            return changes
+    
+    def _store_changes(self, changes: ChangeLog):
+        """Prune and save the change log for the current data version (hold _changes_lock)"""
+        pruned = changes.prune(self.change_retention_days)
+        if pruned:
+            logger.info(f"Pruned {pruned} trail change records")
+        version = self.data_version()
+        self._changes_entry = (version, changes)
+        try:
+            dump_file(self.changes_file, {'data_version': version, 'log': changes.to_dict()})
+        except OSError as e:
+            # Losing the log only costs clients a full resync
+            logger.warning(f"Could not save change log: {e}")
+    
+    def change_version(self) -> int:
+        """
+        Get the current change version
+        
+        Returns:
+            Number that increases with every write that changes trails
+        """
+        return self._changes().version
+    
+    def get_changes(self, since: int) -> Dict[str, Any]:
+        """
+        Get the trails added, replaced or deleted after a change version
+        
+        Args:
+            since: Change version the caller last synced to (0 if never)
+            
+        Returns:
+            Dict with version (to pass as since next time), since,
+            full_resync, upserted (current features) and deleted (names).
+            full_resync is True, with nothing listed, when since is older
+            than the retained change records or unknown to this store; the
+            caller should then reload every trail.
+        """
+        changes = self._changes()
+        with self._changes_lock:
+            version = changes.version
+            listed = changes.changes_since(since)
+        if listed is None:
+            return {'version': version, 'since': since, 'full_resync': True,
+                    'upserted': [], 'deleted': []}
+        
+        upserted_names, deleted = listed
+        index = self.get_index()
+        upserted = [index.by_exact_name(name) for name in upserted_names]
+        return {
+            'version': version,
+            'since': since,
+            'full_resync': False,
+            # A trail deleted since the log was read is listed next time
+            'upserted': [feature for feature in upserted if feature is not None],
+            'deleted': deleted
+        }
+    
+    def backup_metadata(self) -> Dict[str, Any]:
+        """
+        Get the metadata block written into backups and exports
+        
+        Returns:
+            Dict with totalTrails, hikedTrails, totalMiles, totalImages and
+            backupCreated
+        """
+        stats = self._statistics()
+        return {
+            'totalTrails': stats.total_trails,
+            'hikedTrails': stats.hiked_trails,
+            'totalMiles': stats.total_miles,
+            'totalImages': stats.total_images,
+            'backupCreated': datetime.now().isoformat()
+        }
+    
+    def export_geojson(self, output_file: str = None) -> str:
+        """
+        Export all trails as a plain GeoJSON FeatureCollection
+        
+        Used to produce data/trails.geojson for deploy.py and the static site
+        when trails are kept in another storage layout.
+        
+        Args:
+            output_file: Output file path (defaults to trails.geojson)
+            
+        Returns:
+            str: Path to exported file
+        """
+        output_file = output_file or self.trails_file
+        data = self.load_all_trails()
+        # Pretty, like trails.geojson itself, since the export is committed to git
+        dump_file(output_file, data, pretty=True)
+        logger.info(f"Exported GeoJSON to: {output_file}")
+        return output_file
+    
     def export_trail_data(self, output_file: str = None) -> str:
         """
         Export all trail data to a file with metadata
@@ -204,27 +1028,16 @@ class TrailDataManager:
         
         try:
             geojson_data = self.load_all_trails()
-            trails = geojson_data.get('features', [])
-            
-            # Calculate metadata
-            total_images = sum(len(t['properties'].get('images', [])) for t in trails)
             
             # Create backup with metadata
             backup_data = {
                 'timestamp': datetime.now().isoformat(),
                 'version': '2.0',
-                'metadata': {
-                    'totalTrails': len(trails),
-                    'hikedTrails': sum(1 for t in trails if t['properties'].get('status') == 'hiked'),
-                    'totalMiles': sum(t['properties'].get('length', 0) for t in trails),
-                    'totalImages': total_images,
-                    'backupCreated': datetime.now().isoformat()
-                },
+                'metadata': self.backup_metadata(),
                 'geojson': geojson_data
             }
             
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, indent=2, ensure_ascii=False)
+            dump_file(output_file, backup_data)
             logger.info(f"Exported trail data to: {output_file}")
             return output_file
         except Exception as e:
@@ -243,8 +1056,7 @@ class TrailDataManager:
             bool: True if successful, False otherwise
         """
         try:
-            with open(import_file, 'r', encoding='utf-8') as f:
-                import_data = json.load(f)
+            import_data = load_file(import_file)
             
             # Check if this is a backup format (v2.0) or plain GeoJSON
             if 'geojson' in import_data and 'metadata' in import_data:
@@ -270,24 +1082,22 @@ class TrailDataManager:
                 return True
             else:
                 # Merge with existing data
-                existing_trails = self.load_all_trails()
+                existing_trails = self.load_all_trails(include_geometry=False)
                 existing_names = {
                     trail['properties'].get('name') 
                     for trail in existing_trails.get('features', [])
                 }
                 
-                imported_count = 0
+                imported = []
                 for feature in geojson_data.get('features', []):
                     trail_name = feature['properties'].get('name')
                     if trail_name and trail_name not in existing_names:
-                        if 'features' not in existing_trails:
-                            existing_trails['features'] = []
-                        existing_trails['features'].append(feature)
-                        imported_count += 1
+                        existing_names.add(trail_name)
+                        imported.append(feature)
                 
-                # Save merged data
-                self.save_geojson(existing_trails)
-                logger.info(f"Imported {imported_count} new trails from: {import_file}")
+                # Save merged data in one write
+                self.save_features(imported)
+                logger.info(f"Imported {len(imported)} new trails from: {import_file}")
                 return True
             
         except Exception as e:
@@ -298,25 +1108,17 @@ class TrailDataManager:
         """
         Get statistics about the trail data
         
+        Served from aggregates kept up to date by every save and delete
+        rather than a scan (see check_statistics).
+        
         Returns:
             Dict containing statistics
         """
-        trails = self.load_all_trails()
-        features = trails.get('features', [])
-        
-        total_trails = len(features)
-        hiked_trails = sum(1 for trail in features if trail['properties'].get('status') == 'hiked')
-        total_miles = sum(
-            trail['properties'].get('length', 0) 
-            for trail in features 
-            if trail['properties'].get('status') == 'hiked'
-        )
-        
-        # Difficulty breakdown
-        difficulties = {}
-        for trail in features:
-            difficulty = trail['properties'].get('difficulty', 'unknown')
-            difficulties[difficulty] = difficulties.get(difficulty, 0) + 1
+        stats = self._statistics()
+        total_trails = stats.total_trails
+        hiked_trails = stats.hiked_trails
+        total_miles = stats.hiked_miles
+        difficulties = dict(stats.difficulties)
         
         return {
             'total_trails': total_trails,
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Move existing trail images into the content-addressed image store
+
+Uploads are stored by content hash as they arrive; run this once for images
+uploaded before that. Identical photos (the same upload saved under several
+names or trails) end up sharing one file.
+
+Usage:
+    python dedupe_images.py
+    python dedupe_images.py --images-dir data/trail_images
+"""
+
+import argparse
+import os
+import sys
+import time
+from image_store import ImageStore
+
+
+def dedupe(images_dir='data/trail_images'):
+    """Adopt every trail image into the store and report the space saved"""
+    print("=" * 70)
+    print("DEDUPLICATING TRAIL IMAGES")
+    print("=" * 70)
+
+    if not os.path.isdir(images_dir):
+        print(f"\n[ERROR] {images_dir} not found")
+        return False
+
+    store = ImageStore(images_dir)
+    start = time.perf_counter()
+    adopted = shared = saved = 0
+    for entry in sorted(os.scandir(images_dir), key=lambda e: e.name):
+        if not (entry.is_dir() and entry.name.startswith('trail-')):
+            continue
+        for image in sorted(os.scandir(entry.path), key=lambda e: e.name):
+            if not image.is_file() or not image.name.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
+                continue
+            if store.is_ref(image.path):
+                continue
+            size = image.stat().st_size
+            adopted += 1
+            if store.adopt(image.path):
+                shared += 1
+                saved += size
+                print(f"   [=] {entry.name}/{image.name} duplicates a stored image")
+    elapsed = time.perf_counter() - start
+
+    stats = store.stats()
+    print(f"\n[OK] Adopted {adopted} images, {shared} of them duplicates ({elapsed:.1f} s)")
+    print(f"   - Saved: {saved / (1024 * 1024):.2f} MB")
+    print(f"   - Store: {stats['blobs']} files for {stats['references']} images, "
+          f"{stats['bytes'] / (1024 * 1024):.2f} MB")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move existing trail images into the content-addressed image store")
+    parser.add_argument('--images-dir', default='data/trail_images', help="trail images directory")
+    args = parser.parse_args()
+    return dedupe(args.images_dir)
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(0 if main() else 1)
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
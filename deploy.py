@@ -4,12 +4,13 @@ Trail Blogger Deployment Script
 Automates the process of deploying localhost:5000 changes to GitHub Pages
 """
 
-import json
 import os
 import subprocess
 import sys
 from datetime import datetime
 from pathlib import Path
+from image_catalog import ImageCatalog
+from json_io import load_file
 
 def print_header(text):
     """Print a formatted header"""
@@ -29,6 +30,37 @@ def print_warning(text):
     """Print warning message"""
     print(f"[!] {text}")
 
+def refresh_trails_geojson():
+    """Bring trails.geojson up to date as plain GeoJSON for the static site"""
+    # Same settings the server uses to pick its storage backend and encoding
+    layout = os.environ.get('TRAIL_STORAGE_LAYOUT', 'single')
+    encoded = bool(os.environ.get('TRAIL_COORDINATE_ENCODING'))
+    journal_files = [p for p in ('data/trails.journal', 'data/trails.journal.compacting') if os.path.exists(p)]
+    # A journal left behind by another layout holds old changes; replaying it
+    # would undo edits made since, so only the journal layout compacts
+    journaled = layout == 'journal' and bool(journal_files)
+    exported = layout not in ('single', 'journal') or encoded
+    if journal_files and layout != 'journal':
+        print_warning(f"Ignoring {', '.join(journal_files)} (TRAIL_STORAGE_LAYOUT is {layout}); "
+                      "migrate_storage.py --from journal folds a journal in")
+    if not exported and not journaled:
+        return True
+    
+    print_header("UPDATING TRAILS.GEOJSON")
+    
+    try:
+        from data_manager import TrailDataManager
+        if journaled:
+            TrailDataManager(layout='journal').compact_storage()
+            print_success("Compacted data/trails.journal into data/trails.geojson")
+        if exported:
+            TrailDataManager(layout=layout).export_geojson('data/trails.geojson')
+            print_success(f"Regenerated plain data/trails.geojson from the {layout} storage")
+        return True
+    except Exception as e:
+        print_error(f"Could not update trails.geojson: {e}")
+        return False
+
 def check_data_integrity():
     """Verify trail data is valid"""
     print_header("CHECKING DATA INTEGRITY")
@@ -42,10 +74,9 @@ def check_data_integrity():
     
     # Check if valid JSON
     try:
-        with open(trails_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_file(trails_file)
         print_success("trails.geojson is valid JSON")
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         print_error(f"trails.geojson is not valid JSON: {e}")
         return False
     
@@ -80,9 +111,11 @@ def check_image_files():
     print_header("CHECKING IMAGE FILES")
     
     trails_file = 'data/trails.geojson'
-    with open(trails_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_file(trails_file)
     
+    # Images are stored as just filenames; the catalog lists each trail's
+    # directory only if it changed since the last check
+    catalog = ImageCatalog('data/trail_images')
     missing_images = []
     total_images = 0
     
@@ -91,13 +124,9 @@ def check_image_files():
         trail_id = props.get('trail_id')
         images = props.get('images', [])
         
-        for img in images:
-            total_images += 1
-            # Images are stored as just filenames
-            img_path = f"data/trail_images/trail-{trail_id}/{img}"
-            
-            if not os.path.exists(img_path):
-                missing_images.append(img_path)
+        total_images += len(images)
+        for img in catalog.missing(trail_id, images):
+            missing_images.append(f"data/trail_images/trail-{trail_id}/{img}")
     
     if missing_images:
         print_warning(f"{len(missing_images)} images referenced but not found:")
@@ -229,7 +258,7 @@ def main():
     print("This will deploy your localhost:5000 changes to GitHub Pages\n")
     
     # Step 1: Check data integrity
-    if not check_data_integrity():
+    if not refresh_trails_geojson() or not check_data_integrity():
         print_error("Data integrity check failed. Fix errors and try again.")
         sys.exit(1)
     
@@ -1,10 +1,9 @@
 #!/usr/bin/env python3
 """Diagnose image path and GPS line issues"""
 
-import json
+from json_io import load_file
 
-with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+data = load_file('data/trails.geojson')
 
 print("=" * 70)
 print("DIAGNOSING ISSUES")
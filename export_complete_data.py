@@ -3,11 +3,59 @@
 Export complete trail data from Flask server and merge with backup
 """
 
-import json
 from datetime import datetime
 import os
 import urllib.request
 import urllib.error
+from json_io import dump_file, load_file, loads
+
+API_URL = 'http://localhost:5000/api'
+
+# Trails fetched by the last run and the change version they reflect, so the
+# next run only downloads what changed since
+SYNC_STATE_FILE = 'data/export_sync.json'
+
+def fetch_json(path):
+    """GET an API path and parse the JSON response"""
+    with urllib.request.urlopen(API_URL + path) as response:
+        return loads(response.read())
+
+def fetch_trails():
+    """Fetch all trails, downloading only the changes since the last run when possible"""
+    state = None
+    if os.path.exists(SYNC_STATE_FILE):
+        try:
+            state = load_file(SYNC_STATE_FILE)
+        except ValueError:
+            print(f"   [!] Ignoring unreadable {SYNC_STATE_FILE}")
+    since = state['version'] if state else 0
+    
+    try:
+        changes = fetch_json(f'/trails/changes?since={since}')
+    except urllib.error.HTTPError:
+        # Server without delta sync
+        changes = {'version': None, 'full_resync': True}
+    
+    if changes['full_resync']:
+        trails = fetch_json('/trails')
+    else:
+        trails = state['geojson']
+        deleted = set(changes['deleted'])
+        features = [f for f in trails['features'] if f['properties'].get('name') not in deleted]
+        positions = {f['properties'].get('name'): i for i, f in enumerate(features)}
+        for feature in changes['upserted']:
+            name = feature['properties'].get('name')
+            if name in positions:
+                features[positions[name]] = feature
+            else:
+                positions[name] = len(features)
+                features.append(feature)
+        trails['features'] = features
+        print(f"   Synced {len(changes['upserted'])} changed and {len(deleted)} deleted trails since version {since}")
+    
+    if changes['version'] is not None:
+        dump_file(SYNC_STATE_FILE, {'version': changes['version'], 'geojson': trails})
+    return trails
 
 def export_complete_data():
     """Export all trail data from Flask server"""
@@ -19,8 +67,7 @@ def export_complete_data():
     # 1. Get current data from Flask API
     print("\n[1/5] Fetching trail data from Flask server...")
     try:
-        with urllib.request.urlopen('http://localhost:5000/api/trails') as response:
-            flask_data = json.loads(response.read().decode('utf-8'))
+        flask_data = fetch_trails()
         print(f"   Found {len(flask_data.get('features', []))} trails from Flask API")
     except Exception as e:
         print(f"   [ERROR] Could not connect to Flask server: {e}")
@@ -33,14 +80,13 @@ def export_complete_data():
     
     if os.path.exists(backup_file):
         print(f"\n[2/5] Loading backup file...")
-        with open(backup_file, 'r', encoding='utf-8') as f:
-            backup_data = json.load(f)
-            for trail in backup_data.get('trails', []):
-                trail_id = str(trail.get('trailId'))
-                backup_trails[trail_id] = {
-                    'name': trail.get('trailName', ''),
-                    'images': trail.get('images', [])
-                }
+        backup_data = load_file(backup_file)
+        for trail in backup_data.get('trails', []):
+            trail_id = str(trail.get('trailId'))
+            backup_trails[trail_id] = {
+                'name': trail.get('trailName', ''),
+                'images': trail.get('images', [])
+            }
         print(f"   Found {len(backup_trails)} trails in backup with real names")
     else:
         print(f"\n[2/5] No backup file found at {backup_file}")
@@ -82,14 +128,12 @@ def export_complete_data():
     
     # Full backup
     full_backup = f"data/trails_complete_backup_{timestamp}.geojson"
-    with open(full_backup, 'w', encoding='utf-8') as f:
-        json.dump(complete_data, f, indent=2)
+    dump_file(full_backup, complete_data)
     print(f"   [OK] Complete backup: {full_backup}")
     
     # Also save as current trails.geojson
     print("\n[5/5] Updating trails.geojson...")
-    with open('data/trails.geojson', 'w', encoding='utf-8') as f:
-        json.dump(complete_data, f, indent=2)
+    dump_file('data/trails.geojson', complete_data, pretty=True)
     print(f"   [OK] Updated: data/trails.geojson")
     
     # Print summary
@@ -3,8 +3,9 @@
 Final cleanup - merge remaining duplicates and clean up data
 """
 
-import json
 from datetime import datetime
+from json_io import dump_file
+from data_manager import TrailDataManager
 
 def final_cleanup():
     """Clean up remaining duplicates and data issues"""
@@ -14,10 +15,14 @@ def final_cleanup():
     print("=" * 70)
     
     # Load trails
-    with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    manager = TrailDataManager()
+    data = manager.load_all_trails()
     
     features = data['features']
+    # Names as stored, so renamed and removed trails can be deleted by name
+    original_names = {id(f): f['properties'].get('name') for f in features}
+    changed = set()
+    removed_names = []
     
     # Manual mappings for remaining matches
     # Format: (trail_with_images_name, trail_with_gps_name)
@@ -58,6 +63,8 @@ def final_cleanup():
             img_feature['properties']['name'] = img_feature['properties']['name'].strip()  # Clean name
             img_feature['properties']['updated_at'] = datetime.now().isoformat()
             indices_to_remove.append(gps_idx)
+            changed.add(id(img_feature))
+            removed_names.append(original_names[id(gps_feature)])
             print(f"  [+] Merged '{img_name.strip()}' with GPS")
             merged += 1
     
@@ -77,6 +84,7 @@ def final_cleanup():
         new_name = old_name.strip()
         if old_name != new_name:
             props['name'] = new_name
+            changed.add(id(feature))
             cleaned += 1
             print(f"  [+] Cleaned: '{old_name}' -> '{new_name}'")
     
@@ -86,13 +94,15 @@ def final_cleanup():
     # Save
     print("\n[3/3] Saving...")
     backup_file = f"data/trails_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson"
-    with open(backup_file, 'w', encoding='utf-8') as f:
-        with open('data/trails.geojson', 'r') as orig:
-            json.dump(json.load(orig), f, indent=2)
+    dump_file(backup_file, manager.load_all_trails())
     print(f"  [OK] Backup: {backup_file}")
     
-    with open('data/trails.geojson', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    # Write the changed trails and drop old names in one batch
+    changed_features = [f for f in features if id(f) in changed]
+    for feature in changed_features:
+        if original_names[id(feature)] != feature['properties']['name']:
+            removed_names.append(original_names[id(feature)])
+    manager.save_features(changed_features, delete_names=removed_names)
     print(f"  [OK] Saved: data/trails.geojson")
     
     # Final summary
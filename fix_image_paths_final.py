@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 """Fix image paths to store only filenames (not full paths)"""
 
-import json
+import os
 from datetime import datetime
+from image_catalog import ImageCatalog
+from json_io import dump_file, load_file
 
 def fix_image_paths():
     """Convert full image paths to just filenames"""
@@ -12,8 +14,7 @@ def fix_image_paths():
     print("=" * 70)
     
     # Load trails
-    with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_file('data/trails.geojson')
     
     fixed_count = 0
     
@@ -45,16 +46,21 @@ def fix_image_paths():
     
     print(f"\n[OK] Fixed {fixed_count} image paths")
     
+    # Report images whose files are not on disk
+    catalog = ImageCatalog('data/trail_images')
+    for feature in data['features']:
+        props = feature['properties']
+        filenames = [os.path.basename(img) for img in props.get('images', [])]
+        for filename in catalog.missing(props.get('trail_id'), filenames):
+            print(f"   [!] {props.get('name', 'Unknown')}: {filename} not found")
+    
     # Create backup
     backup_file = f"data/trails_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson"
-    with open(backup_file, 'w', encoding='utf-8') as f:
-        with open('data/trails.geojson', 'r') as orig:
-            json.dump(json.load(orig), f, indent=2)
+    dump_file(backup_file, load_file('data/trails.geojson'))
     print(f"[OK] Backup: {backup_file}")
     
     # Save fixed data
-    with open('data/trails.geojson', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    dump_file('data/trails.geojson', data, pretty=True)
     print(f"[OK] Saved: data/trails.geojson")
     
     print("\n" + "=" * 70)
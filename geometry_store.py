@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Columnar Geometry Store
+Keeps every trail coordinate in one memory-mapped float64 array
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Any
+import logging
+
+import numpy as np
+
+from json_io import dump_file, load_file
+from trail_storage import TrailStorage, file_signature
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COORD_DTYPE = np.dtype('<f8')
+
+
+def flatten_coordinates(coordinates: Any) -> tuple:
+    """
+    Flatten uniform 2D/3D LineString coordinates into a float64 array
+
+    Returns:
+        (dims, array) - dims is 0 and array None when the coordinates cannot
+        be stored as a flat array (empty, nested or mixed dimensions)
+    """
+    if not coordinates or not isinstance(coordinates[0], list):
+        return 0, None
+    dims = len(coordinates[0])
+    if dims not in (2, 3) or any(not isinstance(c, list) or len(c) != dims for c in coordinates):
+        return 0, None
+    try:
+        values = np.asarray(coordinates, dtype=COORD_DTYPE)
+    except (TypeError, ValueError):
+        return 0, None
+    return dims, values.reshape(-1)
+
+
+class ColumnarTrailStorage(TrailStorage):
+    """
+    Trail properties in a small index file, coordinates in one flat array
+
+    data/trail_columns/index.json holds every trail's properties plus the
+    offset, point count and dimensions of its coordinates inside
+    coordinates.<generation>.f64, which is memory-mapped. Metadata loads
+    without touching geometry, and single-trail lookups materialise only that
+    trail's coordinates. Saves append to the array; the space left behind by
+    replaced or deleted trails is reclaimed by compact().
+
+    load() materialises every trail as nested lists, and a cached
+    TrailDataManager (the server) keeps that whole collection, so there the
+    resident memory matches the GeoJSON layouts; the lazy paths pay off for
+    load_metadata() and uncached lookups (see docs/DEVELOPMENT.md).
+    """
+
+    layout = 'columnar'
+    supports_queries = True
+    lazy_geometry = True
+
+    def __init__(self, store_dir: str, compact_ratio: float = 0.5):
+        """
+        Args:
+            store_dir: Directory for the index and coordinate files
+            compact_ratio: Compact automatically once this fraction of the
+                coordinate array is no longer referenced
+        """
+        self.store_dir = store_dir
+        self.index_file = os.path.join(store_dir, "index.json")
+        self.compact_ratio = compact_ratio
+        self._lock = threading.Lock()
+        self._mapped = None
+
+    def signature(self) -> Optional[tuple]:
+        """Stat signature of the index, which is rewritten on every change"""
+        return file_signature(self.index_file)
+
+    def _read_index(self) -> Optional[Dict[str, Any]]:
+        """Return the index, or None if nothing has been stored yet"""
+        if not os.path.exists(self.index_file):
+            return None
+        return load_file(self.index_file)
+
+    def _coordinates(self, index: Dict[str, Any]) -> np.ndarray:
+        """Memory-map the coordinate file named by the index"""
+        path = os.path.join(self.store_dir, index['coordinates_file'])
+        size = os.path.getsize(path)
+        mapped = self._mapped
+        if mapped is None or mapped[0] != path or mapped[1] != size:
+            if size < COORD_DTYPE.itemsize:
+                array = np.empty(0, dtype=COORD_DTYPE)
+            else:
+                array = np.memmap(path, dtype=COORD_DTYPE, mode='r',
+                                  shape=(size // COORD_DTYPE.itemsize,))
+            mapped = (path, size, array)
+            self._mapped = mapped
+        return mapped[2]
+
+    @staticmethod
+    def _geometry(entry: Dict[str, Any], coords: np.ndarray) -> Dict[str, Any]:
+        """Materialise one trail's geometry from the coordinate array"""
+        if entry['dims']:
+            start = entry['offset']
+            values = coords[start:start + entry['count'] * entry['dims']]
+            coordinates = values.reshape(-1, entry['dims']).tolist()
+        else:
+            coordinates = entry.get('coordinates', [])
+        return {"type": entry.get('geometry_type'), "coordinates": coordinates}
+
+    def _feature(self, entry: Dict[str, Any], coords: Optional[np.ndarray]) -> Dict[str, Any]:
+        """Build a feature from an index entry (geometry None without coords)"""
+        return {
+            "type": "Feature",
+            "properties": entry['properties'],
+            "geometry": None if coords is None else self._geometry(entry, coords)
+        }
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Load every trail with its geometry
+
+        Returns:
+            GeoJSON FeatureCollection, or None if nothing has been stored yet
+        """
+        with self._lock:
+            index = self._read_index()
+            if index is None:
+                return None
+            coords = self._coordinates(index)
+            return {
+                "type": "FeatureCollection",
+                "features": [self._feature(entry, coords) for entry in index['trails']]
+            }
+
+    def load_metadata(self) -> Optional[Dict[str, Any]]:
+        """
+        Load every trail's properties without reading any coordinates
+
+        Returns:
+            GeoJSON FeatureCollection with null geometries, or None if empty
+        """
+        index = self._read_index()
+        if index is None:
+            return None
+        return {
+            "type": "FeatureCollection",
+            "features": [self._feature(entry, None) for entry in index['trails']]
+        }
+
+    def _entry(self, feature: Dict[str, Any], offset: int) -> tuple:
+        """Build an index entry and the values to store for a feature"""
+        geometry = feature.get('geometry') or {}
+        dims, values = flatten_coordinates(geometry.get('coordinates', []))
+        entry = {
+            'properties': feature.get('properties', {}),
+            'geometry_type': geometry.get('type'),
+            'dims': dims,
+            'offset': offset if dims else 0,
+            'count': len(values) // dims if dims else 0
+        }
+        if not dims:
+            entry['coordinates'] = geometry.get('coordinates', [])
+        return entry, values
+
+    def _write_generation(self, generation: int, entries_and_values: List[tuple]):
+        """Write a fresh coordinate file and index, then drop the old file"""
+        os.makedirs(self.store_dir, exist_ok=True)
+        old_index = self._read_index()
+        coordinates_file = f"coordinates.{generation}.f64"
+        offset = 0
+        entries = []
+        with open(os.path.join(self.store_dir, coordinates_file), 'wb') as f:
+            for entry, values in entries_and_values:
+                if values is not None:
+                    entry['offset'] = offset
+                    f.write(values.astype(COORD_DTYPE, copy=False).tobytes())
+                    offset += len(values)
+                entries.append(entry)
+            f.flush()
+            os.fsync(f.fileno())
+        dump_file(self.index_file, {
+            'version': 1,
+            'generation': generation,
+            'coordinates_file': coordinates_file,
+            'dead_values': 0,
+            'trails': entries
+        })
+        # Unmap before removing so the old file can be deleted on Windows
+        self._mapped = None
+        if old_index and old_index['coordinates_file'] != coordinates_file:
+            try:
+                os.remove(os.path.join(self.store_dir, old_index['coordinates_file']))
+            except OSError:
+                pass
+
+    def save(self, data: Dict[str, Any]):
+        """Replace the stored collection with data"""
+        with self._lock:
+            index = self._read_index()
+            generation = index['generation'] + 1 if index else 1
+            self._write_generation(generation, [
+                self._entry(feature, 0) for feature in data.get('features', [])
+            ])
+        logger.info(f"Saved {len(data.get('features', []))} trails to: {self.store_dir}")
+
+    def commit(self, data: Optional[Dict[str, Any]], upserted: List[Dict[str, Any]] = (),
+               deleted: List[Dict[str, Any]] = ()):
+        """
+        Apply deletes and upserts by trail name, appending new coordinates
+
+        Args:
+            data: Ignored - the store applies the changes itself
+            upserted: Features to replace (first trail with the same name) or append
+            deleted: Features whose names should be removed
+        """
+        with self._lock:
+            index = self._read_index()
+            if index is None:
+                self._write_generation(1, [self._entry(feature, 0) for feature in upserted])
+                return
+
+            entries = index['trails']
+            dead = index.get('dead_values', 0)
+            for name in dict.fromkeys(f.get('properties', {}).get('name') for f in deleted):
+                dead += sum(e['count'] * e['dims'] for e in entries if e['properties'].get('name') == name)
+                entries = [e for e in entries if e['properties'].get('name') != name]
+
+            path = os.path.join(self.store_dir, index['coordinates_file'])
+            size = os.path.getsize(path)
+            with open(path, 'r+b') as f:
+                # Drop a partial value left by an interrupted append
+                f.truncate(size - size % COORD_DTYPE.itemsize)
+                f.seek(0, os.SEEK_END)
+                offset = f.tell() // COORD_DTYPE.itemsize
+                for feature in upserted:
+                    entry, values = self._entry(feature, offset)
+                    if values is not None:
+                        f.write(values.astype(COORD_DTYPE, copy=False).tobytes())
+                        offset += len(values)
+                    name = entry['properties'].get('name')
+                    for i, existing in enumerate(entries):
+                        if existing['properties'].get('name') == name:
+                            dead += existing['count'] * existing['dims']
+                            entries[i] = entry
+                            break
+                    else:
+                        entries.append(entry)
+                f.flush()
+                os.fsync(f.fileno())
+
+            index['trails'] = entries
+            index['dead_values'] = dead
+            dump_file(self.index_file, index)
+
+        if offset and dead / offset > self.compact_ratio:
+            self.compact()
+
+    def compact(self, background: bool = False):
+        """Rewrite the coordinate array without unreferenced values"""
+        with self._lock:
+            index = self._read_index()
+            if index is None or not index.get('dead_values'):
+                return
+            coords = self._coordinates(index)
+            entries_and_values = []
+            for entry in index['trails']:
+                values = None
+                if entry['dims']:
+                    start = entry['offset']
+                    values = np.array(coords[start:start + entry['count'] * entry['dims']])
+                entries_and_values.append((entry, values))
+            self._write_generation(index['generation'] + 1, entries_and_values)
+        logger.info(f"Compacted coordinate store: {self.store_dir}")
+
+    def get_trail_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the first trail with this name, materialising only its geometry"""
+        with self._lock:
+            index = self._read_index()
+            if index is None:
+                return None
+            for entry in index['trails']:
+                if entry['properties'].get('name') == name:
+                    return self._feature(entry, self._coordinates(index))
+        return None
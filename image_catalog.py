@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Image Catalog
+Index of the trail photos on disk (size, dimensions, content hash), kept in
+a file and brought up to date from directory modification times
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Any
+
+from image_processing import display_size
+from image_store import file_sha256
+from json_io import dump_file, load_file
+
+logger = logging.getLogger(__name__)
+
+# Under the image root, next to the image store manifest
+CATALOG_FILE = '.image_catalog.json'
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+# A directory modified this recently may change again within the same mtime
+# tick, so its mtime is not trusted until the next look
+RACY_SECONDS = 2
+
+
+class ImageCatalog:
+    """
+    Photos in root/trail-<id>/ directories, indexed by trail and filename
+
+    Each trail directory is listed with one os.scandir pass and its mtime
+    recorded. Later lookups stat the directory only, and list it again
+    (hashing and measuring just the new or replaced files) when the mtime
+    has moved. Adding, deleting or renaming a file changes the directory's
+    mtime; everything in this repo that writes trail images replaces files
+    by rename, so rewriting a file in place is not looked for. The catalog
+    is saved to root/.image_catalog.json after every change so the server
+    and the scripts start from it rather than from a full walk.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.catalog_path = os.path.join(root, CATALOG_FILE)
+        # trail-<id> -> {'mtime_ns': ..., 'images': {filename: entry}}
+        self._trails = None
+        self._lock = threading.Lock()
+        self.scans = 0
+
+    def _load(self):
+        """Read the catalog file on first use (called under the lock)"""
+        if self._trails is not None:
+            return
+        self._trails = {}
+        if os.path.exists(self.catalog_path):
+            try:
+                self._trails = load_file(self.catalog_path).get('trails', {})
+            except Exception as e:
+                logger.warning(f"Rebuilding unreadable image catalog: {e}")
+
+    def _save(self):
+        """Write the catalog file (called under the lock)"""
+        os.makedirs(self.root, exist_ok=True)
+        dump_file(self.catalog_path, {'version': 1, 'trails': self._trails})
+
+    def _scan(self, dir_name: str, mtime_ns: int):
+        """List one trail directory, reusing entries for unchanged files (called under the lock)"""
+        self.scans += 1
+        previous = self._trails.get(dir_name, {}).get('images', {})
+        # Hard links to one stored blob share an inode, so hash each inode
+        # once. An inode freed by a deleted file can be reused by a new one,
+        # so size, mtime and ctime (which linking and writing both update)
+        # must match too.
+        hashes = {self._identity(entry): entry['hash'] for trail in self._trails.values()
+                  for entry in trail['images'].values() if entry.get('ctime_ns')}
+        images = {}
+        with os.scandir(os.path.join(self.root, dir_name)) as entries:
+            for item in entries:
+                if not (item.is_file() and item.name.lower().endswith(IMAGE_EXTENSIONS)):
+                    continue
+                st = item.stat()
+                identity = (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+                old = previous.get(item.name)
+                if old and old.get('ctime_ns') and self._identity(old) == identity:
+                    images[item.name] = old
+                    continue
+                try:
+                    width, height = display_size(item.path)
+                except Exception:
+                    width = height = None
+                digest = hashes.get(identity) or file_sha256(item.path)
+                hashes[identity] = digest
+                images[item.name] = {
+                    'size': st.st_size,
+                    'width': width,
+                    'height': height,
+                    'hash': digest,
+                    'mtime_ns': st.st_mtime_ns,
+                    'ctime_ns': st.st_ctime_ns,
+                    'ino': st.st_ino
+                }
+        # Leave the mtime unset while it is too fresh to rely on
+        if time.time() - mtime_ns / 1e9 < RACY_SECONDS:
+            mtime_ns = None
+        self._trails[dir_name] = {'mtime_ns': mtime_ns, 'images': images}
+
+    @staticmethod
+    def _identity(entry: Dict[str, Any]) -> tuple:
+        """(inode, size, mtime, ctime) of a cataloged file"""
+        return (entry['ino'], entry['size'], entry['mtime_ns'], entry['ctime_ns'])
+
+    def _update(self, dir_name: str) -> bool:
+        """
+        Bring one trail directory up to date (called under the lock)
+
+        Returns:
+            True if the catalog changed
+        """
+        try:
+            mtime_ns = os.stat(os.path.join(self.root, dir_name)).st_mtime_ns
+        except FileNotFoundError:
+            return self._trails.pop(dir_name, None) is not None
+        known = self._trails.get(dir_name)
+        if known is not None and known['mtime_ns'] == mtime_ns:
+            return False
+        self._scan(dir_name, mtime_ns)
+        return True
+
+    def refresh(self) -> int:
+        """
+        Bring the whole catalog up to date
+
+        Returns:
+            Number of trail directories listed again
+        """
+        with self._lock:
+            self._load()
+            scans = self.scans
+            seen = set()
+            changed = False
+            if os.path.isdir(self.root):
+                with os.scandir(self.root) as entries:
+                    for item in entries:
+                        if item.is_dir() and item.name.startswith('trail-'):
+                            seen.add(item.name)
+                            changed |= self._update(item.name)
+            for dir_name in set(self._trails) - seen:
+                del self._trails[dir_name]
+                changed = True
+            if changed:
+                self._save()
+            return self.scans - scans
+
+    def images(self, trail_id: str) -> List[Dict[str, Any]]:
+        """
+        Photos of a trail, by filename
+
+        Returns:
+            Dicts with trail, filename, size, width, height (as displayed;
+            None if Pillow cannot read the file) and hash (SHA-256)
+        """
+        dir_name = f"trail-{trail_id}"
+        with self._lock:
+            self._load()
+            if self._update(dir_name):
+                self._save()
+            images = self._trails.get(dir_name, {}).get('images', {})
+            return [self._public(trail_id, filename, entry) for filename, entry in sorted(images.items())]
+
+    def get(self, trail_id: str, filename: str) -> Optional[Dict[str, Any]]:
+        """One photo of a trail (see images()), or None if it is not on disk"""
+        dir_name = f"trail-{trail_id}"
+        with self._lock:
+            self._load()
+            if self._update(dir_name):
+                self._save()
+            entry = self._trails.get(dir_name, {}).get('images', {}).get(filename)
+            return self._public(trail_id, filename, entry) if entry else None
+
+    def missing(self, trail_id: str, filenames: List[str]) -> List[str]:
+        """Filenames of a trail's photos that are not on disk"""
+        present = {image['filename'] for image in self.images(trail_id)}
+        return [filename for filename in filenames if filename not in present]
+
+    @staticmethod
+    def _public(trail_id: str, filename: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'trail': trail_id,
+            'filename': filename,
+            'size': entry['size'],
+            'width': entry['width'],
+            'height': entry['height'],
+            'hash': entry['hash']
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get catalog counters
+
+        Returns:
+            Dict with trails, images and bytes as last seen, and directory
+            scans made by this process
+        """
+        with self._lock:
+            self._load()
+            images = [entry for trail in self._trails.values() for entry in trail['images'].values()]
+            return {
+                'trails': len(self._trails),
+                'images': len(images),
+                'bytes': sum(entry['size'] for entry in images),
+                'scans': self.scans
+            }
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Image Jobs
+Bounded process pool that compresses uploaded photos outside the request
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs are kept this long for GET /api/jobs/<id>
+JOB_TTL_SECONDS = 3600
+
+
+class QueueFull(Exception):
+    """Raised when a job would take more files than the queue has room for"""
+
+
+class ImageJobQueue:
+    """
+    Runs one task per uploaded file in a process pool, grouped into jobs
+
+    At most max_pending files wait or run at once; submit() raises QueueFull
+    beyond that so callers can ask clients to retry. The pool is started on
+    first use. shutdown() stops accepting jobs and waits for the queued ones.
+    on_done, if given, is called in this process with each file's path and
+    whether its task succeeded.
+    """
+
+    def __init__(self, task: Callable[[str], bool], max_workers: Optional[int] = None,
+                 max_pending: int = 64, on_done: Optional[Callable[[str, bool], None]] = None):
+        self.task = task
+        self.on_done = on_done
+        self.max_workers = max_workers or min(2, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0
+        self._closed = False
+        # job id -> job record (see submit)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, paths: List[str], urls: Optional[List[str]] = None) -> str:
+        """
+        Queue a task for every path as one job
+
+        Args:
+            paths: Saved upload files, processed in place
+            urls: URL of each file, reported in the job status
+
+        Returns:
+            Job ID
+
+        Raises:
+            QueueFull: If the files do not fit in the queue or the queue is
+                shutting down
+        """
+        with self._lock:
+            if self._closed:
+                raise QueueFull("Image processing is shutting down")
+            if self._pending + len(paths) > self.max_pending:
+                raise QueueFull(f"{self.max_pending - self._pending} of {self.max_pending} image slots free")
+            self._prune()
+
+            job_id = uuid.uuid4().hex
+            job = {
+                'id': job_id,
+                'created': time.time(),
+                'finished': None,
+                'files': []
+            }
+            for i, path in enumerate(paths):
+                entry = {
+                    'filename': os.path.basename(path),
+                    'url': urls[i] if urls else None,
+                    'path': path,
+                    'future': self._submit_task(path)
+                }
+                job['files'].append(entry)
+                self._pending += 1
+            self._jobs[job_id] = job
+
+        for entry in job['files']:
+            entry['future'].add_done_callback(lambda future, job=job, entry=entry: self._task_done(job, entry))
+        return job_id
+
+    def _submit_task(self, path: str):
+        """Start the task for one file, replacing a pool broken by a crashed worker"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            return self._executor.submit(self.task, path)
+        except BrokenProcessPool:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor.submit(self.task, path)
+
+    def _task_done(self, job: Dict[str, Any], entry: Dict[str, Any]):
+        """Release a queue slot and stamp the job when its last file is done"""
+        with self._lock:
+            self._pending -= 1
+            if job['finished'] is None and all(e['future'].done() for e in job['files']):
+                job['finished'] = time.time()
+        if self.on_done is not None:
+            future = entry['future']
+            succeeded = not future.cancelled() and future.exception() is None and bool(future.result())
+            try:
+                self.on_done(entry['path'], succeeded)
+            except Exception as e:
+                logger.error(f"Error after processing {entry['path']}: {e}")
+
+    def _prune(self):
+        """Drop jobs finished more than JOB_TTL_SECONDS ago (called under the lock)"""
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job['finished'] is not None and job['finished'] < cutoff]:
+            del self._jobs[job_id]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the progress of a job
+
+        Returns:
+            Dict with id, status (queued, running, done or failed - failed
+            when any file could not be processed), file counts, timestamps
+            and a status per file; None for an unknown or expired job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        files = []
+        for entry in job['files']:
+            future = entry['future']
+            info = {'filename': entry['filename'], 'url': entry['url']}
+            if future.done():
+                error = future.exception()
+                if error is None and future.result():
+                    info['status'] = 'done'
+                    if os.path.exists(entry['path']):
+                        info['size'] = os.path.getsize(entry['path'])
+                else:
+                    info['status'] = 'failed'
+                    info['error'] = str(error) if error else "Image could not be processed"
+            else:
+                info['status'] = 'running' if future.running() else 'queued'
+            files.append(info)
+
+        counts = {state: sum(1 for f in files if f['status'] == state)
+                  for state in ('queued', 'running', 'done', 'failed')}
+        if counts['queued'] + counts['running'] == 0:
+            status = 'failed' if counts['failed'] else 'done'
+        else:
+            status = 'running' if counts['running'] or counts['done'] or counts['failed'] else 'queued'
+        return {
+            'id': job['id'],
+            'status': status,
+            'total': len(files),
+            **counts,
+            'created': job['created'],
+            'finished': job['finished'],
+            'files': files
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue counters
+
+        Returns:
+            Dict with workers, pending files, the pending limit and tracked jobs
+        """
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'jobs': len(self._jobs)
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and, with wait, finish the queued ones"""
+        with self._lock:
+            self._closed = True
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=wait)
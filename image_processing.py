@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Image Processing
+Compression of uploaded trail photos and the resized/re-encoded derivatives
+served to browsers; compression runs in the image worker processes
+"""
+
+import io
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Any
+from PIL import Image, ImageOps
+
+try:
+    import pillow_avif  # noqa: F401 - registers AVIF with Pillow builds that lack it
+except ImportError:  # AVIF derivatives are optional
+    pillow_avif = None
+
+logger = logging.getLogger(__name__)
+
+# Widths of the derivatives made for every upload. ?w= is rounded up to one
+# of these, so each photo has a bounded number of variants.
+THUMBNAIL_WIDTH = 200
+DERIVATIVE_WIDTHS = (THUMBNAIL_WIDTH, 400, 800, 1200)
+
+# Largest photo accepted, in pixels (a 48 MP phone photo is 48,000,000);
+# larger or decompression-bomb uploads are rejected before being decoded
+MAX_IMAGE_PIXELS = 100_000_000
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Derivative formats, most preferred first: Pillow format, MIME type,
+# file extension and encoder options
+OUTPUT_FORMATS = {
+    'avif': ('AVIF', 'image/avif', '.avif', {'quality': 60}),
+    'webp': ('WEBP', 'image/webp', '.webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg', {'quality': 85, 'optimize': True, 'progressive': True})
+}
+
+
+def supported_formats() -> List[str]:
+    """OUTPUT_FORMATS this Pillow build can encode, most preferred first"""
+    Image.init()
+    return [name for name, spec in OUTPUT_FORMATS.items() if spec[0] in Image.SAVE]
+
+
+class ImageTooLarge(ValueError):
+    """Raised for photos over MAX_IMAGE_PIXELS"""
+
+
+def _rotated(img) -> bool:
+    """True if the EXIF orientation turns the photo by 90 degrees (orientations 5-8)"""
+    return img.getexif().get(0x0112) in (5, 6, 7, 8)
+
+
+def _open_scaled(img, max_width: int, max_pixels: int = MAX_IMAGE_PIXELS):
+    """
+    Decode an opened photo at no more than max_width as shown, upright
+
+    JPEGs are decoded by the library at 1/2, 1/4 or 1/8 scale when that is
+    still at least max_width (draft mode), so a 48 MP photo never exists
+    in memory at full size; other formats are shrunk by whole factors
+    (reduce) before the final LANCZOS resize.
+
+    Raises:
+        ImageTooLarge: If the photo has more than max_pixels pixels
+    """
+    if img.width * img.height > max_pixels:
+        raise ImageTooLarge(f"Image is {img.width * img.height / 1e6:.0f} megapixels; "
+                            f"the limit is {max_pixels / 1e6:.0f}")
+    # max_width limits the stored height of photos shown turned sideways
+    if _rotated(img):
+        size = (max(1, round(img.width * max_width / img.height)), max_width)
+    else:
+        size = (max_width, max(1, round(img.height * max_width / img.width)))
+    if img.format == 'JPEG':
+        img.draft('RGB', size)
+    if img.width > size[0]:
+        img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return ImageOps.exif_transpose(img)
+
+
+def compress_image(image_path, max_width=1200, quality=85):
+    """
+    Compress image to reduce file size
+
+    The photo is decoded at reduced size (see _open_scaled) and the result
+    written to a temporary file that replaces the original in one step, so
+    the image route never serves a half-written file.
+
+    Raises:
+        ImageTooLarge: If the photo is over MAX_IMAGE_PIXELS (other errors
+            are logged and reported as False)
+    """
+    try:
+        with Image.open(image_path) as img:
+            # Scale down and apply EXIF orientation to fix sideways images
+            img = _open_scaled(img, max_width)
+
+            # Convert to RGB if necessary (for JPEG)
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+
+            # Save with compression
+            temp_path = f"{image_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                img.save(temp_path, 'JPEG', quality=quality, optimize=True)
+                os.replace(temp_path, image_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            return True
+    except (ImageTooLarge, Image.DecompressionBombError):
+        raise
+    except Exception as e:
+        logger.error(f"Error compressing image: {e}")
+        return False
+
+
+def display_size(source_path: str) -> tuple:
+    """(width, height) of a photo as shown, after its EXIF orientation; reads only the header"""
+    with Image.open(source_path) as img:
+        width, height = img.size
+        if _rotated(img):
+            width, height = height, width
+    return width, height
+
+
+def derivative_width(requested: Optional[int], source_width: int) -> int:
+    """Width to serve for ?w=: the next DERIVATIVE_WIDTHS step up, at most the source's"""
+    if requested is None:
+        return source_width
+    for width in DERIVATIVE_WIDTHS:
+        if width >= requested:
+            return min(width, source_width)
+    return source_width
+
+
+def render_derivative(source_path: str, width: int, fmt: str) -> bytes:
+    """
+    Encode a photo at a width in one of OUTPUT_FORMATS
+
+    Args:
+        source_path: Stored photo
+        width: Target width in pixels (never enlarged)
+        fmt: Key of OUTPUT_FORMATS
+
+    Returns:
+        Encoded image bytes
+    """
+    pil_format, _, _, options = OUTPUT_FORMATS[fmt]
+    with Image.open(source_path) as img:
+        img = _open_scaled(img, width)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        buffer = io.BytesIO()
+        img.save(buffer, pil_format, **options)
+        return buffer.getvalue()
+
+
+def source_version(source_path: str) -> Optional[str]:
+    """Token that changes whenever a stored photo is rewritten, or None if it is missing"""
+    try:
+        st = os.stat(source_path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def derivative_dir(cache_dir: str, source_path: str) -> str:
+    """Cache directory holding every derivative of one photo"""
+    return os.path.join(cache_dir, os.path.basename(os.path.dirname(source_path)),
+                        os.path.basename(source_path))
+
+
+def derivative_path(cache_dir: str, source_path: str, version: str, width: int, fmt: str) -> str:
+    """Cache file of one derivative of a photo version"""
+    return os.path.join(derivative_dir(cache_dir, source_path), version,
+                        f"w{width}{OUTPUT_FORMATS[fmt][2]}")
+
+
+def _write_file(path: str, body: bytes):
+    """Write a file atomically, creating its directory"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(body)
+    os.replace(temp_path, path)
+
+
+def write_derivatives(source_path: str, cache_dir: str) -> int:
+    """
+    Pre-render a photo at every DERIVATIVE_WIDTHS width in every supported format
+
+    JPEG at the photo's own width is skipped: that is the stored file.
+
+    Returns:
+        Bytes written
+    """
+    version = source_version(source_path)
+    if version is None:
+        return 0
+    source_width = display_size(source_path)[0]
+    shutil.rmtree(derivative_dir(cache_dir, source_path), ignore_errors=True)
+    written = 0
+    for width in sorted({derivative_width(w, source_width) for w in DERIVATIVE_WIDTHS}):
+        for fmt in supported_formats():
+            if fmt == 'jpeg' and width >= source_width:
+                continue
+            body = render_derivative(source_path, width, fmt)
+            _write_file(derivative_path(cache_dir, source_path, version, width, fmt), body)
+            written += len(body)
+    return written
+
+
+def process_upload(image_path: str, cache_dir: Optional[str] = None) -> bool:
+    """
+    Compress an uploaded photo and pre-render its derivatives (worker task)
+
+    The upload was saved as received so the request returns quickly; this
+    reads it back once, at reduced size, and replaces it with the
+    compressed copy.
+
+    Returns:
+        True if the photo was compressed; a failure to render derivatives
+        is logged and left to be retried when one is requested
+
+    Raises:
+        ImageTooLarge: If the photo is over MAX_IMAGE_PIXELS; it is deleted
+    """
+    try:
+        compressed = compress_image(image_path)
+    except (ImageTooLarge, Image.DecompressionBombError):
+        os.remove(image_path)
+        raise
+    if not compressed:
+        return False
+    if cache_dir:
+        try:
+            write_derivatives(image_path, cache_dir)
+        except Exception as e:
+            logger.error(f"Error rendering derivatives of {image_path}: {e}")
+    return True
+
+
+class DerivativeCache:
+    """
+    Resized/re-encoded photos on disk under
+    cache_dir/trail-<id>/<filename>/<version>/w<width>.<ext>
+
+    The version is taken from the stored photo's mtime and size, so a
+    re-compressed or replaced photo never serves old derivatives. Files are
+    tracked by size and last use; once they add up to more than max_bytes
+    the least recently used are deleted down to 90% of it. The worker
+    processes write derivatives directly; register() accounts for them.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # path -> (size, last used); built by scanning cache_dir on first use
+        self._files = None
+        self._total = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _scan(self, root: str) -> Dict[str, tuple]:
+        """Size and modification time of every derivative file under root"""
+        found = {}
+        stack = [root]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif not entry.name.endswith('.tmp'):
+                    st = entry.stat()
+                    found[entry.path] = (st.st_size, st.st_mtime)
+        return found
+
+    def _ensure_loaded(self):
+        """Build the file table (called under the lock)"""
+        if self._files is None:
+            self._files = self._scan(self.cache_dir)
+            self._total = sum(size for size, _ in self._files.values())
+
+    def _track(self, path: str, size: int):
+        """Add or refresh one file and evict if over budget (called under the lock)"""
+        previous = self._files.get(path)
+        if previous is not None:
+            self._total -= previous[0]
+        self._files[path] = (size, time.time())
+        self._total += size
+        if self._total > self.max_bytes:
+            self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target: int):
+        """Delete least recently used files until the total is at most target"""
+        for path, (size, _) in sorted(self._files.items(), key=lambda item: item[1][1]):
+            if self._total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            del self._files[path]
+            self._total -= size
+            self.evictions += 1
+
+    def get(self, source_path: str, width: int, fmt: str,
+            build: Callable[[], bytes]) -> Optional[str]:
+        """
+        Path of a derivative, rendering and storing it if it is not cached
+
+        Args:
+            source_path: Stored photo
+            width: Derivative width
+            fmt: Key of OUTPUT_FORMATS
+            build: Returns the encoded derivative
+
+        Returns:
+            File path, or None if the photo does not exist
+        """
+        version = source_version(source_path)
+        if version is None:
+            return None
+        path = derivative_path(self.cache_dir, source_path, version, width, fmt)
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._files.get(path)
+            if entry is not None and os.path.exists(path):
+                self._files[path] = (entry[0], time.time())
+                self.hits += 1
+                return path
+
+        body = build()
+        with self._lock:
+            self.misses += 1
+            # Drop derivatives of older versions of this photo
+            photo_dir = derivative_dir(self.cache_dir, source_path)
+            for stale in [p for p in self._files
+                          if p.startswith(photo_dir + os.sep) and not p.startswith(os.path.dirname(path) + os.sep)]:
+                self._total -= self._files.pop(stale)[0]
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            _write_file(path, body)
+            self._track(path, len(body))
+        return path
+
+    def register(self, source_path: str):
+        """Account for derivatives a worker process wrote for a photo"""
+        photo_dir = derivative_dir(self.cache_dir, source_path)
+        found = self._scan(photo_dir)
+        with self._lock:
+            self._ensure_loaded()
+            for path in [p for p in self._files if p.startswith(photo_dir + os.sep)]:
+                self._total -= self._files.pop(path)[0]
+            for path, (size, _) in found.items():
+                self._track(path, size)
+
+    def discard(self, source_path: str):
+        """Delete every derivative of a photo"""
+        photo_dir = derivative_dir(self.cache_dir, source_path)
+        with self._lock:
+            if self._files is not None:
+                for path in [p for p in self._files if p.startswith(photo_dir + os.sep)]:
+                    self._total -= self._files.pop(path)[0]
+            shutil.rmtree(photo_dir, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict with hits, misses (derivatives rendered on request),
+            evictions, cached files and bytes, and the byte limit
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'files': len(self._files) if self._files is not None else None,
+                'bytes': self._total if self._files is not None else None,
+                'max_bytes': self.max_bytes,
+                'formats': supported_formats()
+            }
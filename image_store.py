@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Image Store
+Content-addressed trail photos: one blob per distinct upload, linked into
+each trail's image directory
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import uuid
+from typing import BinaryIO, Dict, List, Optional, Any
+
+from json_io import dump_file, load_file
+
+logger = logging.getLogger(__name__)
+
+# Under the image root: blobs by hash, and the manifest of their references
+BLOB_DIR = '.blobs'
+MANIFEST_FILE = '.image_store.json'
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link(source: str, target: str):
+    """
+    Point target at source's content, replacing target atomically
+
+    A hard link where the filesystem allows it, a copy otherwise.
+    """
+    temp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, target)
+
+
+class ImageStore:
+    """
+    Photos under root stored once per distinct content
+
+    Each upload is hashed (SHA-256) as it is written. Its bytes are kept as
+    root/.blobs/<hash[:2]>/<hash><ext>, and every trail image
+    (root/trail-<id>/<file>, the paths the API, GitHub Pages and the
+    scripts use) is a hard link to its blob. The manifest records the
+    references of each blob, so deleting an image only deletes the blob
+    once no trail refers to it. Files placed in trail directories by other
+    means are left alone until adopted (see adopt()).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+        # hash -> {'ext': ..., 'refs': [ref, ...]}; refs are trail-<id>/<file>
+        self._blobs = None
+        self._refs = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Read the manifest on first use (called under the lock)"""
+        if self._blobs is not None:
+            return
+        self._blobs = {}
+        if os.path.exists(self.manifest_path):
+            self._blobs = load_file(self.manifest_path).get('blobs', {})
+        self._refs = {ref: digest for digest, blob in self._blobs.items() for ref in blob['refs']}
+
+    def _save(self):
+        """Write the manifest (called under the lock)"""
+        os.makedirs(self.root, exist_ok=True)
+        dump_file(self.manifest_path, {'version': 1, 'blobs': self._blobs})
+
+    def blob_path(self, digest: str, ext: str) -> str:
+        """File holding the content with a hash"""
+        return os.path.join(self.root, BLOB_DIR, digest[:2], f"{digest}{ext}")
+
+    def _blob_file(self, digest: str) -> str:
+        return self.blob_path(digest, self._blobs[digest]['ext'])
+
+    @staticmethod
+    def ref_name(trail_id: str, filename: str) -> str:
+        """Reference key of a trail image"""
+        return f"trail-{trail_id}/{filename}"
+
+    def add(self, trail_id: str, stream: BinaryIO, filename: str) -> Dict[str, Any]:
+        """
+        Store an upload for a trail
+
+        The stream is copied to disk in chunks while it is hashed. If the
+        trail already has this content the existing image is returned; if
+        another trail has it, the new image links to the same blob.
+
+        Args:
+            trail_id: Trail the image belongs to
+            stream: Upload contents
+            filename: Sanitized upload filename (gives the name and extension)
+
+        Returns:
+            Dict with filename (in the trail's directory), path, blob (path
+            of the blob), hash, new_blob (the content was not stored
+            before) and existing (the trail already had this image)
+        """
+        name, ext = os.path.splitext(filename)
+        ext = ext.lower()
+        incoming_dir = os.path.join(self.root, BLOB_DIR, 'incoming')
+        os.makedirs(incoming_dir, exist_ok=True)
+        temp_path = os.path.join(incoming_dir, f"{uuid.uuid4().hex}{ext}")
+        digest = hashlib.sha256()
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+            digest = digest.hexdigest()
+
+            with self._lock:
+                self._load()
+                blob = self._blobs.get(digest)
+                if blob is not None:
+                    for ref in blob['refs']:
+                        if ref.startswith(f"trail-{trail_id}/"):
+                            path = os.path.join(self.root, ref)
+                            if os.path.exists(path):
+                                return {'filename': ref.split('/', 1)[1], 'path': path,
+                                        'blob': self._blob_file(digest), 'hash': digest,
+                                        'new_blob': False, 'existing': True}
+                new_blob = blob is None
+                if new_blob:
+                    blob = self._blobs[digest] = {'ext': ext, 'refs': []}
+                    os.makedirs(os.path.dirname(self._blob_file(digest)), exist_ok=True)
+                    os.replace(temp_path, self._blob_file(digest))
+
+                unique_filename = f"{name}_{digest[:8]}{ext}"
+                ref = self.ref_name(trail_id, unique_filename)
+                path = os.path.join(self.root, ref)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _link(self._blob_file(digest), path)
+                if ref not in blob['refs']:
+                    blob['refs'].append(ref)
+                self._refs[ref] = digest
+                self._save()
+                return {'filename': unique_filename, 'path': path, 'blob': self._blob_file(digest),
+                        'hash': digest, 'new_blob': new_blob, 'existing': False}
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def blob_for(self, path: str) -> Optional[str]:
+        """Blob behind a trail image path, or None for unmanaged files"""
+        ref = os.path.relpath(path, self.root).replace(os.sep, '/')
+        with self._lock:
+            self._load()
+            digest = self._refs.get(ref)
+            return self._blob_file(digest) if digest else None
+
+    def refs(self, blob_path: str) -> List[str]:
+        """Trail image paths that refer to a blob"""
+        digest = os.path.splitext(os.path.basename(blob_path))[0]
+        with self._lock:
+            self._load()
+            blob = self._blobs.get(digest)
+            return [os.path.join(self.root, ref) for ref in blob['refs']] if blob else []
+
+    def relink(self, blob_path: str) -> List[str]:
+        """
+        Point every reference at the blob again
+
+        Needed after the blob file is replaced (compression writes a new
+        file), since hard links keep the old content. Runs under the lock so
+        a reference removed meanwhile is not linked back.
+
+        Returns:
+            The reference paths
+        """
+        digest = os.path.splitext(os.path.basename(blob_path))[0]
+        with self._lock:
+            self._load()
+            blob = self._blobs.get(digest)
+            paths = [os.path.join(self.root, ref) for ref in blob['refs']] if blob else []
+            if os.path.exists(blob_path):
+                for path in paths:
+                    _link(blob_path, path)
+            return paths
+
+    def remove(self, trail_id: str, filename: str) -> Optional[bool]:
+        """
+        Delete a trail image, and its blob once nothing refers to it
+
+        Returns:
+            True if the blob was deleted too, False if other references
+            keep it, None if the image is not in the store
+        """
+        ref = self.ref_name(trail_id, filename)
+        with self._lock:
+            self._load()
+            digest = self._refs.pop(ref, None)
+            if digest is None:
+                return None
+            blob = self._blobs[digest]
+            blob['refs'] = [r for r in blob['refs'] if r != ref]
+            path = os.path.join(self.root, ref)
+            if os.path.exists(path):
+                os.remove(path)
+            deleted = not blob['refs']
+            if deleted:
+                blob_file = self._blob_file(digest)
+                del self._blobs[digest]
+                if os.path.exists(blob_file):
+                    os.remove(blob_file)
+            self._save()
+            return deleted
+
+    def remove_blob(self, blob_path: str) -> List[str]:
+        """
+        Delete a blob and every trail image referring to it
+
+        For uploads rejected after they were stored (the workers delete
+        photos over the pixel limit).
+
+        Returns:
+            The deleted trail image paths
+        """
+        digest = os.path.splitext(os.path.basename(blob_path))[0]
+        with self._lock:
+            self._load()
+            blob = self._blobs.pop(digest, None)
+            if blob is None:
+                return []
+            paths = []
+            for ref in blob['refs']:
+                self._refs.pop(ref, None)
+                path = os.path.join(self.root, ref)
+                if os.path.exists(path):
+                    os.remove(path)
+                paths.append(path)
+            if os.path.exists(blob_path):
+                os.remove(blob_path)
+            self._save()
+            return paths
+
+    def adopt(self, path: str) -> bool:
+        """
+        Bring a file already in a trail directory into the store
+
+        Identical files found later link to the first one's blob, so the
+        duplicates stop taking space.
+
+        Returns:
+            True if the file's content was already stored (it now shares
+            that blob)
+        """
+        ref = os.path.relpath(path, self.root).replace(os.sep, '/')
+        digest = file_sha256(path)
+        with self._lock:
+            self._load()
+            if ref in self._refs:
+                return False
+            blob = self._blobs.get(digest)
+            shared = blob is not None
+            if not shared:
+                blob = self._blobs[digest] = {'ext': os.path.splitext(path)[1].lower(), 'refs': []}
+                os.makedirs(os.path.dirname(self._blob_file(digest)), exist_ok=True)
+                _link(path, self._blob_file(digest))
+            else:
+                _link(self._blob_file(digest), path)
+            blob['refs'].append(ref)
+            self._refs[ref] = digest
+            self._save()
+            return shared
+
+    def restore_links(self) -> int:
+        """
+        Recreate missing or unlinked trail images from their blobs
+
+        For image directories restored from a backup, which holds each blob
+        once and no trail copies.
+
+        Returns:
+            Number of images written
+        """
+        with self._lock:
+            self._load()
+            pairs = [(self._blob_file(digest), os.path.join(self.root, ref))
+                     for digest, blob in self._blobs.items() for ref in blob['refs']]
+        restored = 0
+        for blob_file, path in pairs:
+            if not os.path.exists(blob_file):
+                logger.warning(f"Blob missing for {path}")
+                continue
+            if os.path.exists(path) and os.path.samefile(blob_file, path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _link(blob_file, path)
+            restored += 1
+        return restored
+
+    def is_ref(self, path: str) -> bool:
+        """True if a trail image path is a reference to a blob"""
+        return self.blob_for(path) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get store counters
+
+        Returns:
+            Dict with blobs, references and bytes stored
+        """
+        with self._lock:
+            self._load()
+            blob_bytes = 0
+            for digest in self._blobs:
+                try:
+                    blob_bytes += os.path.getsize(self._blob_file(digest))
+                except OSError:
+                    pass
+            return {'blobs': len(self._blobs), 'references': len(self._refs), 'bytes': blob_bytes}
@@ -3,8 +3,9 @@
 Import current_trails.geojson and merge with existing trail data
 """
 
-import json
 from datetime import datetime
+from json_io import dump_file, load_file
+from data_manager import TrailDataManager
 
 def import_current_trails():
     """Import trails with GPS data from current_trails folder"""
@@ -15,8 +16,7 @@ def import_current_trails():
     
     # 1. Load current_trails with GPS data
     print("\n[1/4] Loading current_trails.geojson...")
-    with open('data/current_trails/current_trails.geojson', 'r', encoding='utf-8') as f:
-        current_trails_data = json.load(f)
+    current_trails_data = load_file('data/current_trails/current_trails.geojson')
     
     current_features = current_trails_data.get('features', [])
     print(f"   Found {len(current_features)} trails with GPS data")
@@ -48,8 +48,8 @@ def import_current_trails():
     
     # 2. Load existing trails.geojson (with names and images)
     print("\n[2/4] Loading existing trails.geojson...")
-    with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-        existing_data = json.load(f)
+    manager = TrailDataManager()
+    existing_data = manager.load_all_trails()
     
     existing_features = existing_data.get('features', [])
     print(f"   Found {len(existing_features)} existing trails")
@@ -59,6 +59,7 @@ def import_current_trails():
     
     matched = 0
     updated_features = []
+    changed_features = []
     
     for feature in existing_features:
         props = feature['properties']
@@ -79,6 +80,7 @@ def import_current_trails():
             # Update with GPS coordinates
             feature['geometry']['coordinates'] = matched_trail['coordinates']
             props['updated_at'] = datetime.now().isoformat()
+            changed_features.append(feature)
             print(f"       Added {len(matched_trail['coordinates'])} GPS coordinates")
         
         updated_features.append(feature)
@@ -118,6 +120,7 @@ def import_current_trails():
                 }
             }
             updated_features.append(new_feature)
+            changed_features.append(new_feature)
             print(f"         [+] Added as new trail")
     
     # 4. Save updated trails.geojson
@@ -125,19 +128,12 @@ def import_current_trails():
     
     # Create backup first
     backup_file = f"data/trails_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson"
-    with open(backup_file, 'w', encoding='utf-8') as f:
-        json.dump(existing_data, f, indent=2)
+    dump_file(backup_file, manager.load_all_trails())
     print(f"   [OK] Backup: {backup_file}")
     
-    # Save updated data
-    updated_data = {
-        "type": "FeatureCollection",
-        "features": updated_features
-    }
-    
-    with open('data/trails.geojson', 'w', encoding='utf-8') as f:
-        json.dump(updated_data, f, indent=2)
-    print(f"   [OK] Updated: data/trails.geojson")
+    # Save only the changed trails, in one write
+    manager.save_features(changed_features)
+    print(f"   [OK] Updated: data/trails.geojson ({len(changed_features)} trails changed)")
     
     # Summary
     print("\n" + "=" * 70)
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 """Import descriptions from current_trails.geojson"""
 
-import json
 from datetime import datetime
+from json_io import dump_file, load_file
+from data_manager import TrailDataManager
 
 def import_descriptions():
     """Import descriptions and other properties from current_trails"""
@@ -13,8 +14,7 @@ def import_descriptions():
     
     # Load current_trails with descriptions
     print("\n[1/3] Loading current_trails.geojson...")
-    with open('data/current_trails/current_trails.geojson', 'r', encoding='utf-8') as f:
-        current_data = json.load(f)
+    current_data = load_file('data/current_trails/current_trails.geojson')
     
     current_features = current_data.get('features', [])
     
@@ -41,10 +41,11 @@ def import_descriptions():
     
     # Load existing trails.geojson
     print("\n[2/3] Loading and updating trails.geojson...")
-    with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-        existing_data = json.load(f)
+    manager = TrailDataManager()
+    existing_data = manager.load_all_trails()
     
     updated_count = 0
+    changed_features = []
     desc_added = 0
     length_added = 0
     
@@ -88,18 +89,17 @@ def import_descriptions():
             
             if changed:
                 props['updated_at'] = datetime.now().isoformat()
+                changed_features.append(feature)
                 updated_count += 1
     
     # Save
     print("\n[3/3] Saving...")
     backup_file = f"data/trails_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson"
-    with open(backup_file, 'w', encoding='utf-8') as f:
-        with open('data/trails.geojson', 'r') as orig:
-            json.dump(json.load(orig), f, indent=2)
+    dump_file(backup_file, manager.load_all_trails())
     print(f"   [OK] Backup: {backup_file}")
     
-    with open('data/trails.geojson', 'w', encoding='utf-8') as f:
-        json.dump(existing_data, f, indent=2)
+    # Save only the changed trails, in one write
+    manager.save_features(changed_features)
     print(f"   [OK] Saved: data/trails.geojson")
     
     # Summary
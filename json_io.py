@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger JSON Serialization
+Shared JSON reading/writing: orjson when installed, stdlib json otherwise
+
+Output policy:
+    pretty=True   data/trails.geojson and other files people read or diff in git
+    pretty=False  everything machines consume (API responses, shards, backups)
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json is always available
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+# Process umask, applied to files written by dump_file
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def dumpb(obj: Any, pretty: bool = False, default: Optional[Callable] = None) -> bytes:
+    """
+    Serialize to UTF-8 JSON bytes
+
+    Args:
+        obj: Data to serialize
+        pretty: Indent by two spaces (same layout as json.dump(indent=2))
+        default: Called for objects JSON cannot represent natively
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; let the stdlib handle it
+            pass
+    if pretty:
+        text = json.dumps(obj, indent=2, ensure_ascii=False, default=default)
+    else:
+        text = json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=default)
+    return text.encode('utf-8')
+
+
+def dumps(obj: Any, pretty: bool = False, default: Optional[Callable] = None) -> str:
+    """Serialize to a JSON string (see dumpb)"""
+    return dumpb(obj, pretty, default).decode('utf-8')
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """Parse JSON from a string or UTF-8 bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path: str) -> Any:
+    """Read and parse a JSON file"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump_file(path: str, data: Any, pretty: bool = False):
+    """
+    Write a JSON file via a temporary file and rename
+
+    The temporary file is unique to this write and flushed to disk before
+    the rename, so readers never see a half-written file, a crash leaves
+    either the previous or the new version, and concurrent writers of the
+    same file do not interfere.
+
+    Args:
+        path: Destination file
+        data: JSON-serializable data
+        pretty: Indented output for files people read (see module docstring)
+    """
+    contents = dumpb(data, pretty)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            # mkstemp creates the file owner-only; use the usual permissions
+            os.fchmod(f.fileno(), 0o666 & ~_UMASK)
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -3,15 +3,16 @@
 Merge duplicate trails manually
 """
 
-import json
 from datetime import datetime
+from json_io import dump_file
+from data_manager import TrailDataManager
 
 def merge_duplicates():
     """Interactively merge duplicate trails"""
     
     # Load trails
-    with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    manager = TrailDataManager()
+    data = manager.load_all_trails()
     
     features = data['features']
     
@@ -70,6 +71,8 @@ def merge_duplicates():
     # Find and merge
     merged_count = 0
     indices_to_remove = []
+    merged_features = []
+    removed_names = []
     
     for img_name, gps_name, confidence in merges:
         # Find features
@@ -97,6 +100,8 @@ def merge_duplicates():
             
             # Mark GPS-only trail for removal
             indices_to_remove.append(gps_idx)
+            merged_features.append(img_feature)
+            removed_names.append(gps_name)
             
             print(f"  [+] Merged '{img_name}' with GPS from '{gps_name}'")
             merged_count += 1
@@ -110,13 +115,12 @@ def merge_duplicates():
     # Save
     if merged_count > 0:
         backup_file = f"data/trails_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson"
-        with open(backup_file, 'w', encoding='utf-8') as f:
-            with open('data/trails.geojson', 'r') as orig:
-                json.dump(json.load(orig), f, indent=2)
+        dump_file(backup_file, manager.load_all_trails())
         print(f"\n[OK] Backup: {backup_file}")
         
-        with open('data/trails.geojson', 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        # Deletes run first, so a GPS-only trail with the same name as its
+        # merged trail is removed and the merged trail written back
+        manager.save_features(merged_features, delete_names=removed_names)
         print(f"[OK] Saved: data/trails.geojson")
         
         print(f"\n[OK] Merged {merged_count} trails")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Convert trail data between storage backends
+
+Usage:
+    python migrate_storage.py sqlite              # data/trails.geojson -> data/trails.sqlite3
+    python migrate_storage.py sharded             # data/trails.geojson -> data/trail_shards/
+    python migrate_storage.py single --from sqlite    # back to data/trails.geojson
+
+Then start the server with TRAIL_STORAGE_LAYOUT=<target>.
+"""
+
+import argparse
+import os
+import sys
+from data_manager import TrailDataManager
+from trail_storage import STORAGE_LAYOUTS
+
+
+def migrate(target, source='single', data_dir='data'):
+    """Copy all trails from the source backend into the target backend"""
+    print("=" * 70)
+    print(f"MIGRATING TRAIL DATA: {source} -> {target}")
+    print("=" * 70)
+
+    if source == target:
+        print(f"\n[ERROR] Source and target are both '{source}'")
+        return False
+
+    source_manager = TrailDataManager(data_dir, layout=source)
+    target_manager = TrailDataManager(data_dir, layout=target)
+
+    if source == 'journal':
+        # Fold the journal into trails.geojson so no records are left to be
+        # replayed over edits made in the new layout
+        source_manager.compact_storage()
+        storage = source_manager.storage
+        leftover = [p for p in (storage.journal_file, storage.compacting_file) if os.path.exists(p)]
+        if leftover:
+            print(f"\n[ERROR] Could not compact the journal: {', '.join(leftover)} still present")
+            return False
+        print("\n[OK] Compacted data/trails.journal into data/trails.geojson")
+
+    data = source_manager.load_all_trails()
+    features = data.get('features', [])
+    if not features:
+        print(f"\n[ERROR] No trails found in the '{source}' storage")
+        return False
+
+    # One pass: the whole collection is written in a single save
+    target_manager.save_geojson(data)
+    print(f"\n[OK] Migrated {len(features)} trails")
+
+    # Verify by reading back through the target backend
+    migrated = target_manager.load_all_trails().get('features', [])
+    if len(migrated) != len(features):
+        print(f"[ERROR] Read back {len(migrated)} trails, expected {len(features)}")
+        return False
+    print(f"[OK] Verified {len(migrated)} trails")
+
+    print(f"\nStart the server with TRAIL_STORAGE_LAYOUT={target} to use it.")
+    if target in ('sharded', 'sqlite'):
+        print("Run deploy.py with the same setting; it regenerates data/trails.geojson for the static site.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert trail data between storage backends")
+    parser.add_argument('target', choices=STORAGE_LAYOUTS, help="backend to write")
+    parser.add_argument('--from', dest='source', choices=STORAGE_LAYOUTS,
+                        help="backend to read (default: single, or sharded when the target is single)")
+    parser.add_argument('--data-dir', default='data', help="trail data directory")
+    args = parser.parse_args()
+
+    source = args.source or ('sharded' if args.target == 'single' else 'single')
+    return migrate(args.target, source, args.data_dir)
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(0 if main() else 1)
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Response Cache
+Ready-to-send (and pre-compressed) response bodies for GET /api/trails
+"""
+
+import gzip
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Content codings in server preference order
+CODINGS = ('br', 'gzip', 'identity') if brotli is not None else ('gzip', 'identity')
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    """Encode a response body with one of CODINGS"""
+    if coding == 'br':
+        # Quality 5 compresses close to gzip -9 sizes in a fraction of the time of 11
+        return brotli.compress(body, quality=5)
+    if coding == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+
+class ResponseCache:
+    """
+    Serialized bodies per request variant, reused until the data version changes
+
+    Each variant (the canonical query string) keeps the ETag it was built
+    for and its body in every content coding requested so far. A lookup with
+    a different ETag rebuilds the body; the least recently used variants are
+    dropped beyond max_entries.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuild_seconds = 0.0
+        self.last_rebuild_ms = None
+
+    def get(self, variant: str, etag: str, coding: str, build: Callable[[], bytes]) -> bytes:
+        """
+        Return the body for a variant at an ETag, building it if needed
+
+        Args:
+            variant: Canonical query string of the request
+            etag: ETag of the data version the body must match
+            coding: Content coding from CODINGS
+            build: Returns the uncompressed body bytes
+
+        Returns:
+            Body bytes in the requested coding
+        """
+        with self._lock:
+            entry = self._entries.get(variant)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(variant)
+                body = entry[1].get(coding)
+                if body is not None:
+                    self.hits += 1
+                    return body
+            else:
+                entry = None
+
+        start = time.perf_counter()
+        bodies = dict(entry[1]) if entry is not None else {'identity': build()}
+        body = bodies.get(coding)
+        if body is None:
+            body = compress(bodies['identity'], coding)
+            bodies[coding] = body
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.misses += 1
+            self.rebuild_seconds += elapsed
+            self.last_rebuild_ms = round(elapsed * 1000, 2)
+            self._entries[variant] = (etag, bodies)
+            self._entries.move_to_end(variant)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def clear(self):
+        """Drop every cached body"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict with hits, misses (rebuilds), total and last rebuild time,
+            cached variants, cached bytes and the codings offered
+        """
+        with self._lock:
+            cached_bytes = sum(len(b) for _, bodies in self._entries.values() for b in bodies.values())
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'rebuild_ms_total': round(self.rebuild_seconds * 1000, 2),
+                'last_rebuild_ms': self.last_rebuild_ms,
+                'variants': len(self._entries),
+                'cached_bytes': cached_bytes,
+                'codings': list(CODINGS)
+            }
@@ -4,63 +4,363 @@ Trail Blogger Web Server
 Simple Flask server to handle trail data persistence
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
-import json
-from data_manager import TrailDataManager
+import atexit
+import json_io
+from data_manager import RESERVED_TRAIL_NAMES, TrailDataManager, project_feature, summarize_feature
+from image_catalog import ImageCatalog
+from image_jobs import ImageJobQueue, QueueFull
+from image_store import ImageStore
+from image_processing import (DerivativeCache, OUTPUT_FORMATS, derivative_width,
+                              process_upload, render_derivative, supported_formats)
+from coord_codec import ENCODING_NAME, encode_collection, encode_geometry
+from response_cache import CODINGS, ResponseCache
+from trail_profile import DEFAULT_POINTS, MAX_POINTS
+from trail_simplify import level_for_tolerance, level_for_zoom
+from trail_spatial import valid_bbox
+from trail_storage import file_signature
+from vector_tiles import MIME_TYPE as TILE_MIME_TYPE, TileCache, encode_tile, render_layer, valid_tile
 import logging
 from werkzeug.utils import secure_filename
-import uuid
-from PIL import Image, ImageOps
-import io
+from functools import partial
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.security import safe_join
+import base64
+import hashlib
+from datetime import datetime, timezone
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class TrailJSONProvider(DefaultJSONProvider):
+    """Serialize API responses through json_io (orjson when installed), always compact"""
+    
+    def dumps(self, obj, **kwargs):
+        return json_io.dumps(obj, default=self.default)
+    
+    def loads(self, s, **kwargs):
+        return json_io.loads(s)
+
 app = Flask(__name__)
+app.json = TrailJSONProvider(app)
 CORS(app)  # Enable CORS for all routes
 
 # Configuration for file uploads
 UPLOAD_FOLDER = 'data/trail_images'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB max file size
+# Refuse request bodies larger than 10 photos at the limit before reading them
+app.config['MAX_CONTENT_LENGTH'] = 11 * MAX_FILE_SIZE
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Initialize data manager
-data_manager = TrailDataManager()
+# Photos are stored once per distinct content under UPLOAD_FOLDER/.blobs and
+# hard-linked into each trail's directory (see image_store.py)
+image_store = ImageStore(UPLOAD_FOLDER)
+
+# Size, dimensions and hash of every trail photo, kept in
+# UPLOAD_FOLDER/.image_catalog.json; a trail's directory is listed again only
+# when its mtime changes (see image_catalog.py)
+image_catalog = ImageCatalog(UPLOAD_FOLDER)
+
+# Resized WebP/AVIF/JPEG copies of the photos for ?w= and Accept
+# negotiation, limited to IMAGE_CACHE_MB on disk (least recently used go first)
+IMAGE_CACHE_FOLDER = 'data/image_cache'
+MAX_IMAGE_WIDTH = 4000
+derivative_cache = DerivativeCache(
+    IMAGE_CACHE_FOLDER,
+    max_bytes=int(float(os.environ.get('IMAGE_CACHE_MB', 512)) * 1024 * 1024)
+)
+
+def image_processed(blob_path, succeeded):
+    """Point a processed photo's trail images at its new file and count its derivatives"""
+    if not os.path.exists(blob_path):
+        # Rejected by the worker (over the pixel limit) and deleted
+        image_store.remove_blob(blob_path)
+        return
+    image_store.relink(blob_path)
+    derivative_cache.register(blob_path)
+
+# Uploaded photos are compressed, and their derivatives pre-rendered, by a
+# pool of IMAGE_WORKERS processes (default up to 2); uploads are refused with
+# 503 while IMAGE_QUEUE_LIMIT files wait
+image_jobs = ImageJobQueue(
+    partial(process_upload, cache_dir=IMAGE_CACHE_FOLDER),
+    max_workers=int(os.environ.get('IMAGE_WORKERS', 0)) or None,
+    max_pending=int(os.environ.get('IMAGE_QUEUE_LIMIT', 64)),
+    on_done=image_processed
+)
+
+# Storage backend for trail data: 'single' (data/trails.geojson), 'sharded'
+# (one file per trail in data/trail_shards/), 'journal' (changes appended to
+# data/trails.journal and compacted into data/trails.geojson) or 'sqlite'
+# (data/trails.sqlite3). Convert existing data with migrate_storage.py.
+TRAIL_STORAGE_LAYOUT = os.environ.get('TRAIL_STORAGE_LAYOUT', 'single')
+
+# Set to 'polyline' to store data/trails.geojson with compact encoded
+# coordinates (deploy.py writes a plain copy for GitHub Pages)
+TRAIL_COORDINATE_ENCODING = os.environ.get('TRAIL_COORDINATE_ENCODING') or None
+
+# Days that /api/trails/changes can reach back; clients that last synced
+# earlier are told to reload everything
+TRAIL_CHANGE_RETENTION_DAYS = float(os.environ.get('TRAIL_CHANGE_RETENTION_DAYS', 30))
+
+# Initialize data manager (cached: reads are served from memory until the
+# stored trails change on disk). Every layout, columnar included, then keeps
+# the full collection with its coordinates in memory.
+data_manager = TrailDataManager(
+    cached=True,
+    layout=TRAIL_STORAGE_LAYOUT,
+    coordinate_encoding=TRAIL_COORDINATE_ENCODING,
+    change_retention_days=TRAIL_CHANGE_RETENTION_DAYS
+)
+
+# Leave trails.geojson complete when the server stops
+atexit.register(data_manager.compact_storage)
+# Finish compressing queued uploads before exiting
+atexit.register(image_jobs.shutdown)
+
+# Serialized GET /api/trails bodies, rebuilt when the data version changes
+response_cache = ResponseCache(max_entries=16)
+
+# Vector tile layers: trails come from the data manager, the others from
+# static GeoJSON files. Each layer lists the properties sent with a feature
+# (None for all). Encoded tiles are cached on disk per data version.
+TILE_LAYERS = {
+    'trails': ('name', 'status', 'difficulty', 'length', 'park', 'state', 'trail_id', 'date_hiked'),
+    'states': None,
+    'parks': None
+}
+TILE_SOURCE_FILES = {
+    'states': 'data/states.geojson',
+    'parks': 'data/parks_simplified.json'
+}
+tile_cache = TileCache('data/tile_cache')
+# path -> (file signature, parsed GeoJSON) for TILE_SOURCE_FILES
+tile_sources = {}
+
+def requested_encoding():
+    """
+    Read the ?encoding= query parameter
+    
+    Returns:
+        'polyline' or None for plain GeoJSON coordinates
+    
+    Raises:
+        ValueError: If an unknown encoding is requested
+    """
+    encoding = request.args.get('encoding', '').lower() or None
+    if encoding not in (None, 'geojson', ENCODING_NAME):
+        raise ValueError(f"Unknown encoding '{encoding}', use 'geojson' or '{ENCODING_NAME}'")
+    return encoding if encoding == ENCODING_NAME else None
+
+def requested_filters():
+    """
+    Read trail filter query parameters
+    
+    status, difficulty, park, state, trail_id and name may be repeated or
+    comma-separated; date_from/date_to take YYYY-MM-DD dates,
+    min_length/max_length take miles and bbox takes the map view as
+    min_lon,min_lat,max_lon,max_lat.
+    
+    Returns:
+        Keyword arguments for TrailDataManager.query_trails (empty if none)
+    
+    Raises:
+        ValueError: If a date, length or bbox is malformed
+    """
+    filters = {}
+    for key in ('status', 'difficulty', 'park', 'state', 'trail_id', 'name'):
+        values = [v.strip() for arg in request.args.getlist(key) for v in arg.split(',') if v.strip()]
+        if values:
+            filters[key] = values
+    for key in ('date_from', 'date_to'):
+        value = request.args.get(key)
+        if value:
+            try:
+                filters[key] = datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+            except ValueError:
+                raise ValueError(f"'{key}' must be a date like 2024-07-26")
+    for key in ('min_length', 'max_length'):
+        value = request.args.get(key)
+        if value:
+            try:
+                filters[key] = float(value)
+            except ValueError:
+                raise ValueError(f"'{key}' must be a number")
+    value = request.args.get('bbox')
+    if value:
+        try:
+            bbox = [float(v) for v in value.split(',')]
+        except ValueError:
+            bbox = None
+        if not valid_bbox(bbox):
+            raise ValueError("'bbox' must be min_lon,min_lat,max_lon,max_lat")
+        filters['bbox'] = bbox
+    return filters
+
+# Largest page GET /api/trails returns when ?limit= is given
+MAX_PAGE_SIZE = 500
+
+def requested_projection():
+    """
+    Read the ?fields= and ?view= query parameters
+    
+    fields lists property names (plus 'geometry') to keep, or, prefixed with
+    '-', to drop: ?fields=name,status or ?fields=-geometry,-blog_post.
+    ?view=summary returns summarize_feature() output instead.
+    
+    Returns:
+        (view, include, exclude) - include is None unless fields are listed
+    
+    Raises:
+        ValueError: If fields mixes kept and dropped names, or the view is unknown
+    """
+    view = request.args.get('view', 'full').lower()
+    if view not in ('full', 'summary'):
+        raise ValueError(f"Unknown view '{view}', use 'full' or 'summary'")
+    fields = [f.strip() for arg in request.args.getlist('fields') for f in arg.split(',') if f.strip()]
+    if fields and view == 'summary':
+        raise ValueError("Use either 'fields' or 'view=summary', not both")
+    exclude = [f[1:] for f in fields if f.startswith('-')]
+    if exclude and len(exclude) != len(fields):
+        raise ValueError("'fields' must either list fields to keep or, with '-', fields to drop")
+    include = None if exclude or not fields else fields
+    return view, include, exclude
+
+def requested_detail():
+    """
+    Read the ?zoom= and ?tolerance= query parameters
+    
+    zoom is the map zoom the trails will be drawn at; tolerance is the
+    largest deviation from the full trail allowed, in degrees. Either picks a
+    precomputed level of detail (see trail_simplify.py).
+    
+    Returns:
+        Level index, or None for full resolution
+    
+    Raises:
+        ValueError: If both are given or either is not a positive number
+    """
+    zoom = request.args.get('zoom')
+    tolerance = request.args.get('tolerance')
+    if zoom is not None and tolerance is not None:
+        raise ValueError("Use either 'zoom' or 'tolerance', not both")
+    if zoom is not None:
+        try:
+            zoom = float(zoom)
+        except ValueError:
+            raise ValueError("'zoom' must be a number")
+        if not 0 <= zoom <= 24:
+            raise ValueError("'zoom' must be between 0 and 24")
+        return level_for_zoom(zoom)
+    if tolerance is not None:
+        try:
+            tolerance = float(tolerance)
+        except ValueError:
+            raise ValueError("'tolerance' must be a number")
+        if not tolerance > 0:
+            raise ValueError("'tolerance' must be greater than 0")
+        return level_for_tolerance(tolerance)
+    return None
+
+def encode_cursor(offset):
+    """Opaque pagination cursor for a position in the filtered trail list"""
+    return base64.urlsafe_b64encode(f"o{offset}".encode('ascii')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Position encoded by encode_cursor; ValueError if the cursor is malformed"""
+    try:
+        text = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        if text.startswith('o') and text[1:].isdigit():
+            return int(text[1:])
+    except (ValueError, UnicodeDecodeError):
+        pass
+    raise ValueError("Invalid cursor")
+
+def requested_page():
+    """
+    Read the ?limit= and ?cursor= query parameters
+    
+    Returns:
+        (offset, limit) - limit is None when the response is not paginated
+    
+    Raises:
+        ValueError: If limit is not 1..MAX_PAGE_SIZE or the cursor is invalid
+    """
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limit is None and cursor is None:
+        return 0, None
+    try:
+        limit = int(limit) if limit is not None else MAX_PAGE_SIZE
+    except ValueError:
+        raise ValueError("'limit' must be a whole number")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"'limit' must be between 1 and {MAX_PAGE_SIZE}")
+    return (decode_cursor(cursor) if cursor else 0), limit
+
+# Query parameters that change each cached endpoint's response; anything
+# else (cache busters like ?_=timestamp) is left out of ETags and cache keys
+VARIANT_PARAMS = {
+    'get_trails': ('encoding', 'status', 'difficulty', 'park', 'state', 'trail_id', 'name',
+                   'date_from', 'date_to', 'min_length', 'max_length', 'bbox',
+                   'fields', 'view', 'limit', 'cursor', 'zoom', 'tolerance'),
+    'get_trail': ('encoding',),
+    'get_trail_profile': ('points',),
+}
+
+def request_variant():
+    """Canonical query string: requests with the same one get the same body"""
+    params = VARIANT_PARAMS.get(request.endpoint, ())
+    return '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)) if k in params)
+
+def etag_for(version, coding='identity'):
+    """Strong ETag for the requested representation of a data version"""
+    digest = hashlib.sha1(f"{version}?{request_variant()}".encode('utf-8')).hexdigest()[:24]
+    return digest if coding == 'identity' else f"{digest}-{coding}"
+
+def with_validators(response, etag, last_modified):
+    """Add ETag/Last-Modified and ask clients to revalidate before reuse"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def not_modified(etag, last_modified):
+    """
+    Answer If-None-Match / If-Modified-Since before doing any work
+    
+    Returns:
+        A 304 response if the client's copy is current, otherwise None
+    """
+    if request.if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        fresh = int(last_modified.timestamp()) <= request.if_modified_since.timestamp()
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return with_validators(app.response_class(status=304), etag, last_modified)
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def compress_image(image_path, max_width=1200, quality=85):
-    """Compress image to reduce file size"""
-    try:
-        with Image.open(image_path) as img:
-            # Apply EXIF orientation to fix sideways images
-            img = ImageOps.exif_transpose(img)
-            
-            # Convert to RGB if necessary (for JPEG)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            # Resize if too large
-            if img.width > max_width:
-                ratio = max_width / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Save with compression
-            img.save(image_path, 'JPEG', quality=quality, optimize=True)
-            return True
-    except Exception as e:
-        logger.error(f"Error compressing image: {e}")
-        return False
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    """Answer oversized uploads in the API's JSON error format"""
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({"error": f"Request is larger than the {limit_mb}MB limit"}), 413
 
 @app.route('/')
 def index():
@@ -89,10 +389,66 @@ def serve_static(filename):
 
 @app.route('/api/trails', methods=['GET'])
 def get_trails():
-    """Get all trails"""
+    """
+    Get all trails, or those matching filter parameters (see requested_filters)
+    
+    ?fields= / ?view=summary trim each trail (see requested_projection),
+    ?limit= / ?cursor= page through the results (the response then carries
+    total and next_cursor), ?zoom= / ?tolerance= return simplified geometry
+    (see requested_detail), and ?encoding=polyline returns compact coordinates.
+    """
+    try:
+        encoding = requested_encoding()
+        filters = requested_filters()
+        view, include, exclude = requested_projection()
+        offset, limit = requested_page()
+        detail = requested_detail()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     try:
-        trails = data_manager.load_all_trails()
-        return jsonify(trails)
+        coding = request.accept_encodings.best_match(CODINGS, default='identity')
+        version = data_manager.data_version()
+        etag = etag_for(version, coding)
+        last_modified = data_manager.last_modified()
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
+        def build():
+            if filters:
+                trails = data_manager.query_trails(**filters)
+            else:
+                trails = data_manager.load_all_trails()
+            
+            if limit is not None:
+                features = trails.get('features', [])
+                end = offset + limit
+                trails = {
+                    "type": "FeatureCollection",
+                    "features": features[offset:end],
+                    "total": len(features),
+                    "next_cursor": encode_cursor(end) if end < len(features) else None
+                }
+            if detail is not None and view != 'summary':
+                trails = data_manager.simplify_trails(trails, detail)
+            if view == 'summary':
+                trails = dict(trails, features=[summarize_feature(f) for f in trails.get('features', [])])
+            elif include is not None or exclude:
+                trails = dict(trails, features=[
+                    project_feature(f, include, exclude) for f in trails.get('features', [])
+                ])
+            if encoding:
+                trails = encode_collection(trails)
+            return json_io.dumpb(trails)
+        
+        # Bodies are keyed by the identity ETag so every coding shares one build
+        body = response_cache.get(request_variant(), etag_for(version), coding, build)
+        response = app.response_class(body, mimetype='application/json')
+        if coding != 'identity':
+            response.headers['Content-Encoding'] = coding
+        response.vary.add('Accept-Encoding')
+        return with_validators(response, etag, last_modified)
     except Exception as e:
         logger.error(f"Error getting trails: {e}")
         return jsonify({"error": str(e)}), 500
@@ -102,6 +458,9 @@ def save_trail():
     """Save a trail"""
     try:
         trail_data = request.json
+        name = trail_data.get('name') if isinstance(trail_data, dict) else None
+        if name in RESERVED_TRAIL_NAMES:
+            return jsonify({"error": f"'{name}' is reserved and cannot be used as a trail name"}), 400
         success = data_manager.save_trail(trail_data)
         if success:
             return jsonify({"message": "Trail saved successfully"}), 200
@@ -111,13 +470,178 @@ def save_trail():
         logger.error(f"Error saving trail: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/trails/batch', methods=['POST'])
+def save_trails_batch():
+    """
+    Save and delete many trails in one write
+
+    Body: {"upsert": [trail, ...], "delete": ["name", ...]} where each trail
+    has the same fields as POST /api/trails. Invalid trails are skipped and
+    reported in the per-item results.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    upserts = body.get('upsert', [])
+    deletes = body.get('delete', [])
+    if not isinstance(upserts, list) or not isinstance(deletes, list):
+        return jsonify({"error": "'upsert' and 'delete' must be lists"}), 400
+    if not all(isinstance(name, str) for name in deletes):
+        return jsonify({"error": "'delete' must be a list of trail names"}), 400
+
+    try:
+        results = data_manager.save_trails(upserts, deletes)
+        summary = {}
+        for result in results:
+            summary[result['status']] = summary.get(result['status'], 0) + 1
+        return jsonify({"results": results, "summary": summary}), 200
+    except Exception as e:
+        logger.error(f"Error saving trail batch: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/trails/changes', methods=['GET'])
+def get_trail_changes():
+    """
+    Get the trails changed since a change version (?since=N, 0 if never synced)
+    
+    Returns the new version, the added or replaced trails and the names of
+    deleted trails. full_resync is true when since is too old (or unknown);
+    the client should then reload /api/trails and continue from version.
+    ?encoding=polyline returns compact coordinates.
+    """
+    try:
+        encoding = requested_encoding()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    since = request.args.get('since', '0')
+    if not since.isdigit():
+        return jsonify({"error": "since must be a change version (0 or more)"}), 400
+    since = int(since)
+    
+    try:
+        changes = data_manager.get_changes(since)
+        if encoding:
+            changes['upserted'] = [
+                dict(trail, geometry=encode_geometry(trail.get('geometry')))
+                for trail in changes['upserted']
+            ]
+        response = jsonify(changes)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        logger.error(f"Error getting trail changes: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def trail_for_id(trail_id):
+    """
+    Resolve a trail_id to exactly one trail
+    
+    Returns:
+        (trail, None), or (None, error response) when no trail or several
+        trails have this ID
+    """
+    matches = data_manager.get_trails_by_id(trail_id)
+    if not matches:
+        return None, (jsonify({"error": "Trail not found"}), 404)
+    if len(matches) > 1:
+        return None, (jsonify({
+            "error": f"Trail ID {trail_id} is shared by {len(matches)} trails",
+            "names": [t['properties'].get('name') for t in matches]
+        }), 409)
+    return matches[0], None
+
+@app.route('/api/trails/by-id/<trail_id>', methods=['GET'])
+def get_trail_by_id(trail_id):
+    """Get a specific trail by trail_id (?encoding=polyline for compact coordinates)"""
+    try:
+        encoding = requested_encoding()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        trail, error = trail_for_id(trail_id)
+        if error:
+            return error
+        if encoding:
+            trail = dict(trail, geometry=encode_geometry(trail.get('geometry')))
+        return jsonify(trail)
+    except Exception as e:
+        logger.error(f"Error getting trail: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/trails/by-id/<trail_id>', methods=['DELETE'])
+def delete_trail_by_id(trail_id):
+    """Delete a trail by trail_id (409 if other trails share its name)"""
+    try:
+        trail, error = trail_for_id(trail_id)
+        if error:
+            return error
+        name = trail['properties'].get('name')
+        # Trails are deleted by name, which would take the others too
+        same_name = data_manager.get_trails_by_name(name)
+        if len(same_name) > 1:
+            return jsonify({
+                "error": f"Trail name '{name}' is shared by {len(same_name)} trails",
+                "trail_ids": [t['properties'].get('trail_id') for t in same_name]
+            }), 409
+        if data_manager.delete_trail(name):
+            return jsonify({"message": "Trail deleted successfully"}), 200
+        return jsonify({"error": "Trail not found"}), 404
+    except Exception as e:
+        logger.error(f"Error deleting trail: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/trails/<trail_id>/profile', methods=['GET'])
+def get_trail_profile(trail_id):
+    """Get a trail's elevation profile for charts (?points=N, default 300)"""
+    points = request.args.get('points', str(DEFAULT_POINTS))
+    if not points.isdigit() or not 2 <= int(points) <= MAX_POINTS:
+        return jsonify({"error": f"points must be a whole number from 2 to {MAX_POINTS}"}), 400
+    points = int(points)
+    
+    try:
+        trail, error = trail_for_id(trail_id)
+        if error:
+            return error
+        name = trail['properties'].get('name')
+        etag = etag_for(f"profile:{data_manager.feature_version(trail)}")
+        last_modified = data_manager.last_modified()
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
+        profile = data_manager.get_profile(trail, points)
+        if profile is None:
+            return jsonify({"error": "Trail has no elevation data"}), 404
+        body = dict(profile, name=name, trail_id=trail_id, distance_unit='mi', elevation_unit='ft')
+        return with_validators(jsonify(body), etag, last_modified)
+    except Exception as e:
+        logger.error(f"Error getting trail profile: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/trails/<trail_name>', methods=['GET'])
 def get_trail(trail_name):
-    """Get a specific trail by name"""
+    """Get a specific trail by name (?encoding=polyline for compact coordinates)"""
+    try:
+        encoding = requested_encoding()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     try:
+        # Per-trail version, so edits to other trails keep this one cached
+        version = data_manager.trail_version(trail_name)
+        if version is not None:
+            etag = etag_for(version)
+            last_modified = data_manager.last_modified()
+            cached = not_modified(etag, last_modified)
+            if cached:
+                return cached
+        
         trail = data_manager.get_trail_by_name(trail_name)
-        if trail:
-            return jsonify(trail)
+        if trail and version is not None:
+            if encoding:
+                trail = dict(trail, geometry=encode_geometry(trail.get('geometry')))
+            return with_validators(jsonify(trail), etag, last_modified)
         else:
             return jsonify({"error": "Trail not found"}), 404
     except Exception as e:
@@ -139,10 +663,19 @@ def delete_trail(trail_name):
 
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
-    """Get trail statistics"""
+    """Get trail statistics (?check=1 also compares them with a full recompute)"""
     try:
+        if request.args.get('check'):
+            return jsonify(data_manager.check_statistics())
+        
+        etag = etag_for(data_manager.data_version())
+        last_modified = data_manager.last_modified()
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
         stats = data_manager.get_statistics()
-        return jsonify(stats)
+        return with_validators(jsonify(stats), etag, last_modified)
     except Exception as e:
         logger.error(f"Error getting statistics: {e}")
         return jsonify({"error": str(e)}), 500
@@ -187,6 +720,8 @@ def import_data():
             return jsonify({"message": "Data imported successfully"}), 200
         else:
             return jsonify({"error": "Failed to import data"}), 500
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         logger.error(f"Error importing data: {e}")
         return jsonify({"error": str(e)}), 500
@@ -210,65 +745,123 @@ def upload_trail_images(trail_id):
         if not files or files[0].filename == '':
             return jsonify({"error": "No files selected"}), 400
         
-        # Create trail-specific directory
-        trail_dir = os.path.join(UPLOAD_FOLDER, f'trail-{trail_id}')
-        os.makedirs(trail_dir, exist_ok=True)
+        # Check every file before saving any
+        for file in files:
+            if not (file and allowed_file(file.filename)):
+                return jsonify({"error": f"File {file.filename} has an invalid extension"}), 400
+            file.seek(0, 2)  # Seek to end
+            file_size = file.tell()
+            file.seek(0)  # Reset to beginning
+            if file_size > MAX_FILE_SIZE:
+                return jsonify({"error": f"File {file.filename} is too large. Maximum size is 10MB."}), 400
         
+        # Store by content: a photo this trail already has is not stored
+        # again, and one another trail has shares its file
         uploaded_files = []
-        
+        added = []
+        new_blobs = {}
         for file in files:
-            if file and allowed_file(file.filename):
-                # Generate unique filename
-                filename = secure_filename(file.filename)
-                name, ext = os.path.splitext(filename)
-                unique_filename = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
-                file_path = os.path.join(trail_dir, unique_filename)
-                
-                # Check file size
-                file.seek(0, 2)  # Seek to end
-                file_size = file.tell()
-                file.seek(0)  # Reset to beginning
-                
-                if file_size > MAX_FILE_SIZE:
-                    return jsonify({"error": f"File {filename} is too large. Maximum size is 10MB."}), 400
-                
-                # Save file
-                file.save(file_path)
-                
-                # Compress image
-                if compress_image(file_path):
-                    uploaded_files.append({
-                        'filename': unique_filename,
-                        'original_name': filename,
-                        'size': os.path.getsize(file_path),
-                        'url': f'/api/trails/{trail_id}/images/{unique_filename}'
-                    })
-                else:
-                    # If compression fails, still keep the file
-                    uploaded_files.append({
-                        'filename': unique_filename,
-                        'original_name': filename,
-                        'size': os.path.getsize(file_path),
-                        'url': f'/api/trails/{trail_id}/images/{unique_filename}'
-                    })
-            else:
-                return jsonify({"error": f"File {file.filename} has an invalid extension"}), 400
+            filename = secure_filename(file.filename)
+            stored = image_store.add(trail_id, file.stream, filename)
+            url = f'/api/trails/{trail_id}/images/{stored["filename"]}'
+            if not stored['existing']:
+                added.append(stored['filename'])
+            if stored['new_blob']:
+                new_blobs[stored['blob']] = url
+            uploaded_files.append({
+                'filename': stored['filename'],
+                'original_name': filename,
+                'size': os.path.getsize(stored['path']),
+                'url': url,
+                'existing': stored['existing']
+            })
+        
+        # Compress new content in the worker pool; the URLs serve the
+        # originals until then
+        job = None
+        if new_blobs:
+            try:
+                job_id = image_jobs.submit(list(new_blobs), list(new_blobs.values()))
+            except QueueFull as e:
+                for filename in added:
+                    image_store.remove(trail_id, filename)
+                response = jsonify({"error": f"Server is busy processing images, try again shortly ({e})"})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            job = {"id": job_id, "status_url": f"/api/jobs/{job_id}"}
         
         return jsonify({
             "message": f"Successfully uploaded {len(uploaded_files)} images",
-            "images": uploaded_files
-        }), 200
+            "images": uploaded_files,
+            "job": job
+        }), 202 if job else 200
         
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         logger.error(f"Error uploading images: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the progress of an image processing job"""
+    status = image_jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    response = jsonify(status)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def requested_image_format():
+    """
+    Pick the derivative format from the Accept header
+    
+    Only formats the client lists by name count; browsers also send */*,
+    which says nothing about what they can decode.
+    
+    Returns:
+        Key of image_processing.OUTPUT_FORMATS (JPEG when nothing better is
+        accepted)
+    """
+    accepted = {mimetype for mimetype, quality in request.accept_mimetypes if quality > 0}
+    for fmt in supported_formats():
+        if OUTPUT_FORMATS[fmt][1] in accepted:
+            return fmt
+    return 'jpeg'
+
 @app.route('/api/trails/<trail_id>/images/<filename>')
 def get_trail_image(trail_id, filename):
-    """Serve trail images"""
+    """Serve trail images (?w=N for a narrower copy; WebP/AVIF when the client accepts them)"""
+    width = request.args.get('w')
+    if width is not None and (not width.isdigit() or not 1 <= int(width) <= MAX_IMAGE_WIDTH):
+        return jsonify({"error": f"w must be a width from 1 to {MAX_IMAGE_WIDTH}"}), 400
+    
     try:
         trail_dir = os.path.join(UPLOAD_FOLDER, f'trail-{trail_id}')
-        return send_from_directory(trail_dir, filename)
+        source_path = safe_join(trail_dir, filename)
+        image = image_catalog.get(trail_id, filename) if source_path else None
+        if image is None:
+            return jsonify({"error": "Image not found"}), 404
+        
+        fmt = requested_image_format()
+        # None for files Pillow cannot read; those are sent as stored
+        source_width = image['width']
+        if source_width is not None:
+            target = derivative_width(int(width) if width else None, source_width)
+            if not (fmt == 'jpeg' and target >= source_width):
+                # Images sharing a blob share its derivatives
+                blob_path = image_store.blob_for(source_path) or source_path
+                path = derivative_cache.get(
+                    blob_path, target, fmt,
+                    lambda: render_derivative(blob_path, target, fmt))
+                if path is not None:
+                    response = send_file(os.path.abspath(path), mimetype=OUTPUT_FORMATS[fmt][1], conditional=True)
+                    response.vary.add('Accept')
+                    return response
+        
+        response = send_from_directory(trail_dir, filename)
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         logger.error(f"Error serving image: {e}")
         return jsonify({"error": "Image not found"}), 404
@@ -277,20 +870,15 @@ def get_trail_image(trail_id, filename):
 def get_trail_images(trail_id):
     """Get all images for a specific trail"""
     try:
-        trail_dir = os.path.join(UPLOAD_FOLDER, f'trail-{trail_id}')
-        
-        if not os.path.exists(trail_dir):
-            return jsonify({"images": []}), 200
-        
         images = []
-        for filename in os.listdir(trail_dir):
-            if allowed_file(filename):
-                file_path = os.path.join(trail_dir, filename)
-                images.append({
-                    'filename': filename,
-                    'size': os.path.getsize(file_path),
-                    'url': f'/api/trails/{trail_id}/images/{filename}'
-                })
+        for image in image_catalog.images(trail_id):
+            images.append({
+                'filename': image['filename'],
+                'size': image['size'],
+                'width': image['width'],
+                'height': image['height'],
+                'url': f'/api/trails/{trail_id}/images/{image["filename"]}'
+            })
         
         return jsonify({"images": images}), 200
         
@@ -305,8 +893,15 @@ def delete_trail_image(trail_id, filename):
         trail_dir = os.path.join(UPLOAD_FOLDER, f'trail-{trail_id}')
         file_path = os.path.join(trail_dir, filename)
         
+        blob_path = image_store.blob_for(file_path)
+        if blob_path is not None:
+            # The blob (and its derivatives) go only with its last reference
+            if image_store.remove(trail_id, filename):
+                derivative_cache.discard(blob_path)
+            return jsonify({"message": "Image deleted successfully"}), 200
         if os.path.exists(file_path):
             os.remove(file_path)
+            derivative_cache.discard(file_path)
             return jsonify({"message": "Image deleted successfully"}), 200
         else:
             return jsonify({"error": "Image not found"}), 404
@@ -315,16 +910,97 @@ def delete_trail_image(trail_id, filename):
         logger.error(f"Error deleting image: {e}")
         return jsonify({"error": str(e)}), 500
 
+def tile_source(layer):
+    """
+    Get the features behind a tile layer and their data version
+    
+    Returns:
+        (version, features, last_modified), or None if the layer's source
+        file does not exist
+    """
+    if layer == 'trails':
+        return (data_manager.data_version(), lambda: data_manager.load_all_trails().get('features', []),
+                data_manager.last_modified())
+    path = TILE_SOURCE_FILES[layer]
+    signature = file_signature(path)
+    if signature is None:
+        return None
+    version = hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()[:20]
+    
+    def features():
+        entry = tile_sources.get(path)
+        if entry is None or entry[0] != signature:
+            entry = (signature, json_io.load_file(path))
+            tile_sources[path] = entry
+        return entry[1].get('features', [])
+    
+    return version, features, datetime.fromtimestamp(signature[0] / 1e9, tz=timezone.utc)
+
+@app.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_tile(layer, z, x, y):
+    """
+    Get one Mapbox Vector Tile of trails, states or parks
+    
+    Features are simplified for the zoom (see trail_simplify.py), clipped to
+    the tile and cached on disk until their source changes.
+    """
+    if layer not in TILE_LAYERS or not valid_tile(z, x, y):
+        return jsonify({"error": "Tile not found"}), 404
+    
+    try:
+        source = tile_source(layer)
+        if source is None:
+            return jsonify({"error": f"No data for layer '{layer}'"}), 404
+        version, features, last_modified = source
+        etag = etag_for(version)
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
+        def build():
+            level = level_for_zoom(z)
+            simplified = features()
+            if level is not None:
+                simplify = data_manager.geometry_cache.simplify
+                simplified = [
+                    dict(f, geometry=simplify(f.get('geometry'), level,
+                                              key=(layer, version, (f.get('properties') or {}).get('name'))))
+                    for f in simplified
+                ]
+            return encode_tile([render_layer(layer, simplified, z, x, y, TILE_LAYERS[layer])])
+        
+        body = tile_cache.get(layer, version, z, x, y, build)
+        response = app.response_class(body, mimetype=TILE_MIME_TYPE)
+        return with_validators(response, etag, last_modified)
+    except Exception as e:
+        logger.error(f"Error getting tile {layer}/{z}/{x}/{y}: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "message": "Trail Blogger API is running"})
+    return jsonify({
+        "status": "healthy",
+        "message": "Trail Blogger API is running",
+        "cache": data_manager.cache_stats(),
+        "response_cache": response_cache.stats(),
+        "geometry_cache": data_manager.geometry_cache.stats(),
+        "profile_cache": data_manager.profile_cache.stats(),
+        "image_jobs": image_jobs.stats(),
+        "image_cache": derivative_cache.stats(),
+        "image_store": image_store.stats(),
+        "image_catalog": image_catalog.stats(),
+        "tile_cache": tile_cache.stats()
+    })
 
 if __name__ == '__main__':
     # Create data directory if it doesn't exist
     if not os.path.exists('data'):
         os.makedirs('data')
     
+    # Index trail bounding boxes once up front; writes keep it current
+    data_manager.get_spatial_index()
+    
     # Run the server
     print("Starting Trail Blogger Server...")
     print("Access the application at: http://localhost:5000")
@@ -5,9 +5,9 @@ This script helps you set up your personal data directory safely.
 """
 
 import os
-import json
 import shutil
 from pathlib import Path
+from json_io import dump_file
 
 def setup_personal_data():
     """Set up the personal data directory structure"""
@@ -53,8 +53,7 @@ def setup_personal_data():
             "type": "FeatureCollection",
             "features": []
         }
-        with open(trails_file, 'w', encoding='utf-8') as f:
-            json.dump(initial_data, f, indent=2)
+        dump_file(trails_file, initial_data, pretty=True)
     
     # Create .gitignore in data directory for extra safety
     gitignore_file = data_dir / ".gitignore"
@@ -0,0 +1,84 @@
+"""Tests for the lossless polyline coordinate encoding"""
+
+import pytest
+
+import coord_codec
+from coord_codec import (decode_collection, decode_coordinates, decode_geometry, encode_collection,
+                         encode_coordinates, encode_geometry)
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def decoder(request, monkeypatch):
+    """Run each test with the numpy decoder and the pure-Python one"""
+    if request.param == 'numpy':
+        if coord_codec.np is None:
+            pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(coord_codec, 'np', None)
+    return request.param
+
+
+def _line(coordinates):
+    return {'type': 'LineString', 'coordinates': coordinates}
+
+
+def test_round_trip_at_default_precision(decoder):
+    coordinates = [[-83.123456, 35.654321, 1523.4], [-83.123457, 35.654322, 1523.5],
+                   [-83.1, 35.6, 0.0], [-83.0, 35.0, -12.3]]
+    encoded = encode_coordinates(coordinates)
+    assert encoded['precision'] == [6, 6, 1]
+    assert decode_coordinates(encoded['coordinates'], encoded['precision']) == coordinates
+
+
+def test_round_trip_2d(decoder):
+    coordinates = [[-105.000001, 39.999999], [-105.0, 40.0], [-104.5, 40.25]]
+    encoded = encode_coordinates(coordinates)
+    assert encoded['precision'] == [6, 6]
+    assert decode_coordinates(encoded['coordinates'], encoded['precision']) == coordinates
+
+
+def test_round_trip_negative_and_antimeridian(decoder):
+    coordinates = [[179.999999, -89.999999, -427.0], [-179.999999, 89.999999, 8848.9],
+                   [180.0, -90.0, 0.1], [-180.0, 90.0, -0.1], [0.0, 0.0, 0.0]]
+    encoded = encode_coordinates(coordinates)
+    assert decode_coordinates(encoded['coordinates'], encoded['precision']) == coordinates
+
+
+def test_mixed_dimensions_fall_back_to_plain(decoder):
+    mixed = _line([[-83.0, 35.0, 1000.0], [-83.1, 35.1], [-83.2, 35.2, 1001.0]])
+    assert encode_coordinates(mixed['coordinates']) is None
+    assert encode_geometry(mixed) is mixed
+
+
+def test_extra_decimal_places_fall_back_to_plain(decoder):
+    too_precise = _line([[-83.1234567, 35.0, 1000.0], [-83.0, 35.0, 1000.0]])
+    assert encode_coordinates(too_precise['coordinates']) is None
+    assert encode_geometry(too_precise) is too_precise
+    elevation = _line([[-83.0, 35.0, 1000.25]])
+    assert encode_geometry(elevation) is elevation
+
+
+def test_non_numbers_fall_back_to_plain(decoder):
+    assert encode_coordinates([[-83.0, 35.0], [True, 35.0]]) is None
+    assert encode_coordinates([[-83.0, 35.0], ['x', 35.0]]) is None
+
+
+def test_collection_round_trip_keeps_unencodable_features(decoder):
+    data = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'name': 'a'},
+         'geometry': _line([[-83.5, 35.25, 1200.0], [-83.50001, 35.25001, 1201.5]])},
+        {'type': 'Feature', 'properties': {'name': 'b'},
+         'geometry': _line([[-83.12345678, 35.0], [-83.0, 35.0]])},
+        {'type': 'Feature', 'properties': {'name': 'c'},
+         'geometry': {'type': 'Point', 'coordinates': [-83.0, 35.0]}},
+    ]}
+    original = [dict(f, geometry=dict(f['geometry'])) for f in data['features']]
+    encoded = encode_collection(data)
+    assert encoded['features'][0]['geometry']['encoding'] == 'polyline'
+    assert 'encoding' not in encoded['features'][1]['geometry']
+    assert decode_collection(encoded)['features'] == original
+
+
+def test_decode_geometry_restores_plain_fields(decoder):
+    geometry = _line([[-83.25, 35.5, 900.0]])
+    assert decode_geometry(encode_geometry(geometry)) == geometry
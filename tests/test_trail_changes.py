@@ -0,0 +1,65 @@
+"""Tests for the change log behind delta sync"""
+
+from trail_changes import ChangeLog
+
+DAY = 86400
+
+
+def test_deleted_trail_leaves_tombstone():
+    log = ChangeLog()
+    start = log.record({'a': 'h1', 'b': 'h2'}, now=0)
+    version = log.record({}, ['a'], now=10)
+    assert version == start + 1
+    assert log.changes_since(start) == ([], ['a'])
+    assert log.changes_since(start - 1) == (['b'], ['a'])
+    assert 'a' not in log.hashes
+    # Upserting the name again replaces its tombstone
+    log.record({'a': 'h3'}, now=20)
+    assert log.changes_since(start) == (['a'], [])
+
+
+def test_pruned_records_force_full_resync():
+    log = ChangeLog()
+    old = log.record({'a': 'h1'}, now=0)
+    log.record({}, ['b'], now=DAY)
+    current = log.record({'c': 'h3'}, now=40 * DAY)
+
+    assert log.prune(30, now=40 * DAY) == 2
+    assert log.horizon == old + 1
+    # Versions before the dropped records, and clients that never synced,
+    # can no longer be caught up change by change
+    assert log.changes_since(old - 1) is None
+    assert log.changes_since(0) is None
+    assert log.changes_since(old + 1) == (['c'], [])
+    assert log.changes_since(current) == ([], [])
+    # A version this log never issued is not trusted either
+    assert log.changes_since(current + 1) is None
+
+
+def test_version_keeps_increasing_across_restarts():
+    log = ChangeLog()
+    first = log.record({'a': 'h1'}, now=0)
+    log.prune(30, now=0)
+    restored = ChangeLog.from_dict(log.to_dict())
+    assert (restored.version, restored.horizon) == (log.version, log.horizon)
+    assert restored.changes_since(first - 1) == (['a'], [])
+    second = restored.record({'b': 'h2'}, now=1)
+    assert second > first
+    assert restored.changes_since(first) == (['b'], [])
+
+
+def test_manager_version_survives_restart(tmp_path):
+    from data_manager import TrailDataManager
+    manager = TrailDataManager(str(tmp_path))
+    manager.save_trail({'name': 'a', 'id': 'a'})
+    manager.save_trail({'name': 'b', 'id': 'b'})
+    version = manager.change_version()
+    manager.delete_trail('a')
+
+    restarted = TrailDataManager(str(tmp_path))
+    assert restarted.change_version() == version + 1
+    changes = restarted.get_changes(version)
+    assert (changes['full_resync'], changes['deleted']) == (False, ['a'])
+    restarted.save_trail({'name': 'c', 'id': 'c'})
+    assert restarted.change_version() == version + 2
+    assert restarted.get_changes(0)['full_resync'] is True
@@ -0,0 +1,66 @@
+"""Tests for elevation profile downsampling"""
+
+from trail_profile import elevation_profile, lttb
+
+
+def _line(n):
+    return {
+        'type': 'LineString',
+        'coordinates': [[-83.0 + i * 0.001, 35.5, 1000 + (i % 7) * 10] for i in range(n)]
+    }
+
+
+def test_lttb_keeps_ends_for_two_points():
+    xs = list(range(50))
+    ys = [x % 5 for x in xs]
+    assert lttb(xs, ys, 2) == [0, 49]
+
+
+def test_lttb_never_exceeds_threshold():
+    xs = list(range(500))
+    ys = [(x * 37) % 101 for x in xs]
+    for threshold in range(2, 20):
+        kept = lttb(xs, ys, threshold)
+        assert len(kept) == threshold
+        assert kept[0] == 0 and kept[-1] == 499
+
+
+def test_profile_with_two_points():
+    profile = elevation_profile(_line(100), 2)
+    assert profile['points'] == 2
+    assert len(profile['distance']) == len(profile['elevation']) == 2
+    assert profile['source_points'] == 100
+
+
+def _dup_manager(tmp_path):
+    from data_manager import TrailDataManager
+    manager = TrailDataManager(str(tmp_path), cached=True)
+    coordinates = [[-83.0 + i * 0.001, 35.5] for i in range(3)]
+    manager.save_geojson({'type': 'FeatureCollection', 'features': [
+        manager.build_feature({'name': 'Dup', 'id': 'a',
+                               'coordinates': [p + [100 * (i + 1)] for i, p in enumerate(coordinates)]}),
+        manager.build_feature({'name': 'Dup', 'id': 'b',
+                               'coordinates': [p + [500 * (i + 1)] for i, p in enumerate(coordinates)]}),
+    ]})
+    return manager
+
+
+def test_same_named_trails_get_their_own_profiles(tmp_path):
+    manager = _dup_manager(tmp_path)
+    (a,), (b,) = manager.get_trails_by_id('a'), manager.get_trails_by_id('b')
+    assert manager.feature_version(a) != manager.feature_version(b)
+    assert manager.get_profile(a)['elevation'] == [328, 656, 984]
+    assert manager.get_profile(b)['elevation'] == [1640, 3281, 4921]
+
+
+def test_profile_route_etags_differ_for_same_named_trails(tmp_path, monkeypatch):
+    import server
+    monkeypatch.setattr(server, 'data_manager', _dup_manager(tmp_path))
+    client = server.app.test_client()
+    a = client.get('/api/trails/a/profile')
+    b = client.get('/api/trails/b/profile')
+    assert a.status_code == b.status_code == 200
+    assert a.get_json()['elevation'] != b.get_json()['elevation']
+    assert a.headers['ETag'] != b.headers['ETag']
+    assert client.get('/api/trails/b/profile', headers={'If-None-Match': a.headers['ETag']}).status_code == 200
+    assert client.get('/api/trails/b/profile?points=2').get_json()['points'] == 2
@@ -0,0 +1,100 @@
+"""Tests for journal replay and crash recovery in the journal storage layout"""
+
+import os
+
+import trail_storage
+from json_io import load_file
+from trail_storage import JournaledGeoJSONStorage
+
+
+def _feature(name, miles=1.0):
+    return {'type': 'Feature', 'properties': {'name': name, 'length_miles': miles},
+            'geometry': {'type': 'LineString', 'coordinates': [[-83.0, 35.0], [-83.1, 35.1]]}}
+
+
+def _storage(tmp_path):
+    return JournaledGeoJSONStorage(str(tmp_path / 'trails.geojson'), str(tmp_path / 'trails.journal'),
+                                   compact_after=1000, background=False)
+
+
+def _names(data):
+    return [(f['properties']['name'], f['properties']['length_miles']) for f in data['features']]
+
+
+def test_load_replays_journal_over_snapshot(tmp_path):
+    storage = _storage(tmp_path)
+    storage.save({'type': 'FeatureCollection', 'features': [_feature('a'), _feature('b')]})
+    storage.commit({}, upserted=[_feature('a', 2.0), _feature('c')])
+    storage.commit({}, deleted=[_feature('b')])
+
+    # The snapshot is untouched until compaction
+    assert _names(load_file(storage.trails_file)) == [('a', 1.0), ('b', 1.0)]
+    assert _names(_storage(tmp_path).load()) == [('a', 2.0), ('c', 1.0)]
+
+    storage.compact()
+    assert not os.path.exists(storage.journal_file)
+    assert not os.path.exists(storage.compacting_file)
+    assert _names(load_file(storage.trails_file)) == [('a', 2.0), ('c', 1.0)]
+
+
+def test_torn_last_record_is_truncated(tmp_path):
+    storage = _storage(tmp_path)
+    storage.save({'type': 'FeatureCollection', 'features': [_feature('a')]})
+    storage.commit({}, upserted=[_feature('b')])
+    good_size = os.path.getsize(storage.journal_file)
+    # A crash mid-append leaves a record without its newline
+    with open(storage.journal_file, 'ab') as f:
+        f.write(b'{"op": "upsert", "feature": {"type": "Fea')
+
+    restarted = _storage(tmp_path)
+    assert _names(restarted.load()) == [('a', 1.0), ('b', 1.0)]
+    assert os.path.getsize(storage.journal_file) == good_size
+
+    # Later appends land after the last good record, not behind the torn one
+    restarted.commit({}, upserted=[_feature('c')])
+    assert _names(_storage(tmp_path).load()) == [('a', 1.0), ('b', 1.0), ('c', 1.0)]
+
+
+def test_crash_between_snapshot_replace_and_journal_removal(tmp_path, monkeypatch):
+    storage = _storage(tmp_path)
+    storage.save({'type': 'FeatureCollection', 'features': [_feature('a'), _feature('b')]})
+    storage.commit({}, upserted=[_feature('a', 2.0)], deleted=[_feature('b')])
+    storage.commit({}, upserted=[_feature('b', 3.0)])
+    expected = [('a', 2.0), ('b', 3.0)]
+
+    # Stop compaction right after the new snapshot is in place
+    real_remove = os.remove
+
+    def crash(path):
+        if path == storage.compacting_file:
+            raise OSError("simulated crash")
+        real_remove(path)
+
+    monkeypatch.setattr(trail_storage.os, 'remove', crash)
+    storage.compact()
+    monkeypatch.setattr(trail_storage.os, 'remove', real_remove)
+
+    assert _names(load_file(storage.trails_file)) == expected
+    assert os.path.exists(storage.compacting_file)
+    assert not os.path.exists(f"{storage.compacting_file}.tmp")
+
+    # Replaying the old journal over the new snapshot changes nothing
+    restarted = _storage(tmp_path)
+    assert _names(restarted.load()) == expected
+    restarted.commit({}, upserted=[_feature('c')])
+    assert _names(_storage(tmp_path).load()) == expected + [('c', 1.0)]
+
+    # The next compaction finishes the leftover journal, then the new one
+    restarted.compact()
+    restarted.compact()
+    assert not os.path.exists(storage.compacting_file)
+    assert not os.path.exists(storage.journal_file)
+    assert _names(load_file(storage.trails_file)) == expected + [('c', 1.0)]
+
+
+def test_snapshot_replaced_by_save_ignores_stale_journal(tmp_path):
+    storage = _storage(tmp_path)
+    storage.commit({}, upserted=[_feature('a')])
+    storage.save({'type': 'FeatureCollection', 'features': [_feature('z')]})
+    assert not os.path.exists(storage.journal_file)
+    assert _names(_storage(tmp_path).load()) == [('z', 1.0)]
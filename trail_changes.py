@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Change Log
+Per-trail change records numbered by a store-wide change version, for delta sync
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+# Default number of days change records are kept before clients that last
+# synced earlier have to download everything again
+DEFAULT_RETENTION_DAYS = 30
+
+
+class ChangeLog:
+    """
+    Latest change of each trail, keyed by name
+
+    Every write that changes trails increments version and stamps the names
+    it upserted or deleted with it; a deleted name keeps a tombstone record.
+    Only the newest record per name is kept, which is all a client needs to
+    catch up. Records older than the retention period are pruned and horizon
+    is raised to the newest pruned version: changes since a version below the
+    horizon can no longer be listed, so the client must resync in full.
+
+    hashes holds a content hash of each stored trail so changes made outside
+    TrailDataManager (scripts editing the files, migrations) can be found by
+    comparison instead of forcing a full resync.
+    """
+
+    def __init__(self):
+        # Start above 0 so a client that never synced (since=0) resyncs
+        self.version = 1
+        self.horizon = 1
+        # name -> [version, deleted, unix time]
+        self.records = {}
+        # name -> feature_hash of the first trail with that name
+        self.hashes = {}
+
+    def record(self, upserted: Dict[str, str], deleted: Iterable[str] = (),
+               now: Optional[float] = None) -> int:
+        """
+        Record one write under a new version
+
+        Args:
+            upserted: Content hash of each added or replaced trail, by name
+            deleted: Names of deleted trails
+            now: Unix time of the write (defaults to the current time)
+
+        Returns:
+            The change version after the write
+        """
+        deleted = [name for name in deleted if name not in upserted]
+        if not upserted and not deleted:
+            return self.version
+        now = time.time() if now is None else now
+        self.version += 1
+        for name in deleted:
+            self.records[name] = [self.version, True, now]
+            self.hashes.pop(name, None)
+        for name, digest in upserted.items():
+            self.records[name] = [self.version, False, now]
+            self.hashes[name] = digest
+        return self.version
+
+    def reconcile(self, hashes: Dict[str, str], now: Optional[float] = None) -> int:
+        """
+        Record whatever differs between the known and the current trails
+
+        Args:
+            hashes: Content hash of every stored trail, by name
+
+        Returns:
+            The change version afterwards (unchanged if nothing differed)
+        """
+        upserted = {
+            name: digest for name, digest in hashes.items()
+            if self.hashes.get(name) != digest
+        }
+        deleted = [name for name in self.hashes if name not in hashes]
+        return self.record(upserted, deleted, now)
+
+    def prune(self, retention_days: float, now: Optional[float] = None) -> int:
+        """
+        Drop records older than the retention period
+
+        Returns:
+            Number of records dropped
+        """
+        now = time.time() if now is None else now
+        cutoff = now - retention_days * 86400
+        expired = [name for name, (_, _, at) in self.records.items() if at < cutoff]
+        for name in expired:
+            self.horizon = max(self.horizon, self.records.pop(name)[0])
+        return len(expired)
+
+    def changes_since(self, since: int) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        List the trails changed after a version
+
+        Args:
+            since: Change version the client last synced to
+
+        Returns:
+            (upserted names, deleted names) in change order, or None if the
+            records no longer reach back to since and a full resync is needed
+        """
+        if since < self.horizon or since > self.version:
+            return None
+        changed = sorted(
+            (record[0], name, record[1]) for name, record in self.records.items()
+            if record[0] > since
+        )
+        upserted = [name for _, name, deleted in changed if not deleted]
+        deleted = [name for _, name, deleted in changed if deleted]
+        return upserted, deleted
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form"""
+        return {
+            'version': self.version,
+            'horizon': self.horizon,
+            'records': self.records,
+            'hashes': self.hashes
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ChangeLog':
+        """Rebuild a change log saved with to_dict"""
+        log = cls()
+        log.version = data['version']
+        log.horizon = data['horizon']
+        log.records = {name: list(record) for name, record in data['records'].items()}
+        log.hashes = dict(data['hashes'])
+        return log
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Trail Index
+In-memory secondary indexes over a loaded trail FeatureCollection
+"""
+
+import hashlib
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Any, Iterable
+
+from json_io import dumpb
+
+# Properties with an exact-match index; values are compared as strings
+INDEXED_PROPERTIES = ('status', 'difficulty', 'park', 'state')
+
+# List properties whose entries are indexed under another property, so a
+# trail crossing several states matches each of them
+LIST_PROPERTIES = {'state': 'states', 'park': 'parks'}
+
+
+def feature_hash(feature: Dict[str, Any]) -> str:
+    """Hash of a trail's serialized content"""
+    return hashlib.sha1(dumpb(feature)).hexdigest()
+
+
+def _name_key(name: Any) -> Optional[str]:
+    """Case-insensitive lookup key for a trail name"""
+    return name.strip().casefold() if isinstance(name, str) else None
+
+
+class TrailIndex:
+    """
+    Lookup tables for one FeatureCollection
+
+    Every index maps to positions in data['features'], so query results keep
+    collection order. The index describes the collection as it was when built;
+    TrailDataManager drops it whenever the trails change.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.features = data.get('features', [])
+        # Content hashes by position, computed on first request
+        self._hashes = {}
+        self.by_trail_id = {}
+        self.by_name = {}
+        self.by_property = {prop: {} for prop in INDEXED_PROPERTIES}
+        dates = []
+        lengths = []
+
+        for position, feature in enumerate(self.features):
+            props = feature.get('properties') or {}
+            trail_id = props.get('trail_id')
+            if trail_id is not None:
+                self.by_trail_id.setdefault(str(trail_id), []).append(position)
+            self.by_name.setdefault(_name_key(props.get('name')), []).append(position)
+            for prop in INDEXED_PROPERTIES:
+                values = {str(v) for v in props.get(LIST_PROPERTIES.get(prop)) or () if v is not None}
+                if props.get(prop) is not None:
+                    values.add(str(props[prop]))
+                for value in values:
+                    self.by_property[prop].setdefault(value, []).append(position)
+            date_hiked = props.get('date_hiked')
+            if isinstance(date_hiked, str) and date_hiked:
+                dates.append((date_hiked, position))
+            length = props.get('length')
+            if isinstance(length, (int, float)) and not isinstance(length, bool):
+                lengths.append((length, position))
+
+        # Sorted (value, position) pairs for range queries
+        dates.sort()
+        lengths.sort()
+        self.date_keys = [d for d, _ in dates]
+        self.date_positions = [p for _, p in dates]
+        self.length_keys = [l for l, _ in lengths]
+        self.length_positions = [p for _, p in lengths]
+
+    def by_id(self, trail_id: str) -> List[Dict[str, Any]]:
+        """Return every trail with this trail_id (imports can share one)"""
+        return [self.features[p] for p in self.by_trail_id.get(str(trail_id), [])]
+
+    def _position(self, name: str) -> Optional[int]:
+        """Position of the first trail with exactly this name"""
+        for position in self.by_name.get(_name_key(name), []):
+            if self.features[position]['properties'].get('name') == name:
+                return position
+        return None
+
+    def by_exact_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the first trail with exactly this name"""
+        position = self._position(name)
+        return None if position is None else self.features[position]
+
+    def by_all_exact_name(self, name: str) -> List[Dict[str, Any]]:
+        """Return every trail with exactly this name"""
+        return [self.features[p] for p in self.by_name.get(_name_key(name), [])
+                if self.features[p]['properties'].get('name') == name]
+
+    def content_hash(self, name: str) -> Optional[str]:
+        """
+        Hash of the first trail with exactly this name (None if not found)
+
+        Serialized once per trail per index, so repeated conditional requests
+        only cost a dictionary lookup.
+        """
+        position = self._position(name)
+        if position is None:
+            return None
+        return self._hash_at(position)
+
+    def feature_hash(self, feature: Dict[str, Any]) -> str:
+        """
+        Hash of one trail of this collection, cached like content_hash
+
+        Unlike content_hash this tells apart trails that share a name.
+        Features not from this collection are hashed on every call.
+        """
+        props = feature.get('properties') or {}
+        for position in self.by_name.get(_name_key(props.get('name')), []):
+            if self.features[position] is feature:
+                return self._hash_at(position)
+        return feature_hash(feature)
+
+    def _hash_at(self, position: int) -> str:
+        digest = self._hashes.get(position)
+        if digest is None:
+            digest = feature_hash(self.features[position])
+            self._hashes[position] = digest
+        return digest
+
+    @staticmethod
+    def _range(keys: List[Any], positions: List[int], low: Any, high: Any) -> set:
+        """Positions whose key lies within [low, high] (either bound optional)"""
+        start = 0 if low is None else bisect_left(keys, low)
+        end = len(keys) if high is None else bisect_right(keys, high)
+        return set(positions[start:end])
+
+    def query(self, status: Iterable[str] = (), difficulty: Iterable[str] = (),
+              park: Iterable[str] = (), state: Iterable[str] = (),
+              trail_id: Iterable[str] = (), name: Iterable[str] = (),
+              date_from: Optional[str] = None, date_to: Optional[str] = None,
+              min_length: Optional[float] = None,
+              max_length: Optional[float] = None,
+              exact_names: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Return the trails matching every given filter, in collection order
+
+        Each list filter matches any of its values (name case-insensitively);
+        empty lists and None bounds are ignored. Dates are ISO strings
+        (YYYY-MM-DD), so trails without date_hiked never match a date range.
+        exact_names, unlike the other filters, also applies when empty: only
+        trails with exactly one of these names match.
+        """
+        candidates = None
+
+        def narrow(positions):
+            nonlocal candidates
+            positions = set(positions)
+            candidates = positions if candidates is None else candidates & positions
+
+        for prop, values in (('status', status), ('difficulty', difficulty),
+                             ('park', park), ('state', state)):
+            if values:
+                table = self.by_property[prop]
+                narrow(p for value in values for p in table.get(str(value), []))
+        if trail_id:
+            narrow(p for value in trail_id for p in self.by_trail_id.get(str(value), []))
+        if name:
+            narrow(p for value in name for p in self.by_name.get(_name_key(value), []))
+        if exact_names is not None:
+            narrow(p for value in exact_names for p in self.by_name.get(_name_key(value), [])
+                   if self.features[p]['properties'].get('name') == value)
+        if date_from is not None or date_to is not None:
+            narrow(self._range(self.date_keys, self.date_positions, date_from, date_to))
+        if min_length is not None or max_length is not None:
+            narrow(self._range(self.length_keys, self.length_positions, min_length, max_length))
+
+        if candidates is None:
+            return list(self.features)
+        return [self.features[p] for p in sorted(candidates)]
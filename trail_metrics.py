@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Trail Metrics
+Length, elevation and extent computed from a trail's coordinates
+"""
+
+import math
+from typing import Dict, List, Optional, Any
+
+try:
+    import numpy as np
+except ImportError:  # numpy only speeds up the computation
+    np = None
+
+# Mean Earth radius (IUGG) in miles, for haversine distances
+EARTH_RADIUS_MILES = 3958.7613
+
+FEET_PER_METER = 3.28084
+
+# Properties set from the metrics; elevation ones only when the trail has elevations
+METRIC_PROPERTIES = ('bbox', 'gps_length', 'elevation_gain', 'elevation_loss',
+                     'min_elevation', 'max_elevation')
+
+
+def _lines(geometry: Optional[Dict[str, Any]]) -> List[List[List[float]]]:
+    """Position lists of a LineString or MultiLineString (empty for anything else)"""
+    if not geometry or geometry.get('encoding'):
+        return []
+    if geometry.get('type') == 'LineString':
+        lines = [geometry.get('coordinates') or []]
+    elif geometry.get('type') == 'MultiLineString':
+        lines = geometry.get('coordinates') or []
+    else:
+        return []
+    return [line for line in lines if line]
+
+
+def _line_metrics_numpy(line: List[List[float]]) -> Optional[Dict[str, Any]]:
+    """Metrics of one line as array operations, or None if its positions are ragged"""
+    try:
+        positions = np.asarray(line, dtype=np.float64)
+    except (ValueError, TypeError):
+        return None
+    if positions.ndim != 2 or positions.shape[1] < 2:
+        return None
+    lon = np.radians(positions[:, 0])
+    lat = np.radians(positions[:, 1])
+    a = (np.sin(np.diff(lat) / 2) ** 2 +
+         np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2)
+    metrics = {
+        'bbox': [float(positions[:, 0].min()), float(positions[:, 1].min()),
+                 float(positions[:, 0].max()), float(positions[:, 1].max())],
+        'miles': float(2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0, 1))).sum())
+    }
+    if positions.shape[1] >= 3:
+        elevation = positions[:, 2]
+        climbs = np.diff(elevation)
+        metrics.update(gain=float(climbs[climbs > 0].sum()), loss=float(-climbs[climbs < 0].sum()),
+                       low=float(elevation.min()), high=float(elevation.max()))
+    return metrics
+
+
+def _line_metrics(line: List[List[float]]) -> Dict[str, Any]:
+    """Metrics of one line, position by position"""
+    miles = gain = loss = 0.0
+    has_elevation = all(len(p) >= 3 for p in line)
+    low = high = line[0][2] if has_elevation else None
+    min_x = max_x = line[0][0]
+    min_y = max_y = line[0][1]
+    for previous, position in zip(line, line[1:]):
+        lat1, lat2 = math.radians(previous[1]), math.radians(position[1])
+        a = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) *
+             math.sin(math.radians(position[0] - previous[0]) / 2) ** 2)
+        miles += 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+        min_x, max_x = min(min_x, position[0]), max(max_x, position[0])
+        min_y, max_y = min(min_y, position[1]), max(max_y, position[1])
+        if has_elevation:
+            climb = position[2] - previous[2]
+            if climb > 0:
+                gain += climb
+            else:
+                loss -= climb
+            low, high = min(low, position[2]), max(high, position[2])
+    metrics = {'bbox': [min_x, min_y, max_x, max_y], 'miles': miles}
+    if has_elevation:
+        metrics.update(gain=gain, loss=loss, low=low, high=high)
+    return metrics
+
+
+def trail_metrics(geometry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Compute a trail's derived properties in one pass over its coordinates
+
+    Lengths are haversine distances on the mean Earth radius (the same
+    formula app.js uses); elevations are read as metres (GPX/GeoJSON
+    convention) and reported in feet. Gain and loss sum every rise and fall
+    between consecutive positions, without smoothing.
+
+    Args:
+        geometry: LineString or MultiLineString geometry
+
+    Returns:
+        Dict with bbox, gps_length (miles) and, when the positions carry
+        elevations (not all zero), elevation_gain, elevation_loss,
+        min_elevation and max_elevation (feet); None if the geometry has no
+        line positions
+    """
+    lines = _lines(geometry)
+    per_line = []
+    for line in lines:
+        metrics = _line_metrics_numpy(line) if np is not None else None
+        if metrics is None:
+            metrics = _line_metrics(line)
+        per_line.append(metrics)
+    if not per_line:
+        return None
+
+    boxes = [m['bbox'] for m in per_line]
+    result = {
+        'bbox': [min(b[0] for b in boxes), min(b[1] for b in boxes),
+                 max(b[2] for b in boxes), max(b[3] for b in boxes)],
+        'gps_length': round(sum(m['miles'] for m in per_line), 2)
+    }
+    # Tracks without elevation data are often written with all zeros
+    if all('gain' in m for m in per_line) and any(m['low'] or m['high'] for m in per_line):
+        result.update(
+            elevation_gain=round(sum(m['gain'] for m in per_line) * FEET_PER_METER),
+            elevation_loss=round(sum(m['loss'] for m in per_line) * FEET_PER_METER),
+            min_elevation=round(min(m['low'] for m in per_line) * FEET_PER_METER),
+            max_elevation=round(max(m['high'] for m in per_line) * FEET_PER_METER)
+        )
+    return result
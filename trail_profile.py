@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Elevation Profiles
+Distance-vs-elevation series for charts, downsampled with
+Largest-Triangle-Three-Buckets
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
+
+from trail_metrics import EARTH_RADIUS_MILES, FEET_PER_METER
+
+# Chart points returned when ?points= is not given, and the most allowed
+DEFAULT_POINTS = 300
+MAX_POINTS = 2000
+
+
+def elevation_series(geometry: Optional[Dict[str, Any]]) -> Optional[Tuple[List[float], List[float]]]:
+    """
+    Cumulative distance and elevation at every position of a trail
+
+    The lines of a MultiLineString follow on from each other; the gap
+    between one line's end and the next one's start is not counted.
+    Positions without an elevation are skipped.
+
+    Returns:
+        (distances in miles, elevations in feet), or None if the trail has
+        no elevations (or only zeros)
+    """
+    if not geometry or geometry.get('encoding'):
+        return None
+    if geometry.get('type') == 'LineString':
+        lines = [geometry.get('coordinates') or []]
+    elif geometry.get('type') == 'MultiLineString':
+        lines = geometry.get('coordinates') or []
+    else:
+        return None
+
+    distances, elevations = [], []
+    total = 0.0
+    for line in lines:
+        previous = None
+        for position in line:
+            if len(position) < 3:
+                continue
+            if previous is not None:
+                lat1, lat2 = math.radians(previous[1]), math.radians(position[1])
+                a = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) *
+                     math.sin(math.radians(position[0] - previous[0]) / 2) ** 2)
+                total += 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+            distances.append(total)
+            elevations.append(position[2] * FEET_PER_METER)
+            previous = position
+    if not any(elevations):
+        return None
+    return distances, elevations
+
+
+def lttb(xs: List[float], ys: List[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    point kept before it and the average of the next bucket. Peaks and
+    valleys survive where averaging or every-nth sampling would flatten
+    them.
+
+    Returns:
+        Indices of the kept points, in order (all of them when there are no
+        more than threshold; just the ends for a threshold of 2)
+    """
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1][:max(threshold, 0)]
+
+    kept = [0]
+    size = (n - 2) / (threshold - 2)
+    a = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * size) + 1
+        end = int((bucket + 1) * size) + 1
+        # Average of the next bucket (just the last point for the final one)
+        next_start, next_end = end, min(int((bucket + 2) * size) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            area = abs((ax - avg_x) * (ys[i] - ay) - (ax - xs[i]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = i, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+
+def elevation_profile(geometry: Optional[Dict[str, Any]], points: int = DEFAULT_POINTS) -> Optional[Dict[str, Any]]:
+    """
+    Downsampled distance-vs-elevation series for one trail
+
+    Args:
+        geometry: LineString or MultiLineString with elevations
+        points: Most chart points to return
+
+    Returns:
+        Dict with distance (miles) and elevation (feet) lists of equal
+        length, the number of points and the source positions; None if the
+        trail has no elevations
+    """
+    series = elevation_series(geometry)
+    if series is None:
+        return None
+    distances, elevations = series
+    kept = lttb(distances, elevations, points)
+    return {
+        'points': len(kept),
+        'source_points': len(distances),
+        'distance': [round(distances[i], 3) for i in kept],
+        'elevation': [round(elevations[i]) for i in kept]
+    }
+
+
+class ProfileCache:
+    """
+    Elevation profiles keyed by trail version and point count
+
+    A trail's version (its content hash) changes whenever it is saved, so a
+    stale profile is never served again; old entries fall out as the least
+    recently used beyond max_entries.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def profile(self, version: str, geometry: Optional[Dict[str, Any]], points: int) -> Optional[Dict[str, Any]]:
+        """Return the profile of a trail version, computing it on first request"""
+        key = (version, points)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        profile = elevation_profile(geometry, points)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = profile
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict with hits, misses (profiles computed) and cached profiles
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'profiles': len(self._entries)}
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Region Assignment
+Finds the states and parks a trail passes through by point-in-polygon tests
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Any
+
+from json_io import load_file
+from trail_spatial import feature_bbox, geometry_bbox, intersects
+from trail_storage import file_signature
+
+try:
+    import numpy as np
+except ImportError:  # numpy only speeds up the point-in-polygon tests
+    np = None
+
+# Region datasets in the data directory: file, property holding the name
+REGION_SOURCES = {
+    'states': ('states.geojson', 'name'),
+    'parks': ('parks_simplified.json', 'NAME')
+}
+
+# Trail positions tested per trail, spread evenly along it
+MAX_SAMPLES = 256
+
+# Largest points x edges block tested at once by the numpy path
+_BLOCK = 1 << 20
+
+
+def sample_positions(coordinates: List[List[float]], limit: int = MAX_SAMPLES) -> List[List[float]]:
+    """Up to limit positions spread evenly along a line, always including both ends"""
+    n = len(coordinates)
+    if n <= limit:
+        return coordinates
+    step = (n - 1) / (limit - 1)
+    return [coordinates[round(i * step)] for i in range(limit)]
+
+
+def _ring_contains(ring: List[List[float]], x: float, y: float) -> bool:
+    """Even-odd rule for one point"""
+    inside = False
+    x1, y1 = ring[-1][0], ring[-1][1]
+    for position in ring:
+        x2, y2 = position[0], position[1]
+        if (y1 <= y) != (y2 <= y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def _ring_contains_numpy(edges, xs, ys):
+    """Even-odd rule for many points against an (edges, 4) array of x1, y1, x2, y2"""
+    inside = np.zeros(len(xs), dtype=bool)
+    # Only edges spanning the points' latitudes can cross their rays
+    low, high = ys.min(), ys.max()
+    edges = edges[(np.maximum(edges[:, 1], edges[:, 3]) >= low) &
+                  (np.minimum(edges[:, 1], edges[:, 3]) <= high)]
+    if not len(edges):
+        return inside
+    rows = max(1, _BLOCK // len(edges))
+    x1, y1, x2, y2 = edges.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, len(xs), rows):
+            px = xs[start:start + rows, None]
+            py = ys[start:start + rows, None]
+            straddles = (y1 <= py) != (y2 <= py)
+            crossing = straddles & (px < x1 + (py - y1) * (x2 - x1) / (y2 - y1))
+            inside[start:start + rows] = np.count_nonzero(crossing, axis=1) % 2 == 1
+    return inside
+
+
+class RegionSet:
+    """
+    Named polygons (one dataset) with a bounding box per polygon
+
+    locate() only tests the polygons whose box meets the trail's, and only
+    the trail positions inside each box.
+    """
+
+    def __init__(self, features: List[Dict[str, Any]], name_property: str):
+        # (name, bbox, rings) per polygon; rings[0] is the outer ring
+        self.polygons = []
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            name = (feature.get('properties') or {}).get(name_property)
+            if not name:
+                continue
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry.get('coordinates') or []]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry.get('coordinates') or []
+            else:
+                continue
+            for rings in polygons:
+                if not rings or len(rings[0]) < 4:
+                    continue
+                bbox = geometry_bbox({'type': 'Polygon', 'coordinates': rings})
+                if np is not None:
+                    rings = [
+                        np.column_stack((ring[:, :2], np.roll(ring[:, :2], -1, axis=0)))
+                        for ring in (np.asarray([p[:2] for p in r], dtype=np.float64) for r in rings)
+                    ]
+                self.polygons.append((name, bbox, rings))
+
+    def locate(self, positions: List[List[float]], bbox: Optional[List[float]] = None) -> Dict[str, int]:
+        """
+        Count the positions inside each region
+
+        Args:
+            positions: [lon, lat, ...] positions
+            bbox: Extent of the positions, if already known
+
+        Returns:
+            Region name -> number of positions inside it (regions without
+            any are left out)
+        """
+        counts = {}
+        if not positions:
+            return counts
+        if bbox is None:
+            bbox = geometry_bbox({'type': 'MultiPoint', 'coordinates': positions})
+        points = np.asarray([p[:2] for p in positions], dtype=np.float64) if np is not None else None
+
+        for name, region_bbox, rings in self.polygons:
+            if not intersects(bbox, region_bbox):
+                continue
+            if points is not None:
+                x, y = points[:, 0], points[:, 1]
+                near = ((x >= region_bbox[0]) & (x <= region_bbox[2]) &
+                        (y >= region_bbox[1]) & (y <= region_bbox[3]))
+                if not near.any():
+                    continue
+                x, y = x[near], y[near]
+                inside = _ring_contains_numpy(rings[0], x, y)
+                for hole in rings[1:]:
+                    inside &= ~_ring_contains_numpy(hole, x, y)
+                count = int(np.count_nonzero(inside))
+            else:
+                count = 0
+                for position in positions:
+                    px, py = position[0], position[1]
+                    if not (region_bbox[0] <= px <= region_bbox[2] and region_bbox[1] <= py <= region_bbox[3]):
+                        continue
+                    if _ring_contains(rings[0], px, py) and not any(
+                            _ring_contains(hole, px, py) for hole in rings[1:]):
+                        count += 1
+            if count:
+                counts[name] = counts.get(name, 0) + count
+        return counts
+
+
+class RegionAssigner:
+    """
+    Assigns states and parks to trails from the datasets in a data directory
+
+    Each dataset is loaded on first use and reloaded when its file changes;
+    a missing file (the parks dataset is optional) leaves that property
+    untouched.
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        # kind -> (file signature, RegionSet)
+        self._sets = {}
+        self._lock = threading.Lock()
+
+    def _region_set(self, kind: str) -> Optional[RegionSet]:
+        """RegionSet for 'states' or 'parks', or None if its file is missing"""
+        filename, name_property = REGION_SOURCES[kind]
+        path = os.path.join(self.data_dir, filename)
+        signature = file_signature(path)
+        if signature is None:
+            return None
+        entry = self._sets.get(kind)
+        if entry is None or entry[0] != signature:
+            with self._lock:
+                entry = (signature, RegionSet(load_file(path).get('features', []), name_property))
+                self._sets[kind] = entry
+        return entry[1]
+
+    def assign(self, feature: Dict[str, Any]) -> bool:
+        """
+        Set a trail's states/parks lists and its primary state/park
+
+        states and parks list every region the trail passes through, most
+        visited first; state and park are set to the first of each. Trails
+        outside a dataset keep the state or park they were given.
+
+        Returns:
+            True if any property changed
+        """
+        geometry = feature.get('geometry')
+        if not geometry or geometry.get('type') not in ('LineString', 'MultiLineString'):
+            return False
+        lines = [geometry.get('coordinates') or []]
+        if geometry['type'] == 'MultiLineString':
+            lines = geometry.get('coordinates') or []
+        positions = [p for line in lines for p in line if isinstance(p, list) and len(p) >= 2]
+        if not positions:
+            return False
+        positions = sample_positions(positions)
+        bbox = feature_bbox(feature)
+
+        props = feature['properties']
+        before = {key: props.get(key) for key in ('state', 'states', 'park', 'parks')}
+        for kind, single in (('states', 'state'), ('parks', 'park')):
+            regions = self._region_set(kind)
+            if regions is None:
+                continue
+            counts = regions.locate(positions, bbox)
+            names = sorted(counts, key=lambda name: -counts[name])
+            props[kind] = names
+            if names:
+                props[single] = names[0]
+        return any(props.get(key) != value for key, value in before.items())
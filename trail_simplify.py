@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Geometry Simplification
+Douglas-Peucker levels of detail for drawing trails at lower map zooms
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any
+
+from json_io import dumpb
+
+try:
+    import numpy as np
+except ImportError:  # numpy only speeds up simplification
+    np = None
+
+# Map zooms with a precomputed level of detail. A request for another zoom
+# uses the next finer level; above the last one trails are sent in full.
+LOD_ZOOMS = (4, 6, 8, 10, 12, 14)
+
+# Spans shorter than this are searched in pure Python, where numpy's per-call
+# overhead costs more than the loop it replaces
+NUMPY_MIN_SPAN = 64
+
+# Allowed deviation from the full trail, in screen pixels at the level's zoom
+PIXEL_TOLERANCE = 1.0
+
+
+def tolerance_for_zoom(zoom: float) -> float:
+    """Degrees of longitude (Web Mercator) covered by PIXEL_TOLERANCE pixels at a zoom"""
+    return PIXEL_TOLERANCE * 360.0 / (256 * 2 ** zoom)
+
+
+def level_for_zoom(zoom: float) -> Optional[int]:
+    """Index into LOD_ZOOMS for a map zoom, or None for full resolution"""
+    for level, lod_zoom in enumerate(LOD_ZOOMS):
+        if lod_zoom >= zoom:
+            return level
+    return None
+
+
+def level_for_tolerance(tolerance: float) -> Optional[int]:
+    """Coarsest level that deviates at most tolerance degrees, or None for full resolution"""
+    for level, lod_zoom in enumerate(LOD_ZOOMS):
+        if tolerance_for_zoom(lod_zoom) <= tolerance:
+            return level
+    return None
+
+
+def _project(coordinates: List[List[float]]) -> List[List[float]]:
+    """Web Mercator x/y in degrees, so tolerances are the same on screen at every latitude"""
+    projected = []
+    for position in coordinates:
+        lat = max(min(position[1], 85.0), -85.0)
+        y = math.degrees(math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)))
+        projected.append([position[0], y])
+    return projected
+
+
+def _farthest(xy: List[List[float]], first: int, last: int):
+    """Index and distance of the point farthest from the segment first-last"""
+    ax, ay = xy[first]
+    bx, by = xy[last]
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    best, best_dist = first + 1, -1.0
+    for i in range(first + 1, last):
+        px, py = xy[i]
+        t = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+        ex, ey = px - ax - t * dx, py - ay - t * dy
+        dist = ex * ex + ey * ey
+        if dist > best_dist:
+            best, best_dist = i, dist
+    return best, math.sqrt(best_dist)
+
+
+def _farthest_numpy(xy, first: int, last: int):
+    """Vectorized _farthest over a numpy array of points"""
+    a = xy[first]
+    d = xy[last] - a
+    length_sq = float(d @ d)
+    p = xy[first + 1:last] - a
+    if length_sq == 0:
+        t = np.zeros(len(p))
+    else:
+        t = np.clip(p @ d / length_sq, 0.0, 1.0)
+    e = p - t[:, None] * d
+    dist = np.einsum('ij,ij->i', e, e)
+    i = int(np.argmax(dist))
+    return first + 1 + i, math.sqrt(float(dist[i]))
+
+
+def significance(coordinates: List[List[float]]) -> List[float]:
+    """
+    Douglas-Peucker significance of every position
+
+    A position is kept at tolerance t exactly when its significance is
+    greater than t, so one pass serves every level of detail. Each value is
+    capped by its parent split's, which keeps the levels nested. Endpoints
+    are always kept.
+    """
+    n = len(coordinates)
+    weights = [0.0] * n
+    if n == 0:
+        return weights
+    weights[0] = weights[-1] = math.inf
+    xy = _project(coordinates)
+    xy_array = np.asarray(xy, dtype=np.float64) if np is not None and n > NUMPY_MIN_SPAN else None
+    stack = [(0, n - 1, math.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        if xy_array is not None and last - first > NUMPY_MIN_SPAN:
+            index, dist = _farthest_numpy(xy_array, first, last)
+        else:
+            index, dist = _farthest(xy, first, last)
+        weight = min(dist, cap)
+        weights[index] = weight
+        stack.append((first, index, weight))
+        stack.append((index, last, weight))
+    return weights
+
+
+def _line_levels(coordinates: List[List[float]]) -> List[List[List[float]]]:
+    """Coordinates of one line at every level in LOD_ZOOMS"""
+    if not coordinates or not isinstance(coordinates[0], list):
+        return [coordinates] * len(LOD_ZOOMS)
+    weights = significance(coordinates)
+    return [
+        [position for position, weight in zip(coordinates, weights) if weight > tolerance]
+        for tolerance in (tolerance_for_zoom(zoom) for zoom in LOD_ZOOMS)
+    ]
+
+
+def _polygon_levels(rings: List[List[List[float]]]) -> List[List[List[List[float]]]]:
+    """Rings of one polygon at every level; rings reduced below a triangle are dropped"""
+    per_ring = [_line_levels(ring) for ring in rings]
+    levels = []
+    for level in range(len(LOD_ZOOMS)):
+        kept = [ring_levels[level] for ring_levels in per_ring]
+        if not kept or len(kept[0]) < 4:
+            # The outer ring collapsed; keep the polygon as given at this level
+            kept = rings
+        levels.append([ring for ring in kept if len(ring) >= 4])
+    return levels
+
+
+def geometry_levels(geometry: Optional[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Simplified copies of a geometry at every level in LOD_ZOOMS
+
+    Lines and polygon rings are simplified (a ring's closing position is its
+    fixed endpoint); points are returned unchanged at every level.
+    """
+    if not geometry or geometry.get('encoding'):
+        return [geometry] * len(LOD_ZOOMS)
+    if geometry.get('type') == 'LineString':
+        return [dict(geometry, coordinates=line) for line in _line_levels(geometry.get('coordinates'))]
+    if geometry.get('type') == 'MultiLineString':
+        per_line = [_line_levels(line) for line in geometry.get('coordinates') or []]
+        return [
+            dict(geometry, coordinates=[levels[level] for levels in per_line])
+            for level in range(len(LOD_ZOOMS))
+        ]
+    if geometry.get('type') == 'Polygon':
+        return [dict(geometry, coordinates=rings)
+                for rings in _polygon_levels(geometry.get('coordinates') or [])]
+    if geometry.get('type') == 'MultiPolygon':
+        per_polygon = [_polygon_levels(polygon) for polygon in geometry.get('coordinates') or []]
+        return [
+            dict(geometry, coordinates=[levels[level] for levels in per_polygon])
+            for level in range(len(LOD_ZOOMS))
+        ]
+    return [geometry] * len(LOD_ZOOMS)
+
+
+class SimplifiedGeometryCache:
+    """
+    Levels of detail per trail geometry
+
+    All levels of a geometry are computed together the first time any is
+    requested. Callers pass a key naming the geometry's version (trail name
+    and data version, say): a lookup by key costs a dictionary access, and
+    the entry is used only if it was stored for this same geometry object,
+    so trails sharing a name cannot be confused. On a miss the geometry's
+    coordinates are hashed, and an unchanged geometry (another trail saved,
+    a reload) reuses the levels stored under its hash. Old entries fall out
+    as the least recently used beyond max_entries.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        # key -> (geometry, levels); content hash -> (None, levels)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def simplify(self, geometry: Optional[Dict[str, Any]], level: int,
+                 key: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return a geometry at a level of detail (index into LOD_ZOOMS)
+
+        Args:
+            geometry: GeoJSON geometry, treated as read-only
+            level: Level of detail
+            key: Hashable name for this version of the geometry; without
+                one, every lookup hashes the coordinates
+        """
+        if not geometry:
+            return geometry
+        if key is not None:
+            with self._lock:
+                entry = self._entries.get(('key', key))
+                if entry is not None and entry[0] is geometry:
+                    self._entries.move_to_end(('key', key))
+                    self.hits += 1
+                    return entry[1][level]
+
+        digest = hashlib.sha1(dumpb(geometry)).hexdigest()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                levels = entry[1]
+            else:
+                levels = None
+        if levels is None:
+            levels = geometry_levels(geometry)
+            with self._lock:
+                self.misses += 1
+                self._entries[digest] = (None, levels)
+        with self._lock:
+            if key is not None:
+                self._entries[('key', key)] = (geometry, levels)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return levels[level]
+
+    def clear(self):
+        """Drop every cached level"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict with hits, misses (geometries simplified), cached geometries
+            and the zooms of the levels
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'geometries': sum(1 for key in self._entries if isinstance(key, str)),
+                'lod_zooms': list(LOD_ZOOMS)
+            }
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Spatial Index
+Trail bounding boxes and a grid index for "trails in this map view" queries
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Set, Any
+
+# Grid cell size in degrees; most trails fit in one or two cells
+CELL_SIZE = 0.5
+
+BBox = Sequence[float]
+
+
+def geometry_bbox(geometry: Optional[Dict[str, Any]]) -> Optional[List[float]]:
+    """[min_lon, min_lat, max_lon, max_lat] of a geometry, or None if it has no positions"""
+    if not geometry or geometry.get('encoding'):
+        return None
+    min_x = min_y = math.inf
+    max_x = max_y = -math.inf
+    stack = [geometry.get('coordinates') or []]
+    while stack:
+        item = stack.pop()
+        if item and isinstance(item[0], (int, float)):
+            x, y = item[0], item[1]
+            if x < min_x:
+                min_x = x
+            if x > max_x:
+                max_x = x
+            if y < min_y:
+                min_y = y
+            if y > max_y:
+                max_y = y
+        elif isinstance(item, list):
+            stack.extend(item)
+    if min_x == math.inf:
+        return None
+    return [min_x, min_y, max_x, max_y]
+
+
+def valid_bbox(bbox: Any) -> bool:
+    """True for a [min_lon, min_lat, max_lon, max_lat] list of numbers"""
+    return (isinstance(bbox, (list, tuple)) and len(bbox) == 4
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in bbox)
+            and bbox[0] <= bbox[2] and bbox[1] <= bbox[3])
+
+
+def feature_bbox(feature: Dict[str, Any]) -> Optional[List[float]]:
+    """A trail's bbox property (set when it was saved), else computed from its geometry"""
+    bbox = (feature.get('properties') or {}).get('bbox')
+    if valid_bbox(bbox):
+        return bbox
+    return geometry_bbox(feature.get('geometry'))
+
+
+def intersects(a: BBox, b: BBox) -> bool:
+    """True if two bounding boxes overlap or touch"""
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+
+def union(a: Optional[BBox], b: Optional[BBox]) -> Optional[List[float]]:
+    """Smallest bbox covering both (either may be None)"""
+    if a is None:
+        return list(b) if b is not None else None
+    if b is None:
+        return list(a)
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def _cells(bbox: BBox):
+    """Grid cell ranges covered by a bbox"""
+    return (range(math.floor(bbox[0] / CELL_SIZE), math.floor(bbox[2] / CELL_SIZE) + 1),
+            range(math.floor(bbox[1] / CELL_SIZE), math.floor(bbox[3] / CELL_SIZE) + 1))
+
+
+class SpatialIndex:
+    """
+    Uniform grid over trail bounding boxes, keyed by trail name
+
+    set() and remove() touch only the cells of one bbox, so writes update
+    the index in place. A name's bbox covers every trail with that name;
+    query() may return names whose trails only come close, and callers check
+    each trail's own bbox.
+    """
+
+    def __init__(self):
+        self.bboxes = {}
+        self._grid = {}
+
+    def set(self, name: str, bbox: Optional[BBox]):
+        """Index a name under a bbox, replacing any previous one (None removes it)"""
+        self.remove(name)
+        if bbox is None:
+            return
+        self.bboxes[name] = list(bbox)
+        xs, ys = _cells(bbox)
+        for cx in xs:
+            for cy in ys:
+                self._grid.setdefault((cx, cy), set()).add(name)
+
+    def remove(self, name: str):
+        """Drop a name from the index"""
+        bbox = self.bboxes.pop(name, None)
+        if bbox is None:
+            return
+        xs, ys = _cells(bbox)
+        for cx in xs:
+            for cy in ys:
+                cell = self._grid.get((cx, cy))
+                if cell is not None:
+                    cell.discard(name)
+                    if not cell:
+                        del self._grid[(cx, cy)]
+
+    def query(self, bbox: BBox) -> Set[str]:
+        """Names whose bbox intersects bbox"""
+        xs, ys = _cells(bbox)
+        if len(xs) * len(ys) > len(self._grid):
+            # Larger than the occupied grid: checking every name is cheaper
+            candidates = self.bboxes.keys()
+        else:
+            candidates = set()
+            for cx in xs:
+                for cy in ys:
+                    candidates.update(self._grid.get((cx, cy), ()))
+        return {name for name in candidates if intersects(self.bboxes[name], bbox)}
+
+    def __len__(self) -> int:
+        return len(self.bboxes)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Statistics Aggregates
+Running totals over trail properties, updated by deltas on every change
+"""
+
+from typing import Dict, Iterable, Any
+
+# Miles are summed with floats; rounding after each update stops add/remove
+# cycles from drifting, and is far below the 0.1 mile shown to users
+MILES_PRECISION = 6
+
+
+def _miles(props: Dict[str, Any]) -> float:
+    """A trail's length as a number (0 when missing or not numeric)"""
+    length = props.get('length', 0)
+    if isinstance(length, bool) or not isinstance(length, (int, float)):
+        return 0
+    return length
+
+
+class TrailStatistics:
+    """
+    Aggregates behind /api/statistics and backup metadata
+
+    add() and remove() apply one trail's properties in O(1), so saves and
+    deletes keep the totals current without rescanning the collection.
+    """
+
+    def __init__(self):
+        self.total_trails = 0
+        self.hiked_trails = 0
+        self.hiked_miles = 0.0
+        self.total_miles = 0.0
+        self.total_images = 0
+        self.difficulties = {}
+
+    @classmethod
+    def from_properties(cls, properties: Iterable[Dict[str, Any]]) -> 'TrailStatistics':
+        """Compute the aggregates with a full pass over every trail"""
+        stats = cls()
+        for props in properties:
+            stats.add(props)
+        return stats
+
+    def _apply(self, props: Dict[str, Any], sign: int):
+        """Add (sign 1) or subtract (sign -1) one trail's contribution"""
+        miles = _miles(props)
+        self.total_trails += sign
+        self.total_miles = round(self.total_miles + sign * miles, MILES_PRECISION)
+        self.total_images += sign * len(props.get('images') or [])
+        if props.get('status') == 'hiked':
+            self.hiked_trails += sign
+            self.hiked_miles = round(self.hiked_miles + sign * miles, MILES_PRECISION)
+        difficulty = props.get('difficulty', 'unknown')
+        count = self.difficulties.get(difficulty, 0) + sign
+        if count:
+            self.difficulties[difficulty] = count
+        else:
+            self.difficulties.pop(difficulty, None)
+
+    def add(self, props: Dict[str, Any]):
+        """Count a trail that was added"""
+        self._apply(props, 1)
+
+    def remove(self, props: Dict[str, Any]):
+        """Uncount a trail that was removed"""
+        self._apply(props, -1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form, also used to compare two aggregates"""
+        return {
+            'total_trails': self.total_trails,
+            'hiked_trails': self.hiked_trails,
+            'hiked_miles': self.hiked_miles,
+            'total_miles': self.total_miles,
+            'total_images': self.total_images,
+            'difficulties': dict(sorted(self.difficulties.items(), key=lambda kv: str(kv[0])))
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TrailStatistics':
+        """Rebuild aggregates saved with to_dict"""
+        stats = cls()
+        stats.total_trails = data['total_trails']
+        stats.hiked_trails = data['hiked_trails']
+        stats.hiked_miles = data['hiked_miles']
+        stats.total_miles = data['total_miles']
+        stats.total_images = data['total_images']
+        stats.difficulties = dict(data['difficulties'])
+        return stats
+
+    def matches(self, other: 'TrailStatistics') -> bool:
+        """True if both aggregates agree (miles within rounding of each other)"""
+        mine, theirs = self.to_dict(), other.to_dict()
+        for key in ('hiked_miles', 'total_miles'):
+            if abs(mine.pop(key) - theirs.pop(key)) > 10 ** -(MILES_PRECISION - 2):
+                return False
+        return mine == theirs
@@ -0,0 +1,780 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Storage Backends
+On-disk formats used by TrailDataManager to persist the trail FeatureCollection
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+from array import array
+from typing import Dict, List, Optional, Any
+import logging
+from coord_codec import decode_collection, encode_collection
+from json_io import dumpb, dumps, dump_file, load_file, loads
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def file_signature(path: str) -> Optional[tuple]:
+    """Return (mtime, size, inode) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def fsync_directory(path: str):
+    """Flush a directory entry change (a rename or removal) to disk"""
+    if os.name != 'posix':
+        return  # directories cannot be opened for fsync on Windows
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def strip_geometry(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Copy a FeatureCollection with every geometry replaced by None"""
+    if data is None:
+        return None
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "properties": feature.get('properties', {}), "geometry": None}
+            for feature in data.get('features', [])
+        ]
+    }
+
+
+class TrailStorage:
+    """
+    Interface implemented by every storage backend
+
+    Backends that set supports_queries answer get_trail_by_name and apply
+    commit() changes by name themselves; for the others TrailDataManager
+    works on the loaded FeatureCollection. Backends that set
+    lazy_geometry can load properties without reading coordinates.
+    """
+
+    layout = None
+    supports_queries = False
+    lazy_geometry = False
+
+    def signature(self) -> Optional[tuple]:
+        """Token that changes whenever the stored data changes (None if empty)"""
+        raise NotImplementedError
+
+    def last_modified(self) -> Optional[float]:
+        """Unix time of the last change (None if empty), from signature()"""
+        signature = self.signature()
+        return signature[0] / 1e9 if signature else None
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Return the stored FeatureCollection, or None if nothing is stored"""
+        raise NotImplementedError
+
+    def load_metadata(self) -> Optional[Dict[str, Any]]:
+        """Return the stored FeatureCollection with null geometries"""
+        return strip_geometry(self.load())
+
+    def save(self, data: Dict[str, Any]):
+        """Replace the stored collection with data"""
+        raise NotImplementedError
+
+    def commit(self, data: Dict[str, Any], upserted: List[Dict[str, Any]] = (),
+               deleted: List[Dict[str, Any]] = ()):
+        """
+        Persist data after some features were added, replaced or removed
+
+        Args:
+            data: The full collection, already containing the changes
+            upserted: Features that were added or replaced in data
+            deleted: Features that were removed from data
+        """
+        self.save(data)
+
+    def compact(self, background: bool = False):
+        """Fold any pending changes into the canonical files"""
+
+    def get_trail_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the first trail with this name (supports_queries only)"""
+        raise NotImplementedError
+
+
+class GeoJSONFileStorage(TrailStorage):
+    """
+    All trails in a single GeoJSON FeatureCollection (data/trails.geojson)
+
+    With coordinate_encoding='polyline' the file is written compactly with
+    LineString coordinates encoded by coord_codec; encoded files are always
+    decoded on load whatever the setting.
+    """
+
+    layout = 'single'
+
+    def __init__(self, trails_file: str, coordinate_encoding: Optional[str] = None):
+        if coordinate_encoding not in (None, 'polyline'):
+            raise ValueError(f"Unknown coordinate encoding: {coordinate_encoding}")
+        self.trails_file = trails_file
+        self.coordinate_encoding = coordinate_encoding
+
+    def _file_contents(self, data: Dict[str, Any]) -> tuple:
+        """Return (data to write, pretty) for the configured encoding"""
+        if self.coordinate_encoding:
+            return encode_collection(data), False
+        # Pretty by default: trails.geojson is committed and diffed in git
+        return data, True
+
+    def signature(self) -> Optional[tuple]:
+        """Stat signature that changes whenever the stored data changes"""
+        return file_signature(self.trails_file)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the stored FeatureCollection
+
+        Returns:
+            GeoJSON FeatureCollection, or None if nothing has been stored yet
+        """
+        if not os.path.exists(self.trails_file):
+            return None
+        return decode_collection(load_file(self.trails_file))
+
+    def save(self, data: Dict[str, Any]):
+        """Replace the stored collection with data"""
+        contents, pretty = self._file_contents(data)
+        dump_file(self.trails_file, contents, pretty=pretty)
+        logger.info(f"Saved GeoJSON to: {self.trails_file}")
+
+
+
+class ShardedTrailStorage(TrailStorage):
+    """
+    One file per trail plus a small manifest (data/trail_shards/)
+
+    The manifest lists the shards in collection order, so saving or deleting a
+    single trail rewrites only that trail's shard and the manifest instead of
+    every coordinate in the collection.
+    """
+
+    layout = 'sharded'
+
+    def __init__(self, shard_dir: str):
+        self.shard_dir = shard_dir
+        self.manifest_file = os.path.join(shard_dir, "manifest.json")
+
+    def signature(self) -> Optional[tuple]:
+        """Stat signature of the manifest, which is rewritten on every change"""
+        return file_signature(self.manifest_file)
+
+    def _read_manifest(self) -> List[Dict[str, Any]]:
+        """Return the manifest entries, or an empty list if there is no manifest"""
+        if not os.path.exists(self.manifest_file):
+            return []
+        return load_file(self.manifest_file).get('trails', [])
+
+    @staticmethod
+    def _manifest_entry(feature: Dict[str, Any], filename: str) -> Dict[str, Any]:
+        """Build the manifest entry describing a feature's shard"""
+        props = feature.get('properties', {})
+        return {
+            'file': filename,
+            'trail_id': props.get('trail_id'),
+            'name': props.get('name'),
+            'updated_at': props.get('updated_at')
+        }
+
+    @staticmethod
+    def _assign_files(features: List[Dict[str, Any]]) -> List[str]:
+        """
+        Pick a shard filename for every feature
+
+        Names are derived from trail_id plus a hash of the trail name (trail
+        ids are not unique in older data), with a numeric suffix for exact
+        duplicates.
+        """
+        files = []
+        used = set()
+        for feature in features:
+            props = feature.get('properties', {})
+            safe_id = re.sub(r'[^A-Za-z0-9_-]+', '_', str(props.get('trail_id') or ''))[:40]
+            digest = hashlib.sha1(str(props.get('name', '')).encode('utf-8')).hexdigest()[:8]
+            base = f"{safe_id or 'trail'}-{digest}"
+            filename = f"{base}.geojson"
+            counter = 2
+            while filename in used:
+                filename = f"{base}-{counter}.geojson"
+                counter += 1
+            used.add(filename)
+            files.append(filename)
+        return files
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Assemble the FeatureCollection from the manifest and shards
+
+        Returns:
+            GeoJSON FeatureCollection, or None if nothing has been stored yet
+        """
+        if not os.path.exists(self.manifest_file):
+            return None
+        features = []
+        for entry in self._read_manifest():
+            shard_path = os.path.join(self.shard_dir, entry['file'])
+            try:
+                features.append(load_file(shard_path))
+            except FileNotFoundError:
+                logger.warning(f"Missing trail shard: {shard_path}")
+        return {
+            "type": "FeatureCollection",
+            "features": features
+        }
+
+    def save(self, data: Dict[str, Any]):
+        """Replace the stored collection with data, rewriting every shard"""
+        self.commit(data, upserted=data.get('features', []))
+
+    def commit(self, data: Dict[str, Any], upserted: List[Dict[str, Any]] = (),
+               deleted: List[Dict[str, Any]] = ()):
+        """
+        Persist data after some features were added, replaced or removed
+
+        Only the shards of upserted features (and of any feature whose shard
+        no longer matches the manifest) are written; shards that are no longer
+        referenced are removed after the new manifest is in place.
+
+        Args:
+            data: The full collection, already containing the changes
+            upserted: Features that were added or replaced in data
+            deleted: Features that were removed from data
+        """
+        os.makedirs(self.shard_dir, exist_ok=True)
+        features = data.get('features', [])
+        files = self._assign_files(features)
+        old_entries = {entry['file']: entry for entry in self._read_manifest()}
+        upserted_ids = {id(feature) for feature in upserted}
+
+        entries = []
+        written = 0
+        for feature, filename in zip(features, files):
+            entry = self._manifest_entry(feature, filename)
+            if id(feature) in upserted_ids or old_entries.get(filename) != entry:
+                dump_file(os.path.join(self.shard_dir, filename), feature)
+                written += 1
+            entries.append(entry)
+
+        dump_file(self.manifest_file, {'version': 1, 'trails': entries}, pretty=True)
+
+        for stale in set(old_entries) - set(files):
+            try:
+                os.remove(os.path.join(self.shard_dir, stale))
+            except FileNotFoundError:
+                pass
+        logger.info(f"Saved {written} trail shard(s) to: {self.shard_dir}")
+
+
+def apply_journal_record(data: Dict[str, Any], record: Dict[str, Any]):
+    """
+    Apply one journal record to a FeatureCollection in place
+
+    Trails are identified by name, matching TrailDataManager: an upsert
+    replaces the first feature with the same name or appends a new one, and a
+    delete removes every feature with that name.
+    """
+    features = data.setdefault('features', [])
+    if record['op'] == 'upsert':
+        feature = record['feature']
+        name = feature.get('properties', {}).get('name')
+        for i, existing in enumerate(features):
+            if existing.get('properties', {}).get('name') == name:
+                features[i] = feature
+                break
+        else:
+            features.append(feature)
+    elif record['op'] == 'delete':
+        data['features'] = [
+            feature for feature in features
+            if feature.get('properties', {}).get('name') != record['name']
+        ]
+    else:
+        raise ValueError(f"Unknown journal operation: {record['op']}")
+
+
+class JournaledGeoJSONStorage(GeoJSONFileStorage):
+    """
+    trails.geojson snapshot plus an append-only journal of later changes
+
+    Each save or delete appends one fsync'd JSON line per changed trail to
+    trails.journal instead of rewriting the snapshot. Loading replays the
+    journal on top of the snapshot; a torn last line from a crash mid-append
+    is discarded. After compact_after records the journal is folded back into
+    the snapshot, on a background thread by default, so trails.geojson stays
+    the canonical file the static site and deploy.py read.
+    """
+
+    layout = 'journal'
+
+    def __init__(self, trails_file: str, journal_file: str,
+                 compact_after: int = 50, background: bool = True,
+                 coordinate_encoding: Optional[str] = None):
+        super().__init__(trails_file, coordinate_encoding)
+        self.journal_file = journal_file
+        # The journal is renamed here while a compaction folds it into the
+        # snapshot, so new records can keep going to a fresh journal
+        self.compacting_file = f"{journal_file}.compacting"
+        self.compact_after = compact_after
+        self.background = background
+        self._lock = threading.Lock()
+        self._pending_records = None
+        self._compactor = None
+
+    def signature(self) -> Optional[tuple]:
+        """Stat signatures of the snapshot and both journal files"""
+        signatures = (
+            file_signature(self.trails_file),
+            file_signature(self.compacting_file),
+            file_signature(self.journal_file)
+        )
+        return None if signatures == (None, None, None) else signatures
+
+    def last_modified(self) -> Optional[float]:
+        """Unix time of the newest snapshot or journal write"""
+        signature = self.signature()
+        if signature is None:
+            return None
+        return max(s[0] for s in signature if s) / 1e9
+
+    @staticmethod
+    def _read_records(path: str, repair: bool = False) -> List[Dict[str, Any]]:
+        """
+        Read journal records, stopping at a torn or corrupt line
+
+        Args:
+            path: Journal file
+            repair: Truncate the file after the last good record, so later
+                appends do not end up behind the damaged line
+        """
+        records = []
+        if not os.path.exists(path):
+            return records
+        good_size = 0
+        with open(path, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("record is not newline-terminated")
+                    if line.strip():
+                        records.append(loads(line))
+                except ValueError:
+                    logger.warning(f"Ignoring incomplete journal record at {path}:{line_number}")
+                    break
+                good_size += len(line)
+        if repair and good_size < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(good_size)
+        return records
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the snapshot and replay any journaled changes on top of it
+
+        Returns:
+            GeoJSON FeatureCollection, or None if nothing has been stored yet
+        """
+        # Hold the lock so a finishing compaction cannot swap the snapshot
+        # between reading it and reading the journal it was built from
+        with self._lock:
+            data = super().load()
+            records = (self._read_records(self.compacting_file)
+                       + self._read_records(self.journal_file, repair=True))
+        if self._pending_records is None:
+            self._pending_records = len(records)
+        if data is None:
+            if not records:
+                return None
+            data = {"type": "FeatureCollection", "features": []}
+        for record in records:
+            apply_journal_record(data, record)
+        return data
+
+    def save(self, data: Dict[str, Any]):
+        """Replace the stored collection with data and discard the journal"""
+        with self._lock:
+            super().save(data)
+            # Removing the compacting journal also tells a running compaction
+            # that its result is out of date
+            for path in (self.compacting_file, self.journal_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._pending_records = 0
+
+    def commit(self, data: Dict[str, Any], upserted: List[Dict[str, Any]] = (),
+               deleted: List[Dict[str, Any]] = ()):
+        """
+        Append the changes to the journal
+
+        Args:
+            data: The full collection, already containing the changes
+            upserted: Features that were added or replaced in data
+            deleted: Features that were removed from data
+        """
+        records = []
+        for name in dict.fromkeys(f.get('properties', {}).get('name') for f in deleted):
+            records.append({'op': 'delete', 'name': name})
+        for feature in upserted:
+            records.append({'op': 'upsert', 'feature': feature})
+        if not records:
+            return
+
+        payload = b''.join(dumpb(record) + b'\n' for record in records)
+        with self._lock:
+            if self._pending_records is None:
+                self._pending_records = len(self._read_records(self.journal_file, repair=True))
+            with open(self.journal_file, 'ab') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending_records += len(records)
+            pending = self._pending_records
+        logger.info(f"Journaled {len(records)} change(s) to: {self.journal_file}")
+
+        if pending >= self.compact_after:
+            self.compact()
+
+    def compact(self, background: Optional[bool] = None):
+        """
+        Fold the journal into the trails.geojson snapshot
+
+        Args:
+            background: Run on a background thread (defaults to the storage's
+                background setting)
+        """
+        background = self.background if background is None else background
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            if os.path.exists(self.journal_file) and not os.path.exists(self.compacting_file):
+                os.replace(self.journal_file, self.compacting_file)
+            if not os.path.exists(self.compacting_file):
+                return
+            self._pending_records = len(self._read_records(self.journal_file))
+            if background:
+                self._compactor = threading.Thread(
+                    target=self._compact_journal, name="trail-journal-compaction", daemon=False
+                )
+                self._compactor.start()
+                return
+        self._compact_journal()
+
+    def _compact_journal(self):
+        """Write snapshot + compacting journal as the new snapshot"""
+        tmp_path = f"{self.compacting_file}.tmp"
+        try:
+            with self._lock:
+                data = GeoJSONFileStorage.load(self) or {"type": "FeatureCollection", "features": []}
+                records = self._read_records(self.compacting_file)
+            for record in records:
+                apply_journal_record(data, record)
+
+            # Serialize outside the lock so journal appends are not blocked,
+            # and make the snapshot durable before the journal it replaces
+            # can be deleted
+            contents, pretty = self._file_contents(data)
+            with open(tmp_path, 'wb') as f:
+                f.write(dumpb(contents, pretty))
+                f.flush()
+                os.fsync(f.fileno())
+
+            with self._lock:
+                if not os.path.exists(self.compacting_file):
+                    # save() replaced everything while we were working
+                    os.remove(tmp_path)
+                    return
+                # Replaying these records again after a crash between the two
+                # steps below is harmless: upserts and deletes by name are idempotent
+                os.replace(tmp_path, self.trails_file)
+                fsync_directory(self.trails_file)
+                os.remove(self.compacting_file)
+            logger.info(f"Compacted {len(records)} journal record(s) into: {self.trails_file}")
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            logger.error(f"Error compacting trail journal: {e}")
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished"""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+
+def pack_coordinates(coordinates: Any) -> tuple:
+    """
+    Pack LineString coordinates into little-endian float64s
+
+    Returns:
+        (dims, blob) - dims is the number of values per position, or 0 when
+        the coordinates are not a uniform list of 2D/3D positions and the blob
+        holds compact JSON instead
+    """
+    if coordinates and isinstance(coordinates[0], list):
+        dims = len(coordinates[0])
+        if dims in (2, 3) and all(isinstance(c, list) and len(c) == dims for c in coordinates):
+            try:
+                values = array('d', (float(v) for c in coordinates for v in c))
+            except (TypeError, ValueError):
+                values = None
+            if values is not None:
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                return dims, values.tobytes()
+    return 0, dumpb(coordinates)
+
+
+def unpack_coordinates(dims: int, blob: bytes) -> Any:
+    """Reverse pack_coordinates"""
+    if not dims:
+        return loads(blob)
+    values = array('d')
+    values.frombytes(blob)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    values = values.tolist()
+    return [values[i:i + dims] for i in range(0, len(values), dims)]
+
+
+class SQLiteTrailStorage(TrailStorage):
+    """
+    Trails stored in a SQLite database (data/trails.sqlite3)
+
+    Commonly queried properties live in indexed columns next to the full
+    properties JSON, and geometry is kept as packed float64 coordinates, so
+    name lookups and deletes are answered by SQL instead of parsing every
+    trail.
+    """
+
+    layout = 'sqlite'
+    supports_queries = True
+    lazy_geometry = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS trails (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            position INTEGER NOT NULL,
+            name TEXT,
+            trail_id TEXT,
+            status TEXT,
+            difficulty TEXT,
+            date_hiked TEXT,
+            length REAL,
+            properties TEXT NOT NULL,
+            geometry_type TEXT,
+            coord_dims INTEGER NOT NULL,
+            geometry BLOB
+        );
+        CREATE INDEX IF NOT EXISTS idx_trails_position ON trails(position);
+        CREATE INDEX IF NOT EXISTS idx_trails_name ON trails(name);
+        CREATE INDEX IF NOT EXISTS idx_trails_trail_id ON trails(trail_id);
+        CREATE INDEX IF NOT EXISTS idx_trails_status ON trails(status);
+        CREATE INDEX IF NOT EXISTS idx_trails_difficulty ON trails(difficulty);
+        CREATE INDEX IF NOT EXISTS idx_trails_date_hiked ON trails(date_hiked);
+    """
+
+    COLUMNS = "name, trail_id, status, difficulty, date_hiked, length, properties, geometry_type, coord_dims, geometry"
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection (one per call, so each request thread has its own)"""
+        conn = sqlite3.connect(self.db_file)
+        conn.executescript(self.SCHEMA)
+        return conn
+
+    @staticmethod
+    def _row_values(feature: Dict[str, Any]) -> tuple:
+        """Column values for a feature, in COLUMNS order"""
+        props = feature.get('properties') or {}
+        geometry = feature.get('geometry') or {}
+        dims, blob = pack_coordinates(geometry.get('coordinates', []))
+        length = props.get('length')
+        trail_id = props.get('trail_id')
+        return (
+            props.get('name'),
+            None if trail_id is None else str(trail_id),
+            props.get('status'),
+            props.get('difficulty'),
+            props.get('date_hiked'),
+            length if isinstance(length, (int, float)) else None,
+            dumps(props),
+            geometry.get('type'),
+            dims,
+            blob
+        )
+
+    @staticmethod
+    def _feature(properties: str, geometry_type: str, dims: int, blob: bytes) -> Dict[str, Any]:
+        """Rebuild a GeoJSON feature from a row"""
+        return {
+            "type": "Feature",
+            "properties": loads(properties),
+            "geometry": {
+                "type": geometry_type,
+                "coordinates": unpack_coordinates(dims, blob)
+            }
+        }
+
+    def signature(self) -> Optional[tuple]:
+        """Stat signature of the database file"""
+        return file_signature(self.db_file)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Load every trail in collection order
+
+        Returns:
+            GeoJSON FeatureCollection, or None if the database does not exist
+        """
+        if not os.path.exists(self.db_file):
+            return None
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT properties, geometry_type, coord_dims, geometry FROM trails ORDER BY position"
+            ).fetchall()
+        finally:
+            conn.close()
+        return {
+            "type": "FeatureCollection",
+            "features": [self._feature(*row) for row in rows]
+        }
+
+    def load_metadata(self) -> Optional[Dict[str, Any]]:
+        """Load every trail's properties without unpacking coordinates"""
+        if not os.path.exists(self.db_file):
+            return None
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT properties FROM trails ORDER BY position").fetchall()
+        finally:
+            conn.close()
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "properties": loads(row[0]), "geometry": None}
+                for row in rows
+            ]
+        }
+
+    def save(self, data: Dict[str, Any]):
+        """Replace every stored trail with data in a single transaction"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM trails")
+                conn.executemany(
+                    f"INSERT INTO trails (position, {self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((i,) + self._row_values(feature)
+                     for i, feature in enumerate(data.get('features', [])))
+                )
+        finally:
+            conn.close()
+        logger.info(f"Saved {len(data.get('features', []))} trails to: {self.db_file}")
+
+    def commit(self, data: Optional[Dict[str, Any]], upserted: List[Dict[str, Any]] = (),
+               deleted: List[Dict[str, Any]] = ()):
+        """
+        Apply deletes and upserts by trail name; data is not needed
+
+        Args:
+            data: Ignored - the database applies the changes itself
+            upserted: Features to replace (first row with the same name) or append
+            deleted: Features whose names should be removed
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                for name in dict.fromkeys(f.get('properties', {}).get('name') for f in deleted):
+                    conn.execute("DELETE FROM trails WHERE name IS ?", (name,))
+                for feature in upserted:
+                    values = self._row_values(feature)
+                    row = conn.execute(
+                        "SELECT id FROM trails WHERE name IS ? ORDER BY position LIMIT 1",
+                        (values[0],)
+                    ).fetchone()
+                    if row:
+                        conn.execute(
+                            "UPDATE trails SET name = ?, trail_id = ?, status = ?, difficulty = ?, "
+                            "date_hiked = ?, length = ?, properties = ?, geometry_type = ?, "
+                            "coord_dims = ?, geometry = ? WHERE id = ?",
+                            values + (row[0],)
+                        )
+                    else:
+                        conn.execute(
+                            f"INSERT INTO trails (position, {self.COLUMNS}) "
+                            "VALUES ((SELECT COALESCE(MAX(position), -1) + 1 FROM trails), "
+                            "?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            values
+                        )
+        finally:
+            conn.close()
+
+    def get_trail_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the first trail with this name via the name index"""
+        if not os.path.exists(self.db_file):
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT properties, geometry_type, coord_dims, geometry FROM trails "
+                "WHERE name = ? ORDER BY position LIMIT 1",
+                (name,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return self._feature(*row) if row else None
+
+
+STORAGE_LAYOUTS = ('single', 'sharded', 'journal', 'sqlite', 'columnar')
+
+
+def create_storage(layout: str, data_dir: str, coordinate_encoding: Optional[str] = None):
+    """
+    Create the storage for a layout name
+
+    Args:
+        layout: 'single' (data/trails.geojson), 'sharded' (data/trail_shards/),
+            'journal' (data/trails.geojson plus data/trails.journal),
+            'sqlite' (data/trails.sqlite3) or 'columnar' (data/trail_columns/,
+            requires numpy)
+        data_dir: Directory holding trail data files
+        coordinate_encoding: 'polyline' to write trails.geojson with encoded
+            coordinates (single and journal layouts only)
+    """
+    if coordinate_encoding and layout not in (GeoJSONFileStorage.layout, JournaledGeoJSONStorage.layout):
+        raise ValueError(f"Coordinate encoding is not supported by the '{layout}' layout")
+    if layout == GeoJSONFileStorage.layout:
+        return GeoJSONFileStorage(os.path.join(data_dir, "trails.geojson"), coordinate_encoding)
+    if layout == ShardedTrailStorage.layout:
+        return ShardedTrailStorage(os.path.join(data_dir, "trail_shards"))
+    if layout == JournaledGeoJSONStorage.layout:
+        return JournaledGeoJSONStorage(
+            os.path.join(data_dir, "trails.geojson"),
+            os.path.join(data_dir, "trails.journal"),
+            coordinate_encoding=coordinate_encoding
+        )
+    if layout == SQLiteTrailStorage.layout:
+        return SQLiteTrailStorage(os.path.join(data_dir, "trails.sqlite3"))
+    if layout == 'columnar':
+        # Imported here so numpy is only needed when this backend is used
+        from geometry_store import ColumnarTrailStorage
+        return ColumnarTrailStorage(os.path.join(data_dir, "trail_columns"))
+    raise ValueError(f"Unknown storage layout: {layout}")
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Trail Blogger Vector Tiles
+Clips and encodes GeoJSON features as Mapbox Vector Tiles (spec 2.1), with an on-disk cache
+"""
+
+import math
+import os
+import shutil
+import struct
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Any
+
+from trail_spatial import feature_bbox, intersects
+
+# Tile coordinate space and the margin kept around it so lines and polygon
+# edges continue cleanly across tile borders
+EXTENT = 4096
+BUFFER = 64
+
+MIME_TYPE = 'application/vnd.mapbox-vector-tile'
+
+# Highest zoom tiles are served for
+MAX_ZOOM = 22
+
+_GEOM_POINT = 1
+_GEOM_LINESTRING = 2
+_GEOM_POLYGON = 3
+
+
+# --- Protocol buffer encoding -------------------------------------------------
+
+def _varint(value: int, out: bytearray):
+    """Append an unsigned varint"""
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number: int, payload: bytes, out: bytearray):
+    """Append a length-delimited field"""
+    _varint((number << 3) | 2, out)
+    _varint(len(payload), out)
+    out += payload
+
+
+def _packed(number: int, values: Iterable[int], out: bytearray):
+    """Append a packed repeated uint32 field"""
+    body = bytearray()
+    for value in values:
+        _varint(value, body)
+    _field(number, bytes(body), out)
+
+
+def _value(value: Any) -> bytes:
+    """Encode a property value as a Tile.Value message"""
+    out = bytearray()
+    if isinstance(value, bool):
+        out += b'\x38'
+        _varint(int(value), out)
+    elif isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+        out += b'\x30'
+        _varint(_zigzag(value), out)
+    elif isinstance(value, float):
+        out += b'\x19' + struct.pack('<d', value)
+    else:
+        _field(1, str(value).encode('utf-8'), out)
+    return bytes(out)
+
+
+def _command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+def encode_layer(name: str, features: List[Tuple[int, List[List[Tuple[int, int]]], Dict[str, Any]]]) -> bytes:
+    """
+    Encode one tile layer
+
+    Args:
+        name: Layer name
+        features: (geometry type, parts, properties) per feature, where parts
+            are lines or rings of integer tile coordinates (rings without the
+            closing position, already oriented) or single points
+
+    Returns:
+        Tile.Layer message bytes
+    """
+    keys, values = {}, {}
+    layer = bytearray()
+    _varint((15 << 3) | 0, layer)
+    _varint(2, layer)
+    _field(1, name.encode('utf-8'), layer)
+
+    for feature_id, (geom_type, parts, properties) in enumerate(features, 1):
+        tags = []
+        for key, value in properties.items():
+            if value is None or isinstance(value, (dict, list)):
+                continue
+            encoded = _value(value)
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault(encoded, len(values)))
+
+        geometry = []
+        cursor_x = cursor_y = 0
+        for part in parts:
+            x, y = part[0]
+            geometry += [_command(1, 1), _zigzag(x - cursor_x), _zigzag(y - cursor_y)]
+            cursor_x, cursor_y = x, y
+            if geom_type == _GEOM_POINT:
+                continue
+            geometry.append(_command(2, len(part) - 1))
+            for x, y in part[1:]:
+                geometry += [_zigzag(x - cursor_x), _zigzag(y - cursor_y)]
+                cursor_x, cursor_y = x, y
+            if geom_type == _GEOM_POLYGON:
+                geometry.append(_command(7, 1))
+
+        feature = bytearray()
+        _varint((1 << 3) | 0, feature)
+        _varint(feature_id, feature)
+        if tags:
+            _packed(2, tags, feature)
+        _varint((3 << 3) | 0, feature)
+        _varint(geom_type, feature)
+        _packed(4, geometry, feature)
+        _field(2, bytes(feature), layer)
+
+    for key in keys:
+        _field(3, key.encode('utf-8'), layer)
+    for value in values:
+        _field(4, value, layer)
+    _varint((5 << 3) | 0, layer)
+    _varint(EXTENT, layer)
+    return bytes(layer)
+
+
+# --- Projection and clipping --------------------------------------------------
+
+def tile_lonlat_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) of a tile in degrees"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def _projector(z: int, x: int, y: int) -> Callable[[List[float]], Tuple[float, float]]:
+    """Map [lon, lat, ...] positions to (unrounded) tile coordinates"""
+    scale = 2 ** z * EXTENT
+
+    def project(position):
+        lat = max(min(position[1], 85.0511), -85.0511)
+        px = (position[0] + 180.0) / 360.0 * scale - x * EXTENT
+        sin = math.sin(math.radians(lat))
+        py = (0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)) * scale - y * EXTENT
+        return px, py
+
+    return project
+
+
+def _clip_line(points: List[Tuple[float, float]], low: float, high: float) -> List[List[Tuple[float, float]]]:
+    """Split a line into the parts inside the square [low, high]² (Liang-Barsky per segment)"""
+    parts, current = [], []
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        t0, t1 = 0.0, 1.0
+        dx, dy = x1 - x0, y1 - y0
+        visible = True
+        for p, q in ((-dx, x0 - low), (dx, high - x0), (-dy, y0 - low), (dy, high - y0)):
+            if p == 0:
+                if q < 0:
+                    visible = False
+                    break
+            else:
+                r = q / p
+                if p < 0:
+                    t0 = max(t0, r)
+                else:
+                    t1 = min(t1, r)
+        if not visible or t0 > t1:
+            if current:
+                parts.append(current)
+                current = []
+            continue
+        start = (x0 + t0 * dx, y0 + t0 * dy)
+        end = (x0 + t1 * dx, y0 + t1 * dy)
+        if not current:
+            current = [start]
+        current.append(end)
+        if t1 < 1.0:
+            parts.append(current)
+            current = []
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _clip_ring(points: List[Tuple[float, float]], low: float, high: float) -> List[Tuple[float, float]]:
+    """Clip a closed ring to the square [low, high]² (Sutherland-Hodgman)"""
+    for axis, bound, keep_above in ((0, low, True), (0, high, False), (1, low, True), (1, high, False)):
+        if not points:
+            break
+        clipped = []
+        previous = points[-1]
+        for point in points:
+            inside = point[axis] >= bound if keep_above else point[axis] <= bound
+            previous_inside = previous[axis] >= bound if keep_above else previous[axis] <= bound
+            if inside != previous_inside:
+                t = (bound - previous[axis]) / (point[axis] - previous[axis])
+                clipped.append((previous[0] + t * (point[0] - previous[0]),
+                                previous[1] + t * (point[1] - previous[1])))
+            if inside:
+                clipped.append(point)
+            previous = point
+        points = clipped
+    return points
+
+
+def _quantize(points: Iterable[Tuple[float, float]]) -> List[Tuple[int, int]]:
+    """Round to integer tile coordinates, dropping repeated positions"""
+    out = []
+    for px, py in points:
+        point = (int(round(px)), int(round(py)))
+        if not out or out[-1] != point:
+            out.append(point)
+    return out
+
+
+def _ring_area(ring: List[Tuple[int, int]]) -> int:
+    """Twice the signed area (shoelace); positive is clockwise on screen"""
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]))
+
+
+def _tile_geometry(geometry: Dict[str, Any], project) -> Optional[Tuple[int, List[List[Tuple[int, int]]]]]:
+    """Project, clip and quantize a geometry; None if nothing of it is in the tile"""
+    low, high = -BUFFER, EXTENT + BUFFER
+    geom_type = geometry.get('type')
+    coordinates = geometry.get('coordinates') or []
+
+    if geom_type in ('LineString', 'MultiLineString'):
+        lines = [coordinates] if geom_type == 'LineString' else coordinates
+        parts = []
+        collapsed = None
+        for line in lines:
+            for part in _clip_line([project(p) for p in line], low, high):
+                part = _quantize(part)
+                if len(part) >= 2:
+                    parts.append(part)
+                elif collapsed is None:
+                    collapsed = part
+        if parts:
+            return _GEOM_LINESTRING, parts
+        # Trails shorter than a tile unit at this zoom are kept as a point
+        return (_GEOM_POINT, [collapsed]) if collapsed else None
+
+    if geom_type in ('Polygon', 'MultiPolygon'):
+        polygons = [coordinates] if geom_type == 'Polygon' else coordinates
+        parts = []
+        for polygon in polygons:
+            for ring_number, ring in enumerate(polygon):
+                points = [project(p) for p in ring[:-1]]
+                ring = _quantize(_clip_ring(points, low, high))
+                if len(ring) > 1 and ring[0] == ring[-1]:
+                    ring.pop()
+                area = _ring_area(ring) if len(ring) >= 3 else 0
+                if area == 0:
+                    if ring_number == 0:
+                        # Outer ring outside the tile: skip the polygon and its holes
+                        break
+                    continue
+                # Outer rings must have positive area, holes negative
+                if (area > 0) != (ring_number == 0):
+                    ring.reverse()
+                parts.append(ring)
+        return (_GEOM_POLYGON, parts) if parts else None
+
+    return None
+
+
+def render_layer(name: str, features: Iterable[Dict[str, Any]], z: int, x: int, y: int,
+                 properties: Optional[Iterable[str]] = None) -> Optional[bytes]:
+    """
+    Clip and encode GeoJSON features as one layer of tile z/x/y
+
+    Args:
+        name: Layer name
+        features: GeoJSON features (already simplified for the zoom)
+        properties: Property names to include (all scalar properties if None)
+
+    Returns:
+        Tile.Layer message bytes, or None if no feature touches the tile
+    """
+    west, south, east, north = tile_lonlat_bounds(z, x, y)
+    margin_x = (east - west) * BUFFER / EXTENT
+    margin_y = (north - south) * BUFFER / EXTENT
+    bounds = (west - margin_x, south - margin_y, east + margin_x, north + margin_y)
+    project = _projector(z, x, y)
+
+    encoded = []
+    for feature in features:
+        geometry = feature.get('geometry')
+        if not geometry or geometry.get('encoding'):
+            continue
+        extent = feature_bbox(feature)
+        if extent is None or not intersects(extent, bounds):
+            continue
+        tiled = _tile_geometry(geometry, project)
+        if tiled is None:
+            continue
+        props = feature.get('properties') or {}
+        if properties is not None:
+            props = {key: props[key] for key in properties if key in props}
+        encoded.append((tiled[0], tiled[1], props))
+    return encode_layer(name, encoded) if encoded else None
+
+
+def encode_tile(layers: Iterable[Optional[bytes]]) -> bytes:
+    """Combine encoded layers (None entries are skipped) into a tile"""
+    out = bytearray()
+    for layer in layers:
+        if layer is not None:
+            _field(3, layer, out)
+    return bytes(out)
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    """True if z/x/y names a tile (0 <= z <= MAX_ZOOM, x and y within the zoom)"""
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+# --- Disk cache ---------------------------------------------------------------
+
+class TileCache:
+    """
+    Encoded tiles on disk under cache_dir/<layer>/<version>/<z>/<x>/<y>.mvt
+
+    The version is the data version of the layer's source, so tiles built
+    from older data are never served; the first tile stored for a new
+    version deletes the layer's older versions.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._current = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, layer: str, version: str, z: int, x: int, y: int, build: Callable[[], bytes]) -> bytes:
+        """
+        Return a tile, building and storing it if it is not cached
+
+        Args:
+            layer: Layer name
+            version: Data version the tile must reflect
+            z, x, y: Tile address
+            build: Returns the encoded tile
+
+        Returns:
+            Encoded tile bytes
+        """
+        path = os.path.join(self.cache_dir, layer, version, str(z), str(x), f"{y}.mvt")
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+            with self._lock:
+                self.hits += 1
+            return body
+        except OSError:
+            pass
+
+        body = build()
+        with self._lock:
+            self.misses += 1
+            if self._current.get(layer) != version:
+                self._current[layer] = version
+                self._drop_old_versions(layer, version)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(body)
+            os.replace(temp_path, path)
+        except OSError:
+            # The cache only saves work; serve the tile anyway
+            pass
+        return body
+
+    def _drop_old_versions(self, layer: str, version: str):
+        """Delete cached tiles of every other version of a layer"""
+        layer_dir = os.path.join(self.cache_dir, layer)
+        if not os.path.isdir(layer_dir):
+            return
+        for entry in os.scandir(layer_dir):
+            if entry.name != version and entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def clear(self):
+        """Delete every cached tile"""
+        with self._lock:
+            self._current.clear()
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict with hits, misses (tiles built) and the cached version per layer
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'versions': dict(self._current)
+            }
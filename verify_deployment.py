@@ -3,9 +3,12 @@
 Verify that GitHub Pages deployment matches local data
 """
 
-import json
 import urllib.request
 import sys
+from json_io import load_file, loads
+from data_manager import summarize_feature
+
+LOCAL_API = 'http://localhost:5000/api/trails'
 
 def compare_trail_counts():
     """Compare trail counts between local and live"""
@@ -14,8 +17,7 @@ def compare_trail_counts():
     print("=" * 70)
     
     # Load local data
-    with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-        local_data = json.load(f)
+    local_data = load_file('data/trails.geojson')
     
     local_trails = local_data.get('features', [])
     local_count = len(local_trails)
@@ -26,7 +28,7 @@ def compare_trail_counts():
     try:
         url = 'https://realcaddish.github.io/trailBlogger/data/trails.geojson'
         with urllib.request.urlopen(url) as response:
-            live_data = json.loads(response.read().decode('utf-8'))
+            live_data = loads(response.read())
         
         live_trails = live_data.get('features', [])
         live_count = len(live_trails)
@@ -46,22 +48,33 @@ def compare_trail_counts():
         print("    Site might still be deploying. Wait 2 minutes and try again.")
         return False
 
+def load_trail_summaries():
+    """
+    Get one summary per local trail
+    
+    Asks the running server for ?view=summary (a few KB) and falls back to
+    summarizing data/trails.geojson when the server is not running.
+    """
+    try:
+        with urllib.request.urlopen(f"{LOCAL_API}?view=summary", timeout=5) as response:
+            return loads(response.read())['features']
+    except Exception:
+        data = load_file('data/trails.geojson')
+        return [summarize_feature(feature) for feature in data['features']]
+
 def list_trail_names():
     """Show trail names from local data"""
     print("\n" + "=" * 70)
     print("YOUR TRAILS (LOCAL)")
     print("=" * 70 + "\n")
     
-    with open('data/trails.geojson', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    for i, feature in enumerate(data['features'], 1):
-        props = feature['properties']
+    for i, summary in enumerate(load_trail_summaries(), 1):
+        props = summary['properties']
         name = props.get('name', 'Unnamed')
         status = props.get('status', 'unknown')
         length = props.get('length', 0)
-        images = len(props.get('images', []))
-        coords = len(feature['geometry'].get('coordinates', []))
+        images = props['image_count']
+        coords = props['point_count']
         
         status_icon = "✓" if status == 'hiked' else "○"
         gps_icon = "📍" if coords > 1 else "  "